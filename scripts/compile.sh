@@ -18,6 +18,6 @@ echo "Running the library tests..."
 
 # Compile the shared library with gsl
 echo "Compiling the shared library..."
-gcc -shared -fPIC -o ./build/libPyTraj.so ./src/main.c -lgsl
+gcc -O3 -shared -fPIC -o ./build/libPyTraj.so ./src/main.c -lgsl -lpthread
 
 echo "Done."
\ No newline at end of file
@@ -0,0 +1,542 @@
+import numpy as np
+
+# Physical constants, matching gravity.h, atmosphere.h and utils.h
+EARTH_RADIUS = 6371e3
+EARTH_MASS = 5.972e24
+GRAV_CONST = 6.67408e-11
+GRAV_G0 = -GRAV_CONST * EARTH_MASS / (EARTH_RADIUS * EARTH_RADIUS)
+GEOID_HEIGHT_STD = 0.05
+SCALE_HEIGHT = 8000
+SEA_LEVEL_DENSITY = 1.225
+
+# Perturbed atmosphere standard deviations by altitude band (see init_exp_atm in atmosphere.h)
+ATM_BAND_FLOORS = np.array([5000, 50000, 100000])
+ATM_STD_DENSITIES = np.array([0.00009, 0.00001, 0.00262, 0.00662])
+ATM_STD_WINDS = np.array([0.223, 0.098, 1.13, 2.23])
+ATM_STD_VERT_WINDS = np.array([0.058, 0.016, 0.070, 0.244])
+
+# Names of the per-sample arrays of each state (vectors are (N, 3), scalars are (N,))
+STATE_FIELDS = ["pos", "vel", "a_grav", "a_drag", "a_thrust", "a_total", "theta_long", "theta_lat"]
+
+def init_batch_vehicle(run_params):
+    """
+    Function to get the vehicle parameters selected by the run type and RV type, matching init_vehicle in trajectory.h.
+
+    INPUTS:
+    ----------
+        run_params: runparams
+            The run parameters.
+    OUTPUTS:
+    ----------
+        vehicle: dict
+            The booster and reentry vehicle parameters.
+    """
+    if run_params.run_type == 1:
+        # mock booster carrying a maneuverable reentry vehicle
+        wet_mass = np.zeros(3)
+        fuel_mass = np.zeros(3)
+        isp0 = np.zeros(3)
+        burn_time = np.zeros(3)
+        bus_mass = 0.0
+        rv_mass = 450.0
+    elif run_params.run_type == 0:
+        if run_params.rv_type not in (0, 1):
+            raise ValueError(f"Invalid RV type {run_params.rv_type}")
+        wet_mass = np.array([23230.0, 7270.0, 3710.0])
+        fuel_mass = np.array([20780.0, 6240.0, 3306.0])
+        isp0 = np.array([267 * 9.81, 287 * 9.81, 285 * 9.81])
+        burn_time = np.array([61.0, 66.0, 61.0])
+        bus_mass = 100.0
+        rv_mass = 400.0 if run_params.rv_type == 0 else 450.0
+    else:
+        raise ValueError(f"Invalid run type {run_params.run_type}")
+
+    fuel_burn_rate = np.divide(fuel_mass, burn_time, out=np.zeros(3), where=burn_time > 0)
+    total_burn_time = 0.0
+    booster_mass = bus_mass
+    for i in range(3):
+        total_burn_time += burn_time[i]
+        booster_mass += wet_mass[i]
+
+    vehicle = {
+        "wet_mass": wet_mass,
+        "isp0": isp0,
+        "burn_time": burn_time,
+        "fuel_burn_rate": fuel_burn_rate,
+        "total_burn_time": total_burn_time,
+        "booster_area": 2.2698,
+        "booster_c_d_0": 0.15,
+        "rv_mass": rv_mass,
+        "rv_area": np.pi * 0.23 * 0.23,
+        "rv_c_d_0": 0.1,
+        "total_mass": booster_mass + rv_mass,
+    }
+
+    return vehicle
+
+def batch_mass(vehicle, t):
+    """
+    Function to get the mass of each sample from its time since launch, matching update_mass in vehicle.h.
+
+    INPUTS:
+    ----------
+        vehicle: dict
+            The vehicle parameters.
+        t: numpy.ndarray
+            The time since launch of each sample (s).
+    OUTPUTS:
+    ----------
+        mass: numpy.ndarray
+            The mass of each sample (kg).
+    """
+    burn_time = vehicle["burn_time"]
+    rate = vehicle["fuel_burn_rate"]
+    wet_mass = vehicle["wet_mass"]
+    total_mass = vehicle["total_mass"]
+
+    stage_1 = total_mass - wet_mass[0] - (t - burn_time[0]) * rate[1]
+    stage_2 = total_mass - wet_mass[0] - wet_mass[1] - (t - burn_time[0] - burn_time[1]) * rate[2]
+    mass = np.where(t <= burn_time[0], total_mass - t * rate[0], np.where(t <= burn_time[1] + burn_time[0], stage_1, stage_2))
+
+    return np.where(t > vehicle["total_burn_time"], vehicle["rv_mass"], mass)
+
+def batch_gravity(pos, geoid_height_error):
+    """
+    Function to get the gravitational acceleration of each sample, matching update_gravity in physics.h.
+
+    INPUTS:
+    ----------
+        pos: numpy.ndarray
+            The (N, 3) positions (m).
+        geoid_height_error: numpy.ndarray
+            The geoid height error of each sample (m).
+    OUTPUTS:
+    ----------
+        a_grav: numpy.ndarray
+            The (N, 3) gravitational accelerations (m/s^2).
+    """
+    r = np.sqrt(np.einsum('ij,ij->i', pos, pos))
+    geoid_radius = EARTH_RADIUS + geoid_height_error
+    ar_grav = GRAV_G0 * (geoid_radius * geoid_radius) / (r * r)
+
+    return ar_grav[:, None] * pos / r[:, None]
+
+def batch_atm_cond(altitude, atm_pert=None):
+    """
+    Function to get the atmospheric conditions of each sample from the exponential model, or from the perturbed model if
+    perturbations are given, matching get_exp_atm_cond and get_pert_atm_cond in atmosphere.h.
+
+    INPUTS:
+    ----------
+        altitude: numpy.ndarray
+            The altitude of each sample (m).
+        atm_pert: dict or None
+            The (N, 4) density, zonal, meridional and vertical wind perturbations by altitude band, or None for the
+            exponential model.
+    OUTPUTS:
+    ----------
+        density: numpy.ndarray
+            The density of each sample (kg/m^3).
+        spher_wind: numpy.ndarray or None
+            The (N, 3) vertical, zonal and meridional winds (m/s), or None for the windless exponential model.
+    """
+    altitude = np.maximum(altitude, 0)
+    density = SEA_LEVEL_DENSITY * np.exp(-altitude / SCALE_HEIGHT)
+    if atm_pert is None:
+        return density, None
+
+    rows = np.arange(len(altitude))
+    spher_wind = np.empty((len(altitude), 3))
+    band = np.searchsorted(ATM_BAND_FLOORS, altitude, side='right')
+    density = density + atm_pert["density"][rows, band] * density
+    spher_wind[:, 0] = atm_pert["vertical_wind"][rows, band]
+    spher_wind[:, 1] = atm_pert["zonal_wind"][rows, band]
+    spher_wind[:, 2] = atm_pert["meridional_wind"][rows, band]
+
+    return density, spher_wind
+
+def batch_drag(run_params, vehicle, density, spher_wind, pos, vel, t, mass):
+    """
+    Function to get the drag acceleration of each sample, matching update_drag in physics.h. The step function anomaly
+    is not supported.
+
+    INPUTS:
+    ----------
+        run_params: runparams
+            The run parameters.
+        vehicle: dict
+            The vehicle parameters.
+        density: numpy.ndarray
+            The density of each sample (kg/m^3).
+        spher_wind: numpy.ndarray or None
+            The (N, 3) vertical, zonal and meridional winds (m/s), or None if there is no wind.
+        pos: numpy.ndarray
+            The (N, 3) positions (m).
+        vel: numpy.ndarray
+            The (N, 3) velocities (m/s).
+        t: numpy.ndarray
+            The time since launch of each sample (s).
+        mass: numpy.ndarray
+            The mass of each sample (kg).
+    OUTPUTS:
+    ----------
+        a_drag: numpy.ndarray
+            The (N, 3) drag accelerations (m/s^2).
+    """
+    v_rel = vel
+    if spher_wind is not None:
+        # rotate the wind from spherical to Cartesian components at each position, with the sines and cosines of the
+        # longitude and latitude taken from the position directly
+        r_xy = np.sqrt(pos[:, 0] * pos[:, 0] + pos[:, 1] * pos[:, 1])
+        r = np.sqrt(r_xy * r_xy + pos[:, 2] * pos[:, 2])
+        cos_lon = pos[:, 0] / r_xy
+        sin_lon = pos[:, 1] / r_xy
+        cos_lat = r_xy / r
+        sin_lat = pos[:, 2] / r
+        cart_wind = np.empty_like(pos)
+        cart_wind[:, 0] = -spher_wind[:, 1] * sin_lon - spher_wind[:, 2] * sin_lat * cos_lon + spher_wind[:, 0] * cos_lon * cos_lat
+        cart_wind[:, 1] = spher_wind[:, 1] * cos_lon - spher_wind[:, 2] * sin_lat * sin_lon + spher_wind[:, 0] * sin_lon * cos_lat
+        cart_wind[:, 2] = spher_wind[:, 2] * cos_lat + spher_wind[:, 0] * sin_lat
+        v_rel = vel - cart_wind
+
+    v_rel_mag = np.sqrt(np.einsum('ij,ij->i', v_rel, v_rel))
+    moving = v_rel_mag >= 1e-2
+    safe_mag = np.where(moving, v_rel_mag, 1)
+
+    # booster drag before burnout, reentry vehicle drag after
+    reentry = t > vehicle["total_burn_time"]
+    drag_area = np.where(reentry, vehicle["rv_area"] * vehicle["rv_c_d_0"], vehicle["booster_area"] * vehicle["booster_c_d_0"])
+    dynamic_pressure = 0.5 * density * v_rel_mag * v_rel_mag
+    a_drag = (-dynamic_pressure * drag_area / mass / safe_mag)[:, None] * v_rel
+
+    # anomalous lift for reentry only runs
+    if run_params.run_type == 1:
+        a_drag[:, 1] = a_drag[:, 1] + run_params.cl_pert * dynamic_pressure * vehicle["rv_area"] / mass
+
+    return np.where(moving[:, None], a_drag, 0)
+
+def batch_thrust(vehicle, t, mass, theta_long, theta_lat):
+    """
+    Function to get the thrust acceleration of each sample, matching update_thrust in physics.h.
+
+    INPUTS:
+    ----------
+        vehicle: dict
+            The vehicle parameters.
+        t: numpy.ndarray
+            The time since launch of each sample (s).
+        mass: numpy.ndarray
+            The mass of each sample (kg).
+        theta_long: numpy.ndarray
+            The longitudinal thrust angle of each sample (rad).
+        theta_lat: numpy.ndarray
+            The latitudinal thrust angle of each sample (rad).
+    OUTPUTS:
+    ----------
+        a_thrust: numpy.ndarray
+            The (N, 3) thrust accelerations (m/s^2).
+    """
+    if np.all(t > vehicle["total_burn_time"]):
+        return np.zeros((len(t), 3))
+
+    burn_time = vehicle["burn_time"]
+    stage = (t > burn_time[0]).astype(int) + (t > burn_time[0] + burn_time[1]).astype(int)
+    a_thrust_mag = vehicle["isp0"][stage] * vehicle["fuel_burn_rate"][stage] / mass
+
+    a_thrust = np.empty((len(t), 3))
+    a_thrust[:, 0] = a_thrust_mag * np.cos(theta_long) * np.cos(theta_lat)
+    a_thrust[:, 1] = a_thrust_mag * np.sin(theta_long) * np.cos(theta_lat)
+    a_thrust[:, 2] = a_thrust_mag * np.sin(theta_lat)
+
+    # vertical thrust for the beginning of the flight
+    vertical = t < 5
+    a_thrust[vertical, 0] = a_thrust_mag[vertical]
+    a_thrust[vertical, 1:] = 0
+    a_thrust[t > vehicle["total_burn_time"]] = 0
+
+    return a_thrust
+
+def batch_time_step(run_params, vehicle, t, altitude):
+    """
+    Function to get the time step of each sample from the step size schedule, matching get_time_step in integrator.h.
+
+    INPUTS:
+    ----------
+        run_params: runparams
+            The run parameters.
+        vehicle: dict
+            The vehicle parameters.
+        t: numpy.ndarray
+            The time since launch of each sample (s).
+        altitude: numpy.ndarray
+            The altitude of each sample (m).
+    OUTPUTS:
+    ----------
+        time_step: numpy.ndarray
+            The time step of each sample (s).
+    """
+    boost = run_params.step_boost if run_params.step_boost > 0 else run_params.time_step_main
+    exo = run_params.step_exo if run_params.step_exo > 0 else run_params.time_step_main
+    upper = run_params.step_upper if run_params.step_upper > 0 else run_params.time_step_reentry
+    dense = run_params.step_dense if run_params.step_dense > 0 else run_params.time_step_reentry
+
+    time_step = np.where(altitude > run_params.alt_exo, exo, np.where(altitude > run_params.alt_dense, upper, dense))
+
+    return np.where(t < vehicle["total_burn_time"], boost, time_step)
+
+def init_batch_state(num_runs):
+    """
+    Function to allocate a batch of states as a dictionary of per-sample arrays.
+
+    INPUTS:
+    ----------
+        num_runs: int
+            The number of samples.
+    OUTPUTS:
+    ----------
+        state: dict
+            The (N, 3) vector and (N,) angle arrays of STATE_FIELDS, zero filled.
+    """
+    state = {}
+    for field in STATE_FIELDS:
+        state[field] = np.zeros(num_runs) if field.startswith("theta") else np.zeros((num_runs, 3))
+
+    return state
+
+def rk4_batch(state, time_step):
+    """
+    Function to advance a batch of states with the accelerations held over the step, matching rk4step in physics.h.
+
+    INPUTS:
+    ----------
+        state: dict
+            The batch of states, updated in place.
+        time_step: numpy.ndarray
+            The time step of each sample (s).
+    """
+    # with the accelerations held, the stages reduce to k1 = v, k2 = k3 = v + h/2 a, k4 = v + h a
+    h = time_step[:, None]
+    vel = state["vel"]
+    a_total = state["a_total"]
+    state["pos"] = state["pos"] + h / 6 * (vel + 4 * (vel + 0.5 * h * a_total) + (vel + h * a_total))
+    state["vel"] = vel + h * a_total
+
+def impact_batch(pos_0, vel_0, pos_1, vel_1, t_0, t_1):
+    """
+    Function to interpolate the impact of each sample linearly between two steps, matching impact_linterp in
+    trajectory.h.
+
+    INPUTS:
+    ----------
+        pos_0, vel_0: numpy.ndarray
+            The (N, 3) positions (m) and velocities (m/s) before the impact.
+        pos_1, vel_1: numpy.ndarray
+            The (N, 3) positions (m) and velocities (m/s) after the impact.
+        t_0, t_1: numpy.ndarray
+            The times before and after the impact (s).
+    OUTPUTS:
+    ----------
+        impact_data: numpy.ndarray
+            The (N, 7) impact records (t, x, y, z, vx, vy, vz).
+    """
+    altitude_0 = np.sqrt(np.einsum('ij,ij->i', pos_0, pos_0)) - EARTH_RADIUS
+    altitude_1 = np.sqrt(np.einsum('ij,ij->i', pos_1, pos_1)) - EARTH_RADIUS
+    factor = altitude_0 / (altitude_0 - altitude_1)
+
+    impact_data = np.empty((len(factor), 7))
+    impact_data[:, 0] = t_0 + factor * (t_1 - t_0)
+    impact_data[:, 1:4] = pos_0 + factor[:, None] * (pos_1 - pos_0)
+    impact_data[:, 4:7] = vel_0 + factor[:, None] * (vel_1 - vel_0)
+
+    return impact_data
+
+def batch_run(run_params, num_runs=None, seed=None, max_steps=1000000):
+    """
+    Function to run the Monte Carlo simulation with every sample advanced at once as NumPy arrays, for prototyping in
+    Python. It follows fly() in trajectory.h with the fixed step schedule, the exponential or perturbed atmosphere, the
+    IMU and GNSS errors and the idealized maneuvers (rv_maneuv = 0 or 2). Samples leave the batch as they impact. The
+    random numbers are drawn from NumPy, so individual samples differ from mc_run, but runs without errors match it.
+
+    INPUTS:
+    ----------
+        run_params: runparams
+            The run parameters.
+        num_runs: int
+            The number of samples, or None for run_params.num_runs.
+        seed: int
+            The seed of the NumPy random number generator.
+        max_steps: int
+            The maximum number of steps before the remaining samples are returned without an impact.
+    OUTPUTS:
+    ----------
+        impact_data: numpy.ndarray
+            The impact data, with one row (t, x, y, z, vx, vy, vz) per Monte Carlo run.
+    """
+    if run_params.rv_maneuv == 1:
+        raise ValueError("batch_run does not support proportional navigation (rv_maneuv = 1)")
+    if run_params.atm_error != 0 and run_params.atm_model != 0:
+        raise ValueError("batch_run does not support the EarthGRAM atmosphere (atm_model = 1)")
+    if run_params.integrator != 0 or run_params.coast_mode != 0:
+        raise ValueError("batch_run only supports the fixed step integrator without the closed-form coast")
+    if run_params.run_type == 1 and run_params.step_acc_mag != 0:
+        raise ValueError("batch_run does not support the step function anomaly")
+
+    if num_runs is None:
+        num_runs = run_params.num_runs
+    rng = np.random.default_rng(seed)
+    vehicle = init_batch_vehicle(run_params)
+    burn_time = vehicle["total_burn_time"]
+    n = num_runs
+
+    # initial true state, matching init_true_state
+    true = init_batch_state(n)
+    x_0 = EARTH_RADIUS if run_params.run_type == 0 else EARTH_RADIUS + 500e3
+    vx_0 = 0 if run_params.run_type == 0 else -run_params.reentry_vel
+    true["pos"][:, 0] = x_0 + run_params.initial_x_error * rng.standard_normal(n)
+    true["pos"][:, 1:] = run_params.initial_pos_error * rng.standard_normal((n, 2))
+    true["vel"] = run_params.initial_vel_error * rng.standard_normal((n, 3))
+    true["vel"][:, 0] += vx_0
+    rot_pert = run_params.initial_angle_error * rng.standard_normal(n)
+    theta_lat_pert = run_params.initial_angle_error * rng.standard_normal(n) + run_params.theta_long * rot_pert - np.abs(run_params.theta_lat * rot_pert)
+    theta_long_pert = run_params.initial_angle_error * rng.standard_normal(n) - run_params.theta_lat * rot_pert - np.abs(run_params.theta_long * rot_pert)
+    true["theta_long"] = run_params.theta_long + theta_long_pert
+    true["theta_lat"] = run_params.theta_lat + theta_lat_pert
+
+    # estimated and desired states, matching init_est_state
+    est = init_batch_state(n)
+    est["pos"][:, 0] = EARTH_RADIUS if run_params.run_type == 0 else EARTH_RADIUS + 1000e3
+    est["vel"][:, 0] = vx_0
+    est["theta_long"][:] = run_params.theta_long
+    est["theta_lat"][:] = run_params.theta_lat
+    des = {field: value.copy() for field, value in est.items()}
+
+    # gravity and atmosphere models
+    true_geoid = GEOID_HEIGHT_STD * rng.standard_normal(n) if run_params.grav_error != 0 else np.zeros(n)
+    est_geoid = GEOID_HEIGHT_STD * rng.standard_normal(n) if run_params.grav_error != 0 else np.zeros(n)
+    atm_pert = None
+    if run_params.atm_error != 0:
+        atm_pert = {
+            "density": ATM_STD_DENSITIES * rng.standard_normal((n, 4)),
+            "zonal_wind": ATM_STD_WINDS * rng.standard_normal((n, 4)),
+            "meridional_wind": ATM_STD_WINDS * rng.standard_normal((n, 4)),
+            "vertical_wind": ATM_STD_VERT_WINDS * rng.standard_normal((n, 4)),
+        }
+
+    # IMU errors, matching imu_init
+    acc_scale = run_params.acc_scale_stability * rng.standard_normal((n, 3))
+    gyro_bias_long = run_params.gyro_bias_stability * rng.standard_normal(n)
+    gyro_bias_lat = run_params.gyro_bias_stability * rng.standard_normal(n)
+    gyro_error_long = theta_long_pert.copy()
+    gyro_error_lat = theta_lat_pert.copy()
+
+    t = np.zeros(n)
+    mass = np.full(n, vehicle["total_mass"])
+    run_index = np.arange(n)
+    impact_data = np.zeros((num_runs, 7))
+
+    for step in range(max_steps):
+        if n == 0:
+            break
+        old_altitude = np.sqrt(np.einsum('ij,ij->i', true["pos"], true["pos"])) - EARTH_RADIUS
+        true_density, true_wind = batch_atm_cond(old_altitude, atm_pert)
+        est_density, est_wind = batch_atm_cond(old_altitude)
+        time_step = batch_time_step(run_params, vehicle, t, old_altitude)
+
+        # accelerations of the true, estimated and desired states. With the INS, the IMU measurement replaces the
+        # total acceleration of the estimated state, so only its gravity is needed
+        force_states = (true, des) if run_params.ins_nav == 1 else (true, est, des)
+        true["a_grav"] = batch_gravity(true["pos"], true_geoid)
+        est["a_grav"] = batch_gravity(est["pos"], est_geoid)
+        des["a_grav"] = batch_gravity(des["pos"], true_geoid)
+        true["a_drag"] = batch_drag(run_params, vehicle, true_density, true_wind, true["pos"], true["vel"], t, mass)
+        des["a_drag"] = batch_drag(run_params, vehicle, est_density, est_wind, des["pos"], des["vel"], t, mass)
+        if run_params.ins_nav != 1:
+            est["a_drag"] = batch_drag(run_params, vehicle, est_density, est_wind, est["pos"], est["vel"], t, mass)
+        for state in force_states:
+            state["a_thrust"] = batch_thrust(vehicle, t, mass, state["theta_long"], state["theta_lat"])
+            state["a_total"] = state["a_grav"] + state["a_drag"] + state["a_thrust"]
+
+        if run_params.ins_nav == 1:
+            # IMU measurement, matching imu_measurement
+            est["theta_long"] = true["theta_long"] + gyro_error_long - theta_long_pert
+            est["theta_lat"] = true["theta_lat"] + gyro_error_lat - theta_lat_pert
+            a_meas = true["a_total"] - true["a_grav"]
+            est["a_total"] = np.stack([
+                a_meas[:, 0] * (1 + acc_scale[:, 0]) + a_meas[:, 1] * gyro_error_long - a_meas[:, 2] * gyro_error_lat + est["a_grav"][:, 0],
+                a_meas[:, 1] * (1 + acc_scale[:, 1]) - a_meas[:, 0] * gyro_error_long + a_meas[:, 2] * gyro_error_long * gyro_error_lat + est["a_grav"][:, 1],
+                a_meas[:, 2] * (1 + acc_scale[:, 2]) + a_meas[:, 0] * gyro_error_lat + est["a_grav"][:, 2],
+            ], axis=1)
+
+            # gyro drift, matching update_imu
+            drift = np.ones(n, dtype=bool)
+            if run_params.rv_maneuv != 0:
+                a_drag = np.sqrt(np.einsum('ij,ij->i', true["a_drag"], true["a_drag"]))
+                drift = (a_drag > 1e-3) | (t < burn_time)
+            noise = rng.standard_normal((n, 2))
+            gyro_error_long = np.where(drift, gyro_error_long + (run_params.gyro_noise * noise[:, 0] + gyro_bias_long) * time_step, gyro_error_long)
+            gyro_error_lat = np.where(drift, gyro_error_lat + (run_params.gyro_noise * noise[:, 1] + gyro_bias_lat) * time_step, gyro_error_lat)
+
+        if run_params.gnss_nav == 1:
+            est["pos"] = true["pos"] + run_params.gnss_noise * rng.standard_normal((n, 3))
+
+        # perfect maneuver at burnout, matching perfect_maneuv
+        maneuver = t == burn_time
+        if run_params.run_type == 0 and np.any(maneuver):
+            for field in STATE_FIELDS:
+                shape = (-1, 1) if true[field].ndim == 2 else (-1,)
+                correction = (des[field] - est[field]) * maneuver.reshape(shape)
+                true[field] = true[field] + correction
+                est[field] = np.where(maneuver.reshape(shape), des[field], est[field])
+            gyro_error_long = np.where(maneuver, 0, gyro_error_long)
+            gyro_error_lat = np.where(maneuver, 0, gyro_error_lat)
+
+        old_true_pos, old_true_vel = true["pos"], true["vel"]
+        old_est_pos, old_est_vel = est["pos"], est["vel"]
+        old_t = t
+        for state in (true, est, des):
+            rk4_batch(state, time_step)
+        t = t + time_step
+        mass = batch_mass(vehicle, t)
+
+        # samples that crossed the surface leave the batch
+        new_altitude = np.sqrt(np.einsum('ij,ij->i', true["pos"], true["pos"])) - EARTH_RADIUS
+        hit = new_altitude < 0
+        if not np.any(hit):
+            continue
+
+        true_impact = impact_batch(old_true_pos[hit], old_true_vel[hit], true["pos"][hit], true["vel"][hit], old_t[hit], t[hit])
+        est_impact = impact_batch(old_est_pos[hit], old_est_vel[hit], est["pos"][hit], est["vel"][hit], old_t[hit], t[hit])
+
+        # Coriolis effect of the impact time error, in a random direction
+        num_hit = np.count_nonzero(hit)
+        lat = rng.uniform(-np.pi / 2, np.pi / 2, num_hit)
+        lon = rng.uniform(-np.pi, np.pi, num_hit)
+        coriolis = 464 * np.cos(lat) * (true_impact[:, 0] - est_impact[:, 0])
+        true_impact[:, 1] = true_impact[:, 1] - coriolis * np.sin(lon) * np.cos(lat)
+        true_impact[:, 2] = true_impact[:, 2] + coriolis * np.cos(lon) * np.cos(lat)
+        true_impact[:, 3] = true_impact[:, 3] + coriolis * np.sin(lat)
+        if run_params.rv_maneuv == 2:
+            true_impact[:, 1:4] = true_impact[:, 1:4] - est_impact[:, 1:4]
+        impact_data[run_index[hit]] = true_impact
+
+        # compact the batch to the samples still in flight
+        keep = ~hit
+        for state in (true, est, des):
+            for field in STATE_FIELDS:
+                state[field] = state[field][keep]
+        t, mass, run_index = t[keep], mass[keep], run_index[keep]
+        true_geoid, est_geoid = true_geoid[keep], est_geoid[keep]
+        acc_scale, gyro_bias_long, gyro_bias_lat = acc_scale[keep], gyro_bias_long[keep], gyro_bias_lat[keep]
+        gyro_error_long, gyro_error_lat = gyro_error_long[keep], gyro_error_lat[keep]
+        theta_long_pert, theta_lat_pert = theta_long_pert[keep], theta_lat_pert[keep]
+        if atm_pert is not None:
+            atm_pert = {name: value[keep] for name, value in atm_pert.items()}
+        n = len(t)
+
+    if n > 0:
+        print("Warning: Maximum number of steps reached with no impact")
+        impact_data[run_index, 0] = t
+        impact_data[run_index, 1:4] = true["pos"]
+        impact_data[run_index, 4:7] = true["vel"]
+
+    return impact_data
@@ -2,9 +2,31 @@
 #define ATMOSPHERE_H
 
 #include <math.h>
+#include <stdlib.h>
+#include <string.h>
+#include <pthread.h>
+#include <fcntl.h>
+#include <unistd.h>
+#include <sys/mman.h>
+#include <sys/stat.h>
 #include <gsl/gsl_rng.h>
 #include <gsl/gsl_randist.h>
 #include "utils.h"
+#include "rng.h"
+
+// Define the EarthGRAM 2016 profile file and its dimensions
+#define ATM_PROFILE_PATH "input/atmprofiles.txt"
+#define ATM_NUM_PROFILES 100 // number of profiles in the file
+#define ATM_NUM_LEVELS 100 // number of altitude levels per profile
+
+// Define the binary profile file format
+#define ATM_BIN_MAGIC "EG16PRF1" // magic string at the start of the binary profile file
+#define ATM_BIN_VERSION 1 // version of the binary profile file format
+#define ATM_BIN_NUM_COLUMNS 5 // number of double columns per profile (altitude, density, meridional, zonal, vertical wind)
+
+// Define the atmosphere lookup tables, used when atm_table is set
+#define ATM_TABLE_COLUMNS 4 // density, meridional, zonal and vertical wind
+#define ATM_NUM_BANDS 4 // number of altitude bands of the perturbed model
 
 // Define an atm_cond struct to store local atmospheric conditions
 typedef struct atm_cond{
@@ -34,6 +56,11 @@ typedef struct atm_model{
     double pert_meridional_winds[4];
     double pert_vert_winds[4];
 
+    // Lookup tables, set by init_atm_table
+    int table; // flag to look up the conditions in the tables instead of evaluating the model
+    double band_log_densities[ATM_NUM_BANDS]; // log of the sea level density scaled by the density perturbation of each band
+    struct eg16_table *eg_table; // table of the EarthGRAM 2016 profile, NULL for the exponential models
+
 } atm_model;
 
 // Define an eg16_profile struct to store the atmospheric profile data
@@ -47,6 +74,54 @@ typedef struct eg16_profile{
 
 } eg16_profile;
 
+// The binary profile file stores the profiles as eg16_profile records, so the layout must not contain any hidden padding
+_Static_assert(sizeof(eg16_profile) == 2*sizeof(int) + ATM_BIN_NUM_COLUMNS*ATM_NUM_LEVELS*sizeof(double), "eg16_profile layout does not match the binary profile format");
+
+// Define the fixed 64 byte header of the binary profile file, which is followed by num_profiles eg16_profile records
+typedef struct eg16_bin_header{
+    char magic[8]; // ATM_BIN_MAGIC
+    int version; // ATM_BIN_VERSION
+    int num_profiles; // number of profiles in the file
+    int num_levels; // number of altitude levels per profile
+    int num_columns; // number of double columns per profile
+    int record_size; // size of each profile record in bytes
+    int data_offset; // offset of the first profile record in bytes
+    char reserved[32]; // reserved, zero filled
+
+} eg16_bin_header;
+
+// Define an eg16_cell struct to hold one segment of an EarthGRAM 2016 profile, with every column stored together
+typedef struct eg16_cell{
+    double alt; // altitude of the bottom of the segment in kilometers
+    double span; // height of the segment in kilometers
+    double values[ATM_TABLE_COLUMNS]; // density, meridional, zonal and vertical wind at the bottom of the segment
+    double deltas[ATM_TABLE_COLUMNS]; // change of each column over the segment
+
+} eg16_cell;
+
+// Define an eg16_table struct to hold the lookup table of an EarthGRAM 2016 profile, one cell per profile level
+typedef struct eg16_table{
+    eg16_profile *profile; // profile the table was built from, whose levels are bracketed by eg16_bracket
+    eg16_cell cells[ATM_NUM_LEVELS]; // cell i holds the segment that ends at level i, cell 0 the constant below the lowest level
+
+} eg16_table;
+
+// Define an eg16_store struct to hold every EarthGRAM 2016 profile in memory
+typedef struct eg16_store{
+    char path[256]; // path of the file the profiles were loaded from
+    int num_profiles; // number of profiles loaded
+    eg16_profile *profiles; // profile data, either a read-only mapping of the binary file or a heap copy
+    void *map; // start of the memory mapping (NULL if the profiles are a heap copy)
+    size_t map_size; // size of the memory mapping in bytes
+    eg16_table *tables; // lookup table of each profile, NULL until select_eg_table first needs them
+    int refcount; // number of references held by get_atm_store callers and the process-wide store
+
+} eg16_store;
+
+// Process-wide profile store, loaded on first use
+static eg16_store *atm_store = NULL;
+static pthread_mutex_t atm_store_lock = PTHREAD_MUTEX_INITIALIZER;
+
 atm_model init_exp_atm(runparams *run_params, gsl_rng *rng){
     /*
     Initializes the atmospheric model
@@ -68,6 +143,8 @@ atm_model init_exp_atm(runparams *run_params, gsl_rng *rng){
     // Define constants
     atm_model.scale_height = 8000; // scale height in meters
     atm_model.sea_level_density = 1.225; // sea level density in kg/m^3
+    atm_model.table = 0;
+    atm_model.eg_table = NULL;
 
 
     // Non-perturbed branch
@@ -105,10 +182,10 @@ atm_model init_exp_atm(runparams *run_params, gsl_rng *rng){
 
         for (int i = 0; i < 4; i++){
             // Generate perturbations, which are then used by the get_atm_cond function to generate the true conditions
-            atm_model.pert_densities[i] = atm_model.std_densities[i] * gsl_ran_gaussian(rng, 1);
-            atm_model.pert_zonal_winds[i] = atm_model.std_winds[i] * gsl_ran_gaussian(rng, 1);
-            atm_model.pert_meridional_winds[i] = atm_model.std_winds[i] * gsl_ran_gaussian(rng, 1);
-            atm_model.pert_vert_winds[i] = atm_model.std_vert_winds[i] * gsl_ran_gaussian(rng, 1);
+            atm_model.pert_densities[i] = atm_model.std_densities[i] * rng_gaussian(rng, 1);
+            atm_model.pert_zonal_winds[i] = atm_model.std_winds[i] * rng_gaussian(rng, 1);
+            atm_model.pert_meridional_winds[i] = atm_model.std_winds[i] * rng_gaussian(rng, 1);
+            atm_model.pert_vert_winds[i] = atm_model.std_vert_winds[i] * rng_gaussian(rng, 1);
         }
 
     }
@@ -216,6 +293,122 @@ atm_cond get_pert_atm_cond(double altitude, atm_model *atm_model){
     return atm_conditions;
 }
 
+int pert_atm_band(double altitude){
+    /*
+    Returns the altitude band of the perturbed atmospheric model, which indexes its standard deviations and perturbations
+
+    INPUTS:
+    ----------
+        altitude: double
+            altitude in meters
+    OUTPUT:
+    ----------
+        band: int
+            0 below 5 km, 1 below 50 km, 2 below 100 km and 3 above
+    */
+
+    if (altitude < 5000){
+        return 0;
+    }
+    if (altitude < 50000){
+        return 1;
+    }
+    if (altitude < 100000){
+        return 2;
+    }
+    return 3;
+}
+
+void init_atm_table(atm_model *atm_model, eg16_table *eg_table){
+    /*
+    Switches an atmospheric model to table lookups. Each band of the perturbed model stores its log-density at sea
+    level, so the density stays an exact exponential of the altitude. The EarthGRAM 2016 table is shared through the
+    profile store, so nothing is built per flight
+
+    INPUTS:
+    ----------
+        atm_model: atm_model *
+            pointer to the atmospheric model, with its perturbations drawn
+        eg_table: eg16_table *
+            pointer to the table of the EarthGRAM 2016 profile of the flight, NULL for the exponential models
+    */
+
+    for (int i = 0; i < ATM_NUM_BANDS; i++){
+        atm_model->band_log_densities[i] = log(atm_model->sea_level_density * (1 + atm_model->pert_densities[i]));
+    }
+    atm_model->eg_table = eg_table;
+    atm_model->table = 1;
+}
+
+atm_cond get_band_atm_cond(double altitude, atm_model *atm_model){
+    /*
+    Looks up the atmospheric conditions of the perturbed model at a given altitude from the constants of its band
+
+    INPUTS:
+    ----------
+        altitude: double
+            altitude in meters
+        atm_model: atm_model *
+            pointer to the atmospheric model, set up by init_atm_table
+    OUTPUT:
+    ----------
+        atm_conditions: atm_cond
+            local atmospheric conditions
+    */
+
+    atm_cond atm_conditions;
+    if (altitude < 0){
+        altitude = 0;
+    }
+    atm_conditions.altitude = altitude;
+
+    int band = pert_atm_band(altitude);
+    atm_conditions.density = exp(atm_model->band_log_densities[band] - altitude/atm_model->scale_height);
+    atm_conditions.meridional_wind = atm_model->pert_meridional_winds[band];
+    atm_conditions.zonal_wind = atm_model->pert_zonal_winds[band];
+    atm_conditions.vertical_wind = atm_model->pert_vert_winds[band];
+
+    return atm_conditions;
+}
+
+int eg16_bracket(double altitude, eg16_profile *atm_profile){
+    /*
+    Finds the upper end of the profile segment holding an altitude, as the scan in linterp does, in constant time. The
+    profile levels are evenly spaced, so the index is computed from the spacing and only checked against its neighbors
+
+    INPUTS:
+    ----------
+        altitude: double
+            altitude in kilometers
+        atm_profile: eg16_profile *
+            pointer to the EarthGRAM 2016 profile
+    OUTPUT:
+    ----------
+        i: int
+            index of the first profile level at or above the altitude, 0 at or below the lowest level and
+            ATM_NUM_LEVELS - 1 at or above the highest
+    */
+
+    double *alt_data = atm_profile->alt_data;
+    double spacing = (alt_data[ATM_NUM_LEVELS - 1] - alt_data[0]) / (ATM_NUM_LEVELS - 1);
+    double position = ceil((altitude - alt_data[0]) / spacing);
+
+    int i = ATM_NUM_LEVELS - 1;
+    if (position < ATM_NUM_LEVELS - 1){
+        i = position > 0 ? (int) position : 0;
+    }
+
+    // Correct the index where the levels are not exactly evenly spaced
+    while (i > 0 && altitude <= alt_data[i-1]){
+        i--;
+    }
+    while (i < ATM_NUM_LEVELS - 1 && altitude > alt_data[i]){
+        i++;
+    }
+
+    return i;
+}
+
 atm_cond get_eg_atm_cond(double altitude, eg16_profile *atm_profile){
     /*
     Calculates the atmospheric conditions at a given altitude using an EarthGRAM 2016 profile
@@ -249,15 +442,99 @@ atm_cond get_eg_atm_cond(double altitude, eg16_profile *atm_profile){
         return atm_conditions;
     }
 
-    // Use linear interpolation to get the atmospheric conditions
-    atm_conditions.density = linterp(altitude, atm_profile->alt_data, atm_profile->density_data, 100);
-    atm_conditions.meridional_wind = linterp(altitude, atm_profile->alt_data, atm_profile->meridional_wind_data, 100);
-    atm_conditions.zonal_wind = linterp(altitude, atm_profile->alt_data, atm_profile->zonal_wind_data, 100);
-    atm_conditions.vertical_wind = linterp(altitude, atm_profile->alt_data, atm_profile->vertical_wind_data, 100);
+    // Use linear interpolation to get the atmospheric conditions, with every column sharing one bracket
+    int i = eg16_bracket(altitude, atm_profile);
+    if (i == 0){
+        atm_conditions.density = atm_profile->density_data[0];
+        atm_conditions.meridional_wind = atm_profile->meridional_wind_data[0];
+        atm_conditions.zonal_wind = atm_profile->zonal_wind_data[0];
+        atm_conditions.vertical_wind = atm_profile->vertical_wind_data[0];
+        return atm_conditions;
+    }
+
+    double *alt_data = atm_profile->alt_data;
+    double alt_span = alt_data[i] - alt_data[i-1];
+    double alt_offset = altitude - alt_data[i-1];
+    atm_conditions.density = atm_profile->density_data[i-1] + (atm_profile->density_data[i] - atm_profile->density_data[i-1]) * alt_offset / alt_span;
+    atm_conditions.meridional_wind = atm_profile->meridional_wind_data[i-1] + (atm_profile->meridional_wind_data[i] - atm_profile->meridional_wind_data[i-1]) * alt_offset / alt_span;
+    atm_conditions.zonal_wind = atm_profile->zonal_wind_data[i-1] + (atm_profile->zonal_wind_data[i] - atm_profile->zonal_wind_data[i-1]) * alt_offset / alt_span;
+    atm_conditions.vertical_wind = atm_profile->vertical_wind_data[i-1] + (atm_profile->vertical_wind_data[i] - atm_profile->vertical_wind_data[i-1]) * alt_offset / alt_span;
     
     return atm_conditions;
 }
 
+void fill_eg_table(eg16_table *table, eg16_profile *atm_profile){
+    /*
+    Fills the lookup table of an EarthGRAM 2016 profile. Each cell holds one segment between profile levels, with the
+    columns stored together, and get_eg_table_cond interpolates it with the same operations as get_eg_atm_cond
+
+    INPUTS:
+    ----------
+        table: eg16_table *
+            pointer to the table to fill
+        atm_profile: eg16_profile *
+            pointer to the EarthGRAM 2016 profile
+    */
+
+    double *columns[ATM_TABLE_COLUMNS] = {atm_profile->density_data, atm_profile->meridional_wind_data, atm_profile->zonal_wind_data, atm_profile->vertical_wind_data};
+    table->profile = atm_profile;
+    for (int i = 0; i < ATM_NUM_LEVELS; i++){
+        // Below the lowest level the conditions are held constant
+        int lower = i > 0 ? i - 1 : 0;
+        eg16_cell *cell = &table->cells[i];
+        cell->alt = atm_profile->alt_data[lower];
+        cell->span = i > 0 ? atm_profile->alt_data[i] - atm_profile->alt_data[lower] : 1;
+        for (int k = 0; k < ATM_TABLE_COLUMNS; k++){
+            cell->values[k] = columns[k][lower];
+            cell->deltas[k] = columns[k][i] - columns[k][lower];
+        }
+    }
+}
+
+atm_cond get_eg_table_cond(double altitude, eg16_table *table){
+    /*
+    Looks up the atmospheric conditions at a given altitude in the table of an EarthGRAM 2016 profile. The result is
+    identical to get_eg_atm_cond, but the columns of the segment are read from a single cell
+
+    INPUTS:
+    ----------
+        altitude: double
+            altitude in meters
+        table: eg16_table *
+            pointer to the table of the EarthGRAM 2016 profile
+    OUTPUT:
+    ----------
+        atm_conditions: atm_cond
+            local atmospheric conditions
+    */
+
+    atm_cond atm_conditions;
+    altitude = altitude/1000;
+
+    if (altitude < 0){
+        altitude = 0;
+    }
+
+    atm_conditions.altitude = altitude;
+
+    if (altitude > 99){
+        atm_conditions.density = 0;
+        atm_conditions.meridional_wind = 0;
+        atm_conditions.zonal_wind = 0;
+        atm_conditions.vertical_wind = 0;
+        return atm_conditions;
+    }
+
+    eg16_cell *cell = &table->cells[eg16_bracket(altitude, table->profile)];
+    double alt_offset = altitude - cell->alt;
+    atm_conditions.density = cell->values[0] + cell->deltas[0] * alt_offset / cell->span;
+    atm_conditions.meridional_wind = cell->values[1] + cell->deltas[1] * alt_offset / cell->span;
+    atm_conditions.zonal_wind = cell->values[2] + cell->deltas[2] * alt_offset / cell->span;
+    atm_conditions.vertical_wind = cell->values[3] + cell->deltas[3] * alt_offset / cell->span;
+
+    return atm_conditions;
+}
+
 atm_cond get_atm_cond(double altitude, atm_model *exp_atm_model, runparams *run_params, eg16_profile *atm_profile){
     /*
     Calculates the atmospheric conditions at a given altitude
@@ -270,6 +547,8 @@ atm_cond get_atm_cond(double altitude, atm_model *exp_atm_model, runparams *run_
             pointer to the exponential atmospheric model
         run_params: runparams *
             pointer to the run parameters struct
+        atm_profile: eg16_profile *
+            pointer to the EarthGRAM 2016 profile (only used by the EarthGRAM branch)
     OUTPUT:
     ----------
         atm_conditions: atm_cond
@@ -283,12 +562,12 @@ atm_cond get_atm_cond(double altitude, atm_model *exp_atm_model, runparams *run_
     }
     else{
         if (run_params->atm_model == 0){
-            atm_conditions = get_pert_atm_cond(altitude, exp_atm_model);
+            atm_conditions = exp_atm_model->table ? get_band_atm_cond(altitude, exp_atm_model) : get_pert_atm_cond(altitude, exp_atm_model);
         }
         else{
             // EarthGRAM branch
 
-            atm_conditions = get_eg_atm_cond(altitude, atm_profile);
+            atm_conditions = exp_atm_model->table ? get_eg_table_cond(altitude, exp_atm_model->eg_table) : get_eg_atm_cond(altitude, atm_profile);
         }
 
     }
@@ -296,65 +575,431 @@ atm_cond get_atm_cond(double altitude, atm_model *exp_atm_model, runparams *run_
     return atm_conditions;
 }
 
-eg16_profile parse_atm(char* atmprofilepath, int profilenum){
+int parse_atm_profiles(char* atmprofilepath, eg16_profile *profiles){
     /*
-    Parses the atmospheric profile data and updates the 2d atm_data array by selecting only the requested profile
+    Parses every atmospheric profile in the EarthGRAM 2016 text profile file
 
     INPUTS:
     ----------
         atmprofilepath: char *
-            path to the atmospheric profile file
-        profilenum: int
-            index number of the atmospheric profile to use
+            path to the atmospheric profile text file
+        profiles: eg16_profile *
+            pointer to an array of ATM_NUM_PROFILES profiles to fill
     OUTPUTS:
     ----------
-        atm_profile: eg16_profile
-            atmospheric profile struct
-        
+        status: int
+            0 on success, 1 if the file could not be read
     */
-    // Initialize the atmospheric profile struct
-    double atm_data[10000][6];
-    eg16_profile atm_profile;
-    atm_profile.profile_num = profilenum;
 
     // Open the atmospheric profile file
     FILE *fp = fopen(atmprofilepath, "r");
     if (fp == NULL){
         printf("Error opening atmospheric profile file\n");
+        return 1;
     }
 
-    // read the atmospheric profile data delimited by spaces
-    for (int i = 0; i < 100*100; i++){
+    // read the atmospheric profile data delimited by spaces, one altitude level per line
+    double row[6];
+    for (int i = 0; i < ATM_NUM_PROFILES*ATM_NUM_LEVELS; i++){
         for (int j = 0; j < 6; j++){
-            fscanf(fp, "%lfe", &atm_data[i][j]);
+            if (fscanf(fp, "%lfe", &row[j]) != 1){
+                printf("Error reading atmospheric profile file\n");
+                fclose(fp);
+                return 1;
+            }
         }
+        int profilenum = i / ATM_NUM_LEVELS;
+        int level = i % ATM_NUM_LEVELS;
+        profiles[profilenum].profile_num = profilenum;
+        profiles[profilenum].alt_data[level] = row[1];
+        profiles[profilenum].density_data[level] = row[2];
+        profiles[profilenum].meridional_wind_data[level] = row[3];
+        profiles[profilenum].zonal_wind_data[level] = row[4];
+        profiles[profilenum].vertical_wind_data[level] = row[5];
     }
 
-    // print the atmospheric profile data
-    // for (int i = 0; i < 100*100; i++){
-    //     for (int j = 0; j < 6; j++){
-    //         printf("%lf ", atm_data[i][j]);
-    //     }
-    //     printf("\n");
-    // }
-    
-    // Update the atmospheric profile struct by iterating over only the requested profile
-    for (int i = 0; i < 100; i++){
-        atm_profile.alt_data[i] = atm_data[100*profilenum+i][1];
-        atm_profile.density_data[i] = atm_data[100*profilenum+i][2];
-        atm_profile.meridional_wind_data[i] = atm_data[100*profilenum+i][3];
-        atm_profile.zonal_wind_data[i] = atm_data[100*profilenum+i][4];
-        atm_profile.vertical_wind_data[i] = atm_data[100*profilenum+i][5];
+    fclose(fp);
+
+    return 0;
+}
+
+int atm_bin_path(char* atmprofilepath, char *binpath, size_t size){
+    /*
+    Gets the path of the binary profile file that belongs to a text profile file by replacing the extension with .bin
+
+    INPUTS:
+    ----------
+        atmprofilepath: char *
+            path to the atmospheric profile text file
+        binpath: char *
+            buffer for the binary profile file path
+        size: size_t
+            size of the buffer in bytes
+    OUTPUTS:
+    ----------
+        status: int
+            0 on success, 1 if the path does not fit in the buffer
+    */
+
+    size_t length = strlen(atmprofilepath);
+    char *ext = strrchr(atmprofilepath, '.');
+    char *dir = strrchr(atmprofilepath, '/');
+    if (ext != NULL && (dir == NULL || ext > dir)){
+        length = ext - atmprofilepath;
     }
+    if (length + sizeof(".bin") > size){
+        return 1;
+    }
+    memcpy(binpath, atmprofilepath, length);
+    strcpy(binpath + length, ".bin");
 
+    return 0;
+}
 
-    // Print the atmospheric profile data
-    // printf("Profile number: %d\n", atm_profile.profile_num);
-    // for (int i = 0; i < 100; i++){
-    //     printf("Data: %lf %lf %lf %lf %lf\n", atm_profile.alt_data[i], atm_profile.density_data[i], atm_profile.meridional_wind_data[i], atm_profile.zonal_wind_data[i], atm_profile.vertical_wind_data[i]);
-    // }
+int write_atm_bin(char* atmprofilepath, char *binpath){
+    /*
+    Converts the EarthGRAM 2016 text profile file to the binary profile file format. The file is written to a temporary path and renamed, so concurrent readers never see a partial file
 
-    fclose(fp);
+    INPUTS:
+    ----------
+        atmprofilepath: char *
+            path to the atmospheric profile text file
+        binpath: char *
+            path of the binary profile file to write
+    OUTPUTS:
+    ----------
+        status: int
+            0 on success, 1 on failure
+    */
+
+    eg16_profile *profiles = malloc(ATM_NUM_PROFILES * sizeof(eg16_profile));
+    if (profiles == NULL){
+        return 1;
+    }
+    if (parse_atm_profiles(atmprofilepath, profiles) != 0){
+        free(profiles);
+        return 1;
+    }
+    // Zero the padding after the profile number so the file contents are deterministic
+    for (int i = 0; i < ATM_NUM_PROFILES; i++){
+        memset((char *) &profiles[i] + sizeof(int), 0, sizeof(int));
+    }
+
+    eg16_bin_header header;
+    memset(&header, 0, sizeof(header));
+    memcpy(header.magic, ATM_BIN_MAGIC, 8);
+    header.version = ATM_BIN_VERSION;
+    header.num_profiles = ATM_NUM_PROFILES;
+    header.num_levels = ATM_NUM_LEVELS;
+    header.num_columns = ATM_BIN_NUM_COLUMNS;
+    header.record_size = sizeof(eg16_profile);
+    header.data_offset = sizeof(eg16_bin_header);
+
+    // Room for the process id and the .tmp suffix
+    size_t tmpsize = strlen(binpath) + 32;
+    char *tmppath = malloc(tmpsize);
+    if (tmppath == NULL){
+        free(profiles);
+        return 1;
+    }
+    snprintf(tmppath, tmpsize, "%s.%d.tmp", binpath, (int) getpid());
+    FILE *fp = fopen(tmppath, "wb");
+    if (fp == NULL){
+        free(tmppath);
+        free(profiles);
+        return 1;
+    }
+    size_t written = fwrite(&header, sizeof(header), 1, fp);
+    written += fwrite(profiles, sizeof(eg16_profile), ATM_NUM_PROFILES, fp);
+    int status = fclose(fp);
+    free(profiles);
+
+    int failed = written != 1 + ATM_NUM_PROFILES || status != 0 || rename(tmppath, binpath) != 0;
+    if (failed){
+        remove(tmppath);
+    }
+    free(tmppath);
+
+    return failed;
+}
+
+int map_atm_bin(char *binpath, eg16_store *store){
+    /*
+    Memory maps a binary profile file read-only, so that every process using it shares a single page cache copy
+
+    INPUTS:
+    ----------
+        binpath: char *
+            path to the binary profile file
+        store: eg16_store *
+            pointer to the profile store to point at the mapping
+    OUTPUTS:
+    ----------
+        status: int
+            0 on success, 1 if the file is missing or invalid
+    */
+
+    int fd = open(binpath, O_RDONLY);
+    if (fd < 0){
+        return 1;
+    }
+    struct stat file_stat;
+    if (fstat(fd, &file_stat) != 0 || file_stat.st_size < (off_t) sizeof(eg16_bin_header)){
+        close(fd);
+        return 1;
+    }
+    size_t map_size = file_stat.st_size;
+    void *map = mmap(NULL, map_size, PROT_READ, MAP_SHARED, fd, 0);
+    close(fd);
+    if (map == MAP_FAILED){
+        return 1;
+    }
+
+    // Validate the header before using the records
+    eg16_bin_header *header = (eg16_bin_header *) map;
+    if (memcmp(header->magic, ATM_BIN_MAGIC, 8) != 0 || header->version != ATM_BIN_VERSION || header->num_levels != ATM_NUM_LEVELS || header->num_columns != ATM_BIN_NUM_COLUMNS || header->record_size != (int) sizeof(eg16_profile) || header->num_profiles < 1 || header->num_profiles > ATM_NUM_PROFILES || header->data_offset < (int) sizeof(eg16_bin_header) || header->data_offset % sizeof(double) != 0 || (size_t) header->data_offset + (size_t) header->num_profiles * header->record_size > map_size){
+        munmap(map, map_size);
+        return 1;
+    }
+
+    store->map = map;
+    store->map_size = map_size;
+    store->num_profiles = header->num_profiles;
+    store->profiles = (eg16_profile *) ((char *) map + header->data_offset);
+
+    return 0;
+}
+
+void free_atm_profiles(eg16_store *store){
+    /*
+    Releases the memory mapping or heap copy held by a profile store, and the lookup tables of its profiles
+
+    INPUTS:
+    ----------
+        store: eg16_store *
+            pointer to the profile store
+    */
+
+    if (store->map != NULL){
+        munmap(store->map, store->map_size);
+    }
+    else{
+        free(store->profiles);
+    }
+    free(store->tables);
+    store->map = NULL;
+    store->map_size = 0;
+    store->profiles = NULL;
+    store->tables = NULL;
+    store->num_profiles = 0;
+}
+
+int load_atm_profiles(char* atmprofilepath, eg16_store *store){
+    /*
+    Loads every atmospheric profile into a profile store. A path ending in .bin is mapped directly. For a text file, the binary profile file next to it is generated once (and regenerated if the text file is newer) and mapped; if it cannot be written, the text file is parsed into a heap copy instead
+
+    INPUTS:
+    ----------
+        atmprofilepath: char *
+            path to the atmospheric profile file
+        store: eg16_store *
+            pointer to the profile store to fill
+    OUTPUTS:
+    ----------
+        status: int
+            0 on success, 1 if the profiles could not be loaded
+    */
+
+    store->map = NULL;
+    store->map_size = 0;
+    store->profiles = NULL;
+    store->tables = NULL;
+    store->num_profiles = 0;
+    // A cut off path would not match the path of later requests, or would name another file
+    if (strlen(atmprofilepath) >= sizeof(store->path)){
+        printf("Error: Atmospheric profile path is too long\n");
+        return 1;
+    }
+    strcpy(store->path, atmprofilepath);
+
+    size_t length = strlen(atmprofilepath);
+    if (length > 4 && strcmp(atmprofilepath + length - 4, ".bin") == 0){
+        if (map_atm_bin(atmprofilepath, store) != 0){
+            printf("Error opening binary atmospheric profile file\n");
+            return 1;
+        }
+        return 0;
+    }
+
+    // Generate the binary profile file if it is missing or older than the text file
+    char binpath[sizeof(store->path) + 4];
+    if (atm_bin_path(atmprofilepath, binpath, sizeof(binpath)) != 0){
+        printf("Error: Atmospheric profile path is too long\n");
+        return 1;
+    }
+    struct stat txt_stat, bin_stat;
+    int have_txt = stat(atmprofilepath, &txt_stat) == 0;
+    int have_bin = stat(binpath, &bin_stat) == 0;
+    if (!have_bin || (have_txt && txt_stat.st_mtime > bin_stat.st_mtime)){
+        write_atm_bin(atmprofilepath, binpath);
+    }
+    if (map_atm_bin(binpath, store) == 0){
+        return 0;
+    }
+
+    // Fall back to a private heap copy of the text file
+    store->profiles = malloc(ATM_NUM_PROFILES * sizeof(eg16_profile));
+    if (store->profiles == NULL || parse_atm_profiles(atmprofilepath, store->profiles) != 0){
+        free(store->profiles);
+        store->profiles = NULL;
+        return 1;
+    }
+    store->num_profiles = ATM_NUM_PROFILES;
+
+    return 0;
+}
+
+void release_atm_store(eg16_store *store){
+    /*
+    Releases a reference to a profile store returned by get_atm_store. The profiles are freed or unmapped when the last reference is released
+
+    INPUTS:
+    ----------
+        store: eg16_store *
+            pointer to the profile store, or NULL
+    */
+
+    if (store == NULL){
+        return;
+    }
+
+    pthread_mutex_lock(&atm_store_lock);
+    int refcount = --store->refcount;
+    pthread_mutex_unlock(&atm_store_lock);
+
+    if (refcount == 0){
+        free_atm_profiles(store);
+        free(store);
+    }
+}
+
+eg16_store *get_atm_store(char* atmprofilepath){
+    /*
+    Returns a reference to the process-wide atmospheric profile store, loading the profile file the first time it is requested. The store is shared read-only between all flights and threads. Requesting a different file replaces the process-wide store, but a replaced store stays loaded until every reference to it is released with release_atm_store
+
+    INPUTS:
+    ----------
+        atmprofilepath: char *
+            path to the atmospheric profile file
+    OUTPUTS:
+    ----------
+        store: eg16_store *
+            pointer to the loaded profile store
+    */
+
+    pthread_mutex_lock(&atm_store_lock);
+    eg16_store *replaced = NULL;
+    if (atm_store == NULL || strcmp(atm_store->path, atmprofilepath) != 0){
+        eg16_store *loaded = malloc(sizeof(eg16_store));
+        if (loaded == NULL || load_atm_profiles(atmprofilepath, loaded) != 0){
+            pthread_mutex_unlock(&atm_store_lock);
+            exit(1);
+        }
+        // The process-wide store holds its own reference until it is replaced
+        loaded->refcount = 1;
+        replaced = atm_store;
+        atm_store = loaded;
+    }
+    eg16_store *store = atm_store;
+    store->refcount++;
+    pthread_mutex_unlock(&atm_store_lock);
+
+    release_atm_store(replaced);
+
+    return store;
+}
+
+eg16_profile *select_atm_profile(eg16_store *store, int profilenum){
+    /*
+    Selects an atmospheric profile from the profile store by index
+
+    INPUTS:
+    ----------
+        store: eg16_store *
+            pointer to the profile store
+        profilenum: int
+            index number of the atmospheric profile to use
+    OUTPUTS:
+    ----------
+        atm_profile: eg16_profile *
+            pointer to the requested profile
+    */
+
+    if (profilenum < 0 || profilenum >= store->num_profiles){
+        printf("Error: Invalid atmospheric profile number %d\n", profilenum);
+        exit(1);
+    }
+
+    return &store->profiles[profilenum];
+}
+
+eg16_table *select_eg_table(eg16_store *store, int profilenum){
+    /*
+    Selects the lookup table of an atmospheric profile from the profile store. The tables of every profile in the store
+    are built together on first use and freed with the store, so each profile is tabulated once per process
+
+    INPUTS:
+    ----------
+        store: eg16_store *
+            pointer to the profile store
+        profilenum: int
+            index number of the atmospheric profile to use
+    OUTPUTS:
+    ----------
+        table: eg16_table *
+            pointer to the table of the requested profile
+    */
+
+    select_atm_profile(store, profilenum);
+
+    pthread_mutex_lock(&atm_store_lock);
+    if (store->tables == NULL){
+        eg16_table *tables = malloc(store->num_profiles * sizeof(eg16_table));
+        if (tables == NULL){
+            printf("Error: Unable to allocate the atmosphere tables\n");
+            pthread_mutex_unlock(&atm_store_lock);
+            exit(1);
+        }
+        for (int i = 0; i < store->num_profiles; i++){
+            fill_eg_table(&tables[i], &store->profiles[i]);
+        }
+        store->tables = tables;
+    }
+    pthread_mutex_unlock(&atm_store_lock);
+
+    return &store->tables[profilenum];
+}
+
+eg16_profile parse_atm(char* atmprofilepath, int profilenum){
+    /*
+    Returns a copy of the requested atmospheric profile, loading the profile store on first use
+
+    INPUTS:
+    ----------
+        atmprofilepath: char *
+            path to the atmospheric profile file
+        profilenum: int
+            index number of the atmospheric profile to use
+    OUTPUTS:
+    ----------
+        atm_profile: eg16_profile
+            atmospheric profile struct
+        
+    */
+
+    eg16_store *store = get_atm_store(atmprofilepath);
+    eg16_profile atm_profile = *select_atm_profile(store, profilenum);
+    release_atm_store(store);
 
     return atm_profile;
 }
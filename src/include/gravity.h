@@ -4,6 +4,7 @@
 #include <gsl/gsl_rng.h>
 #include <gsl/gsl_randist.h>
 #include "utils.h"
+#include "rng.h"
 
 // Note that the update_gravity function is in the physics.h file
 
@@ -45,7 +46,7 @@ grav init_grav(runparams *run_params, gsl_rng *rng){
     grav.geoid_height_std = 0.05;
     if (run_params->grav_error != 0){
         // Set nonzero geoid height error
-        grav.geoid_height_error = gsl_ran_gaussian(rng, grav.geoid_height_std);
+        grav.geoid_height_error = rng_gaussian(rng, grav.geoid_height_std);
     }
     else {
         grav.geoid_height_error = 0;
@@ -56,4 +57,21 @@ grav init_grav(runparams *run_params, gsl_rng *rng){
     return grav;
 }
 
+double grav_param(grav *grav){
+    /*
+    Calculates the gravitational parameter of the central gravity term used by update_gravity
+
+    INPUTS:
+    ----------
+        grav: grav *
+            pointer to the grav struct
+    OUTPUTS:
+    ----------
+        mu: double
+            gravitational parameter in m^3/s^2
+    */
+
+    return - grav->grav_g0 * (grav->earth_radius + grav->geoid_height_error) * (grav->earth_radius + grav->geoid_height_error);
+}
+
 #endif
\ No newline at end of file
@@ -0,0 +1,431 @@
+#ifndef INTEGRATOR_H
+#define INTEGRATOR_H
+
+#include <math.h>
+#include "utils.h"
+#include "vehicle.h"
+#include "gravity.h"
+#include "atmosphere.h"
+#include "physics.h"
+
+// Define the integrators (values of run_params->integrator)
+#define INTEGRATOR_RK4 0 // fixed-step Runge-Kutta with the accelerations held over the step
+#define INTEGRATOR_DP54 1 // adaptive Dormand-Prince 5(4) with local error control
+
+// Define the step size controller parameters
+#define DP54_SAFETY 0.9 // safety factor on the optimal step size
+#define DP54_MIN_FACTOR 0.2 // smallest step size change factor
+#define DP54_MAX_FACTOR 5.0 // largest step size change factor
+
+// Define a struct to hold the fixed time step schedule
+typedef struct step_schedule{
+    double boost; // time step during boost (s)
+    double exo; // time step above alt_exo after burnout (s)
+    double upper; // time step between alt_dense and alt_exo after burnout (s)
+    double dense; // time step below alt_dense after burnout (s)
+    double alt_exo; // altitude of the top of the atmosphere (m)
+    double alt_dense; // altitude of the top of the dense atmosphere (m)
+
+} step_schedule;
+
+// Define a struct to count the steps taken by the adaptive integrator
+typedef struct integrator_stats{
+    long accepted; // number of accepted steps
+    long rejected; // number of rejected steps
+
+} integrator_stats;
+
+// Define a struct to hold the models needed to evaluate the forces on the true state
+typedef struct force_model{
+    runparams *run_params; // pointer to the run parameters struct
+    vehicle *vehicle; // pointer to the vehicle struct
+    grav *grav; // pointer to the gravity model
+    atm_model *atm_model; // pointer to the exponential atmospheric model
+    eg16_profile *atm_profile; // pointer to the EarthGRAM profile, NULL if unused
+
+} force_model;
+
+double step_band(step_schedule *schedule, double altitude){
+    /*
+    Returns the time step of the altitude band containing an altitude, after burnout
+
+    INPUTS:
+    ----------
+        schedule: step_schedule *
+            pointer to the step size schedule
+        altitude: double
+            altitude in meters
+    OUTPUTS:
+    ----------
+        time_step: double
+            time step in seconds
+    */
+
+    if (altitude > schedule->alt_exo){
+        return schedule->exo;
+    }
+    if (altitude > schedule->alt_dense){
+        return schedule->upper;
+    }
+    return schedule->dense;
+}
+
+step_schedule init_step_schedule(runparams *run_params){
+    /*
+    Builds the step size schedule from the run parameters. A step of zero falls back to time_step_main during boost and
+    above the atmosphere, and to time_step_reentry inside it
+
+    INPUTS:
+    ----------
+        run_params: runparams *
+            pointer to the run parameters struct
+    OUTPUTS:
+    ----------
+        schedule: step_schedule
+            step size schedule
+    */
+
+    step_schedule schedule;
+    schedule.boost = run_params->step_boost > 0 ? run_params->step_boost : run_params->time_step_main;
+    schedule.exo = run_params->step_exo > 0 ? run_params->step_exo : run_params->time_step_main;
+    schedule.upper = run_params->step_upper > 0 ? run_params->step_upper : run_params->time_step_reentry;
+    schedule.dense = run_params->step_dense > 0 ? run_params->step_dense : run_params->time_step_reentry;
+    schedule.alt_exo = run_params->alt_exo;
+    schedule.alt_dense = run_params->alt_dense;
+
+    return schedule;
+}
+
+double get_time_step(step_schedule *schedule, double t, double burn_time, double altitude){
+    /*
+    Returns the time step for the current time and altitude
+
+    INPUTS:
+    ----------
+        schedule: step_schedule *
+            pointer to the step size schedule
+        t: double
+            time in seconds since launch
+        burn_time: double
+            total burn time of the booster in seconds
+        altitude: double
+            altitude in meters
+    OUTPUTS:
+    ----------
+        time_step: double
+            time step in seconds
+    */
+
+    if (t < burn_time){
+        return schedule->boost;
+    }
+
+    return step_band(schedule, altitude);
+}
+
+void update_forces(force_model *model, state *state){
+    /*
+    Evaluates the thrust, gravity and drag accelerations at a state and updates its total acceleration. The lift acceleration is kept from the state, and the step function anomaly timer is not advanced
+
+    INPUTS:
+    ----------
+        model: force_model *
+            pointer to the force model
+        state: state *
+            pointer to the state struct
+    */
+
+    // The vehicle mass at the state time, without touching the vehicle used by the main loop
+    vehicle stage_vehicle = *model->vehicle;
+    update_mass(&stage_vehicle, state->t);
+
+    double altitude = get_altitude(state->x, state->y, state->z);
+    atm_cond atm_cond = get_atm_cond(altitude, model->atm_model, model->run_params, model->atm_profile);
+    double step_timer = 0;
+
+    update_thrust(&stage_vehicle, state);
+    update_gravity(model->grav, state);
+    update_drag(model->run_params, &stage_vehicle, &atm_cond, state, &step_timer);
+
+    state->ax_total = state->ax_grav + state->ax_drag + state->ax_lift + state->ax_thrust;
+    state->ay_total = state->ay_grav + state->ay_drag + state->ay_lift + state->ay_thrust;
+    state->az_total = state->az_grav + state->az_drag + state->az_lift + state->az_thrust;
+}
+
+double dp54step(force_model *model, state *state, double time_step){
+    /*
+    Advances the state by one Dormand-Prince 5(4) step, re-evaluating the forces at every stage. The accelerations of the state at the start of the step are used for the first stage
+
+    INPUTS:
+    ----------
+        model: force_model *
+            pointer to the force model
+        state: state *
+            pointer to the state struct, replaced by the 5th order solution
+        time_step: double
+            time step in seconds
+    OUTPUTS:
+    ----------
+        error: double
+            local error estimate scaled by the tolerances (the step is acceptable if error <= 1)
+    */
+
+    // Dormand-Prince tableau
+    static const double c[7] = {0, 1.0/5, 3.0/10, 4.0/5, 8.0/9, 1, 1};
+    static const double a[7][6] = {
+        {0},
+        {1.0/5},
+        {3.0/40, 9.0/40},
+        {44.0/45, -56.0/15, 32.0/9},
+        {19372.0/6561, -25360.0/2187, 64448.0/6561, -212.0/729},
+        {9017.0/3168, -355.0/33, 46732.0/5247, 49.0/176, -5103.0/18656},
+        {35.0/384, 0, 500.0/1113, 125.0/192, -2187.0/6784, 11.0/84}
+    };
+    // Difference between the 5th and 4th order weights
+    static const double e[7] = {71.0/57600, 0, -71.0/16695, 71.0/1920, -17253.0/339200, 22.0/525, -1.0/40};
+
+    double y0[6] = {state->x, state->y, state->z, state->vx, state->vy, state->vz};
+    double k[7][6];
+    double y[6];
+
+    k[0][0] = state->vx;
+    k[0][1] = state->vy;
+    k[0][2] = state->vz;
+    k[0][3] = state->ax_total;
+    k[0][4] = state->ay_total;
+    k[0][5] = state->az_total;
+
+    struct state stage = *state;
+    for (int s = 1; s < 7; s++){
+        for (int i = 0; i < 6; i++){
+            y[i] = y0[i];
+            for (int j = 0; j < s; j++){
+                y[i] += time_step * a[s][j] * k[j][i];
+            }
+        }
+        stage.t = state->t + c[s] * time_step;
+        stage.x = y[0];
+        stage.y = y[1];
+        stage.z = y[2];
+        stage.vx = y[3];
+        stage.vy = y[4];
+        stage.vz = y[5];
+        update_forces(model, &stage);
+
+        k[s][0] = stage.vx;
+        k[s][1] = stage.vy;
+        k[s][2] = stage.vz;
+        k[s][3] = stage.ax_total;
+        k[s][4] = stage.ay_total;
+        k[s][5] = stage.az_total;
+    }
+
+    // The last stage is evaluated at the 5th order solution, so y holds the new position and velocity
+    double error = 0;
+    for (int i = 0; i < 6; i++){
+        double local_error = 0;
+        for (int s = 0; s < 7; s++){
+            local_error += time_step * e[s] * k[s][i];
+        }
+        double scale = model->run_params->atol + model->run_params->rtol * fmax(fabs(y0[i]), fabs(y[i]));
+        error += (local_error / scale) * (local_error / scale);
+    }
+
+    state->t = state->t + time_step;
+    state->x = y[0];
+    state->y = y[1];
+    state->z = y[2];
+    state->vx = y[3];
+    state->vy = y[4];
+    state->vz = y[5];
+
+    return sqrt(error / 6);
+}
+
+void step_correction(state *state, struct state *rk4_state, struct state *dp54_state){
+    /*
+    Adds the difference between an adaptive step and a fixed-step RK4 step of the same size to a state
+
+    INPUTS:
+    ----------
+        state: state *
+            pointer to the state struct to correct, already advanced by rk4step
+        rk4_state: state *
+            pointer to the true state advanced by rk4step
+        dp54_state: state *
+            pointer to the true state advanced by dp54step
+    */
+
+    state->x += dp54_state->x - rk4_state->x;
+    state->y += dp54_state->y - rk4_state->y;
+    state->z += dp54_state->z - rk4_state->z;
+    state->vx += dp54_state->vx - rk4_state->vx;
+    state->vy += dp54_state->vy - rk4_state->vy;
+    state->vz += dp54_state->vz - rk4_state->vz;
+}
+
+double dp54_adapt(force_model *model, state *state, double *time_step, integrator_stats *stats){
+    /*
+    Advances the state by one accepted Dormand-Prince 5(4) step, shrinking the step until the local error is within the tolerances
+
+    INPUTS:
+    ----------
+        model: force_model *
+            pointer to the force model
+        state: state *
+            pointer to the state struct, advanced by the accepted step
+        time_step: double *
+            pointer to the proposed time step in seconds, replaced by the proposal for the next step
+        stats: integrator_stats *
+            pointer to the step counters, or NULL
+    OUTPUTS:
+    ----------
+        accepted_step: double
+            accepted time step in seconds
+    */
+
+    runparams *run_params = model->run_params;
+
+    double h = fmin(fmax(*time_step, run_params->dt_min), run_params->dt_max);
+
+    while (1){
+        struct state trial = *state;
+        double error = dp54step(model, &trial, h);
+
+        // Optimal step size change, limited to [DP54_MIN_FACTOR, DP54_MAX_FACTOR]
+        double factor = error > 0 ? DP54_SAFETY * pow(error, -0.2) : DP54_MAX_FACTOR;
+        factor = fmin(fmax(factor, DP54_MIN_FACTOR), DP54_MAX_FACTOR);
+
+        if (error <= 1 || h <= run_params->dt_min){
+            *state = trial;
+            if (stats != NULL){
+                stats->accepted++;
+            }
+            *time_step = fmin(fmax(h * factor, run_params->dt_min), run_params->dt_max);
+            return h;
+        }
+
+        if (stats != NULL){
+            stats->rejected++;
+        }
+        h = fmax(h * factor, run_params->dt_min);
+    }
+}
+
+double kepler_time_to_radius(state *state, double mu, double radius){
+    /*
+    Calculates the time for a state on a Keplerian orbit to descend to a given radius
+
+    INPUTS:
+    ----------
+        state: state *
+            pointer to the state struct, above the given radius
+        mu: double
+            gravitational parameter in m^3/s^2
+        radius: double
+            radius to descend to in meters
+    OUTPUTS:
+    ----------
+        time: double
+            time in seconds until the radius is reached on the descending branch of the orbit, or -1 if the orbit
+            does not reach it
+    */
+
+    double r_vec[3] = {state->x, state->y, state->z};
+    double v_vec[3] = {state->vx, state->vy, state->vz};
+    double r = sqrt(r_vec[0]*r_vec[0] + r_vec[1]*r_vec[1] + r_vec[2]*r_vec[2]);
+    double v2 = v_vec[0]*v_vec[0] + v_vec[1]*v_vec[1] + v_vec[2]*v_vec[2];
+    double rv = r_vec[0]*v_vec[0] + r_vec[1]*v_vec[1] + r_vec[2]*v_vec[2];
+
+    if (r <= radius){
+        return -1;
+    }
+
+    // Orbital elements
+    double a = 1 / (2 / r - v2 / mu);
+    double e_vec[3];
+    for (int i = 0; i < 3; i++){
+        e_vec[i] = ((v2 - mu / r) * r_vec[i] - rv * v_vec[i]) / mu;
+    }
+    double e = sqrt(e_vec[0]*e_vec[0] + e_vec[1]*e_vec[1] + e_vec[2]*e_vec[2]);
+    double p = a * (1 - e * e);
+
+    // Only bound orbits with a periapsis below the radius come back down to it
+    if (a <= 0 || e >= 1 || e < 1e-12 || a * (1 - e) >= radius){
+        return -1;
+    }
+
+    // Eccentric anomalies of the current state and of the descending crossing
+    double cos_nu0 = fmin(fmax((p / r - 1) / e, -1), 1);
+    double nu0 = rv >= 0 ? acos(cos_nu0) : 2 * M_PI - acos(cos_nu0);
+    double cos_nu1 = fmin(fmax((p / radius - 1) / e, -1), 1);
+    double nu1 = 2 * M_PI - acos(cos_nu1);
+
+    double E0 = atan2(sqrt(1 - e * e) * sin(nu0), e + cos(nu0));
+    double E1 = atan2(sqrt(1 - e * e) * sin(nu1), e + cos(nu1));
+    if (E0 < 0){
+        E0 += 2 * M_PI;
+    }
+    if (E1 < 0){
+        E1 += 2 * M_PI;
+    }
+
+    double n = sqrt(mu / (a * a * a));
+    double time = ((E1 - e * sin(E1)) - (E0 - e * sin(E0))) / n;
+
+    return time >= 0 ? time : -1;
+}
+
+void kepler_propagate(state *state, double mu, double time){
+    /*
+    Advances a state along its Keplerian orbit using the f and g functions
+
+    INPUTS:
+    ----------
+        state: state *
+            pointer to the state struct, on a bound orbit
+        mu: double
+            gravitational parameter in m^3/s^2
+        time: double
+            time to advance in seconds
+    */
+
+    double r0_vec[3] = {state->x, state->y, state->z};
+    double v0_vec[3] = {state->vx, state->vy, state->vz};
+    double r0 = sqrt(r0_vec[0]*r0_vec[0] + r0_vec[1]*r0_vec[1] + r0_vec[2]*r0_vec[2]);
+    double v2 = v0_vec[0]*v0_vec[0] + v0_vec[1]*v0_vec[1] + v0_vec[2]*v0_vec[2];
+    double sigma0 = (r0_vec[0]*v0_vec[0] + r0_vec[1]*v0_vec[1] + r0_vec[2]*v0_vec[2]) / sqrt(mu);
+
+    double a = 1 / (2 / r0 - v2 / mu);
+    double sqrt_a = sqrt(a);
+    double n = sqrt(mu / (a * a * a));
+
+    // Solve Kepler's equation for the change in eccentric anomaly with Newton's method
+    double dM = n * time;
+    double dE = dM;
+    for (int i = 0; i < 50; i++){
+        double F = dE + sigma0 / sqrt_a * (1 - cos(dE)) - (1 - r0 / a) * sin(dE) - dM;
+        double dF = 1 + sigma0 / sqrt_a * sin(dE) - (1 - r0 / a) * cos(dE);
+        double step = F / dF;
+        dE -= step;
+        if (fabs(step) < 1e-14){
+            break;
+        }
+    }
+
+    double r = a + (r0 - a) * cos(dE) + sigma0 * sqrt_a * sin(dE);
+    double f = 1 - a / r0 * (1 - cos(dE));
+    double g = time - (dE - sin(dE)) / n;
+    double f_dot = - sqrt(mu * a) / (r * r0) * sin(dE);
+    double g_dot = 1 - a / r * (1 - cos(dE));
+
+    state->t = state->t + time;
+    state->x = f * r0_vec[0] + g * v0_vec[0];
+    state->y = f * r0_vec[1] + g * v0_vec[1];
+    state->z = f * r0_vec[2] + g * v0_vec[2];
+    state->vx = f_dot * r0_vec[0] + g_dot * v0_vec[0];
+    state->vy = f_dot * r0_vec[1] + g_dot * v0_vec[1];
+    state->vz = f_dot * r0_vec[2] + g_dot * v0_vec[2];
+}
+
+#endif
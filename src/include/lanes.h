@@ -0,0 +1,336 @@
+#ifndef LANES_H
+#define LANES_H
+
+#include <math.h>
+#include "utils.h"
+#include "vehicle.h"
+#include "gravity.h"
+#include "atmosphere.h"
+#include "physics.h"
+
+// Define the largest number of Monte Carlo samples advanced together by the struct-of-arrays engine
+#define LANES_MAX 16
+
+// Define a struct to store the states of a block of samples in struct-of-arrays layout, one array element per lane.
+// The lift acceleration is not stored, since the lane engine does not fly the maneuverable RV guidance
+typedef struct lane_state{
+    double t[LANES_MAX]; // time in seconds since launch
+    double x[LANES_MAX]; // x-coordinate in meters
+    double y[LANES_MAX]; // y-coordinate in meters
+    double z[LANES_MAX]; // z-coordinate in meters
+    double vx[LANES_MAX]; // x-velocity in meters per second
+    double vy[LANES_MAX]; // y-velocity in meters per second
+    double vz[LANES_MAX]; // z-velocity in meters per second
+    double ax_grav[LANES_MAX]; // x-acceleration due to gravity in meters per second squared
+    double ay_grav[LANES_MAX]; // y-acceleration due to gravity in meters per second squared
+    double az_grav[LANES_MAX]; // z-acceleration due to gravity in meters per second squared
+    double ax_drag[LANES_MAX]; // x-acceleration due to drag in meters per second squared
+    double ay_drag[LANES_MAX]; // y-acceleration due to drag in meters per second squared
+    double az_drag[LANES_MAX]; // z-acceleration due to drag in meters per second squared
+    double ax_thrust[LANES_MAX]; // x-acceleration due to thrust in meters per second squared
+    double ay_thrust[LANES_MAX]; // y-acceleration due to thrust in meters per second squared
+    double az_thrust[LANES_MAX]; // z-acceleration due to thrust in meters per second squared
+    double ax_total[LANES_MAX]; // total x-acceleration in meters per second squared
+    double ay_total[LANES_MAX]; // total y-acceleration in meters per second squared
+    double az_total[LANES_MAX]; // total z-acceleration in meters per second squared
+    double initial_theta_long_pert[LANES_MAX]; // initial perturbation in the longitudinal thrust angle in radians
+    double initial_theta_lat_pert[LANES_MAX]; // initial perturbation in the latitudinal thrust angle in radians
+    double theta_long[LANES_MAX]; // thrust angle in the longitudinal direction in radians
+    double theta_lat[LANES_MAX]; // thrust angle in the latitudinal direction in radians
+
+} lane_state;
+
+// Define a struct to store the atmospheric conditions of a block of samples
+typedef struct lane_atm_cond{
+    double density[LANES_MAX]; // density in kg/m^3
+    double meridional_wind[LANES_MAX]; // meridional wind in m/s
+    double zonal_wind[LANES_MAX]; // zonal wind in m/s
+    double vertical_wind[LANES_MAX]; // vertical wind in m/s
+    int windy; // flag set if any lane has a nonzero wind
+
+} lane_atm_cond;
+
+void lane_set_state(lane_state *lanes, int lane, state *state){
+    /*
+    Copies a state into one lane of a block
+
+    INPUTS:
+    ----------
+        lanes: lane_state *
+            pointer to the block of states
+        lane: int
+            index of the lane
+        state: state *
+            pointer to the state to copy
+    */
+
+    lanes->t[lane] = state->t;
+    lanes->x[lane] = state->x;
+    lanes->y[lane] = state->y;
+    lanes->z[lane] = state->z;
+    lanes->vx[lane] = state->vx;
+    lanes->vy[lane] = state->vy;
+    lanes->vz[lane] = state->vz;
+    lanes->ax_grav[lane] = state->ax_grav;
+    lanes->ay_grav[lane] = state->ay_grav;
+    lanes->az_grav[lane] = state->az_grav;
+    lanes->ax_drag[lane] = state->ax_drag;
+    lanes->ay_drag[lane] = state->ay_drag;
+    lanes->az_drag[lane] = state->az_drag;
+    lanes->ax_thrust[lane] = state->ax_thrust;
+    lanes->ay_thrust[lane] = state->ay_thrust;
+    lanes->az_thrust[lane] = state->az_thrust;
+    lanes->ax_total[lane] = state->ax_total;
+    lanes->ay_total[lane] = state->ay_total;
+    lanes->az_total[lane] = state->az_total;
+    lanes->initial_theta_long_pert[lane] = state->initial_theta_long_pert;
+    lanes->initial_theta_lat_pert[lane] = state->initial_theta_lat_pert;
+    lanes->theta_long[lane] = state->theta_long;
+    lanes->theta_lat[lane] = state->theta_lat;
+}
+
+state lane_get_state(lane_state *lanes, int lane){
+    /*
+    Copies one lane of a block into a state, with zero lift
+
+    INPUTS:
+    ----------
+        lanes: lane_state *
+            pointer to the block of states
+        lane: int
+            index of the lane
+    OUTPUTS:
+    ----------
+        state: state
+            state of the lane
+    */
+
+    state state;
+    state.t = lanes->t[lane];
+    state.x = lanes->x[lane];
+    state.y = lanes->y[lane];
+    state.z = lanes->z[lane];
+    state.vx = lanes->vx[lane];
+    state.vy = lanes->vy[lane];
+    state.vz = lanes->vz[lane];
+    state.ax_grav = lanes->ax_grav[lane];
+    state.ay_grav = lanes->ay_grav[lane];
+    state.az_grav = lanes->az_grav[lane];
+    state.ax_drag = lanes->ax_drag[lane];
+    state.ay_drag = lanes->ay_drag[lane];
+    state.az_drag = lanes->az_drag[lane];
+    state.ax_lift = 0;
+    state.ay_lift = 0;
+    state.az_lift = 0;
+    state.ax_thrust = lanes->ax_thrust[lane];
+    state.ay_thrust = lanes->ay_thrust[lane];
+    state.az_thrust = lanes->az_thrust[lane];
+    state.ax_total = lanes->ax_total[lane];
+    state.ay_total = lanes->ay_total[lane];
+    state.az_total = lanes->az_total[lane];
+    state.initial_theta_long_pert = lanes->initial_theta_long_pert[lane];
+    state.initial_theta_lat_pert = lanes->initial_theta_lat_pert[lane];
+    state.theta_long = lanes->theta_long[lane];
+    state.theta_lat = lanes->theta_lat[lane];
+
+    return state;
+}
+
+void update_gravity_lanes(grav *grav, double *geoid_height_error, lane_state *lanes, int num_lanes){
+    /*
+    Updates the gravitational acceleration components of every lane, as update_gravity does for one state
+
+    INPUTS:
+    ----------
+        grav: grav *
+            pointer to a grav struct holding the constants shared by the lanes
+        geoid_height_error: double *
+            geoid height error of each lane in meters
+        lanes: lane_state *
+            pointer to the block of states
+        num_lanes: int
+            number of lanes in the block
+    */
+
+    for (int i = 0; i < num_lanes; i++){
+        double r = sqrt(lanes->x[i]*lanes->x[i] + lanes->y[i]*lanes->y[i] + lanes->z[i]*lanes->z[i]);
+        double geoid_radius = grav->earth_radius + geoid_height_error[i];
+        double ar_grav = grav->grav_g0 * (geoid_radius * geoid_radius) / (r * r);
+        lanes->ax_grav[i] = ar_grav * lanes->x[i] / r;
+        lanes->ay_grav[i] = ar_grav * lanes->y[i] / r;
+        lanes->az_grav[i] = ar_grav * lanes->z[i] / r;
+    }
+}
+
+void update_drag_lanes(runparams *run_params, vehicle *vehicle, double *mass, lane_atm_cond *atm_cond, lane_state *lanes, int num_lanes){
+    /*
+    Updates the drag acceleration components of every lane, as update_drag does for one state. The step function
+    anomaly is not supported
+
+    INPUTS:
+    ----------
+        run_params: runparams *
+            pointer to the run parameters struct
+        vehicle: vehicle *
+            pointer to the vehicle template, which holds the areas, drag coefficients and burn time
+        mass: double *
+            current mass of each lane in kg
+        atm_cond: lane_atm_cond *
+            pointer to the atmospheric conditions of each lane
+        lanes: lane_state *
+            pointer to the block of states
+        num_lanes: int
+            number of lanes in the block
+    */
+
+    double v_rel_x[LANES_MAX];
+    double v_rel_y[LANES_MAX];
+    double v_rel_z[LANES_MAX];
+    for (int i = 0; i < num_lanes; i++){
+        v_rel_x[i] = lanes->vx[i];
+        v_rel_y[i] = lanes->vy[i];
+        v_rel_z[i] = lanes->vz[i];
+    }
+
+    // The rotation of the wind into Cartesian components needs the trigonometric functions, so it is only done when a
+    // lane has wind
+    if (atm_cond->windy){
+        for (int i = 0; i < num_lanes; i++){
+            double cart_wind[3];
+            double spher_wind[3] = {atm_cond->vertical_wind[i], atm_cond->zonal_wind[i], atm_cond->meridional_wind[i]};
+            double spher_coords[3];
+            double cart_coords[3] = {lanes->x[i], lanes->y[i], lanes->z[i]};
+            cartcoords_to_sphercoords(cart_coords, spher_coords);
+            sphervec_to_cartvec(spher_wind, cart_wind, spher_coords);
+            v_rel_x[i] -= cart_wind[0];
+            v_rel_y[i] -= cart_wind[1];
+            v_rel_z[i] -= cart_wind[2];
+        }
+    }
+
+    for (int i = 0; i < num_lanes; i++){
+        double v_rel_mag = sqrt(v_rel_x[i]*v_rel_x[i] + v_rel_y[i]*v_rel_y[i] + v_rel_z[i]*v_rel_z[i]);
+
+        // Booster drag before burnout, reentry vehicle drag after
+        int reentry = lanes->t[i] > vehicle->booster.total_burn_time;
+        double area = reentry ? vehicle->rv.rv_area : vehicle->booster.area;
+        double c_d_0 = reentry ? vehicle->rv.c_d_0 : vehicle->booster.c_d_0;
+        double a_drag_mag = 0.5 * atm_cond->density[i] * v_rel_mag * v_rel_mag * area * c_d_0 / mass[i];
+        double dynamic_pressure = 0.5 * atm_cond->density[i] * v_rel_mag * v_rel_mag;
+
+        // Anomalous lift for reentry only runs
+        double a_lift = run_params->run_type == 1 ? run_params->cl_pert * dynamic_pressure * vehicle->rv.rv_area / mass[i] : 0;
+
+        // Lanes that are nearly at rest relative to the air have no drag
+        double moving = v_rel_mag < 1e-2 ? 0 : 1;
+        double v_rel_scale = v_rel_mag < 1e-2 ? 1 : v_rel_mag;
+        lanes->ax_drag[i] = moving * (-a_drag_mag * v_rel_x[i] / v_rel_scale);
+        lanes->ay_drag[i] = moving * (-a_drag_mag * v_rel_y[i] / v_rel_scale + a_lift);
+        lanes->az_drag[i] = moving * (-a_drag_mag * v_rel_z[i] / v_rel_scale);
+    }
+}
+
+void update_thrust_lanes(vehicle *vehicle, double *mass, lane_state *lanes, int num_lanes){
+    /*
+    Updates the thrust acceleration components of every lane, as update_thrust does for one state
+
+    INPUTS:
+    ----------
+        vehicle: vehicle *
+            pointer to the vehicle template, which holds the stage parameters
+        mass: double *
+            current mass of each lane in kg
+        lanes: lane_state *
+            pointer to the block of states
+        num_lanes: int
+            number of lanes in the block
+    */
+
+    for (int i = 0; i < num_lanes; i++){
+        double t = lanes->t[i];
+        if (t > vehicle->booster.total_burn_time){
+            lanes->ax_thrust[i] = 0;
+            lanes->ay_thrust[i] = 0;
+            lanes->az_thrust[i] = 0;
+            continue;
+        }
+
+        int stage = 0;
+        if (t > vehicle->booster.burn_time[0]){
+            stage = 1;
+        }
+        if (t > vehicle->booster.burn_time[0] + vehicle->booster.burn_time[1]){
+            stage = 2;
+        }
+        double a_thrust_mag = vehicle->booster.isp0[stage] * vehicle->booster.fuel_burn_rate[stage] / mass[i];
+
+        // Vertical thrust for the beginning of the flight
+        if (t < 5){
+            lanes->ax_thrust[i] = a_thrust_mag;
+            lanes->ay_thrust[i] = 0;
+            lanes->az_thrust[i] = 0;
+            continue;
+        }
+
+        lanes->ax_thrust[i] = a_thrust_mag * cos(lanes->theta_long[i]) * cos(lanes->theta_lat[i]);
+        lanes->ay_thrust[i] = a_thrust_mag * sin(lanes->theta_long[i]) * cos(lanes->theta_lat[i]);
+        lanes->az_thrust[i] = a_thrust_mag * sin(lanes->theta_lat[i]);
+    }
+}
+
+void update_total_lanes(lane_state *lanes, int num_lanes){
+    /*
+    Sums the gravity, drag and thrust accelerations of every lane into the total acceleration
+
+    INPUTS:
+    ----------
+        lanes: lane_state *
+            pointer to the block of states
+        num_lanes: int
+            number of lanes in the block
+    */
+
+    // The lift term of fly() is zero for the lanes, and adding it keeps the sums identical
+    for (int i = 0; i < num_lanes; i++){
+        lanes->ax_total[i] = lanes->ax_grav[i] + lanes->ax_drag[i] + 0.0 + lanes->ax_thrust[i];
+        lanes->ay_total[i] = lanes->ay_grav[i] + lanes->ay_drag[i] + 0.0 + lanes->ay_thrust[i];
+        lanes->az_total[i] = lanes->az_grav[i] + lanes->az_drag[i] + 0.0 + lanes->az_thrust[i];
+    }
+}
+
+void rk4step_lanes(lane_state *lanes, double *time_step, int num_lanes){
+    /*
+    Advances every lane over its own time step, as rk4step does for one state. A lane with a time step of zero is left
+    unchanged, which is how impacted lanes are masked out
+
+    INPUTS:
+    ----------
+        lanes: lane_state *
+            pointer to the block of states
+        time_step: double *
+            time step of each lane in seconds
+        num_lanes: int
+            number of lanes in the block
+    */
+
+    // With the accelerations held over the step, k1 = v, k2 = k3 = v + h/2 a and k4 = v + h a
+    for (int i = 0; i < num_lanes; i++){
+        double h = time_step[i];
+        double k2_x = lanes->vx[i] + 0.5 * h * lanes->ax_total[i];
+        double k2_y = lanes->vy[i] + 0.5 * h * lanes->ay_total[i];
+        double k2_z = lanes->vz[i] + 0.5 * h * lanes->az_total[i];
+        double k4_x = lanes->vx[i] + h * lanes->ax_total[i];
+        double k4_y = lanes->vy[i] + h * lanes->ay_total[i];
+        double k4_z = lanes->vz[i] + h * lanes->az_total[i];
+
+        lanes->t[i] = lanes->t[i] + h;
+        lanes->x[i] = lanes->x[i] + h / 6 * (lanes->vx[i] + 2*k2_x + 2*k2_x + k4_x);
+        lanes->y[i] = lanes->y[i] + h / 6 * (lanes->vy[i] + 2*k2_y + 2*k2_y + k4_y);
+        lanes->z[i] = lanes->z[i] + h / 6 * (lanes->vz[i] + 2*k2_z + 2*k2_z + k4_z);
+        lanes->vx[i] = lanes->vx[i] + h / 6 * (lanes->ax_total[i] + 2*lanes->ax_total[i] + 2*lanes->ax_total[i] + lanes->ax_total[i]);
+        lanes->vy[i] = lanes->vy[i] + h / 6 * (lanes->ay_total[i] + 2*lanes->ay_total[i] + 2*lanes->ay_total[i] + lanes->ay_total[i]);
+        lanes->vz[i] = lanes->vz[i] + h / 6 * (lanes->az_total[i] + 2*lanes->az_total[i] + 2*lanes->az_total[i] + lanes->az_total[i]);
+    }
+}
+
+#endif
@@ -0,0 +1,635 @@
+#ifndef OUTPUT_H
+#define OUTPUT_H
+
+#include <stdio.h>
+#include <stdlib.h>
+#include <string.h>
+#include <stdint.h>
+#include <unistd.h>
+#include <pthread.h>
+#include "utils.h"
+
+// Define the trajectory output formats (values of run_params->traj_output)
+#define TRAJ_OUTPUT_NONE 0 // no trajectory output
+#define TRAJ_OUTPUT_TEXT 1 // comma-separated text
+#define TRAJ_OUTPUT_BINARY 2 // fixed-width float64 records with a schema header
+
+// Define the trajectory record layout
+#define TRAJ_NUM_COLUMNS 31 // number of columns in a trajectory record
+#define TRAJ_COLUMN_NAME_SIZE 32 // size of each column name in the binary header in bytes
+
+// Define the binary trajectory file format
+#define TRAJ_BIN_MAGIC "PYTRAJTR" // magic string at the start of the binary trajectory file
+#define TRAJ_BIN_VERSION 1 // version of the binary trajectory file format
+
+// Define the trajectory buffering
+#define TRAJ_BUFFER_RECORDS 4096 // number of records buffered in memory before they are written to the file
+
+// Define the flight phases used by the trajectory recording policy
+#define TRAJ_PHASE_BOOST 0 // powered flight, before burnout
+#define TRAJ_PHASE_MIDCOURSE 1 // after burnout, above alt_exo
+#define TRAJ_PHASE_REENTRY 2 // after burnout, below alt_exo
+
+// Define the Monte Carlo checkpoint file format
+#define CHECKPOINT_MAGIC "PYTRAJCK" // magic string at the start of the checkpoint file
+#define CHECKPOINT_VERSION 1 // version of the checkpoint file format
+
+// Names of the trajectory record columns, in record order
+static const char *traj_column_names[TRAJ_NUM_COLUMNS] = {
+    "t", "current_mass", "x", "y", "z", "vx", "vy", "vz",
+    "ax_grav", "ay_grav", "az_grav", "ax_drag", "ay_drag", "az_drag",
+    "a_command", "a_lift", "ax_thrust", "ay_thrust", "az_thrust",
+    "ax_total", "ay_total", "az_total",
+    "est_x", "est_y", "est_z", "est_vx", "est_vy", "est_vz",
+    "est_ax_total", "est_ay_total", "est_az_total"
+};
+
+// Define the fixed 64 byte header of the binary trajectory file. It is followed by num_columns column names of
+// column_name_size bytes each, and the float64 records start at data_offset
+typedef struct traj_bin_header{
+    char magic[8]; // TRAJ_BIN_MAGIC
+    int version; // TRAJ_BIN_VERSION
+    int num_columns; // number of float64 columns per record
+    int column_name_size; // size of each null-padded column name in bytes
+    int data_offset; // offset of the first record in bytes
+    char reserved[40]; // reserved, zero filled
+
+} traj_bin_header;
+
+// Define a traj_policy struct to decide which integration steps are recorded
+typedef struct traj_policy{
+    int every; // record every Nth integration step
+    double interval[3]; // minimum time between records in each flight phase (s), 0 records every step
+    long step_count; // number of integration steps seen
+    double last_time; // time of the last record (s)
+
+} traj_policy;
+
+// Define a traj_writer struct to hold an open trajectory output file and its record buffers
+typedef struct traj_writer{
+    int format; // trajectory output format (TRAJ_OUTPUT_TEXT or TRAJ_OUTPUT_BINARY)
+    FILE *file; // trajectory file stream
+
+    double *buffers[2]; // record buffers of TRAJ_BUFFER_RECORDS records each
+    int active; // index of the buffer being filled
+    int num_buffered; // number of records in the active buffer
+
+    int async; // flag to write the buffers from a separate writer thread
+    pthread_t thread; // writer thread
+    pthread_mutex_t lock; // protects the fields below
+    pthread_cond_t cond; // signals a change of pending or closing
+    int pending; // number of records in the buffer handed to the writer thread, -1 if there is none
+    int closing; // flag to stop the writer thread
+
+} traj_writer;
+
+// Define the checkpoint of a Monte Carlo simulation that writes the impact file, stored next to the impact file
+typedef struct mc_checkpoint{
+    char magic[8]; // CHECKPOINT_MAGIC
+    int version; // CHECKPOINT_VERSION
+    int first_run; // index of the first run of the simulation
+    int num_runs; // number of runs of the simulation
+    int completed; // number of runs, in run order, whose impacts are in the impact file
+    long impact_offset; // size of the impact file holding the completed runs in bytes
+    unsigned long base_seed; // GSL_RNG_SEED base seed of the random number generators
+    char rng_name[32]; // name of the default GSL generator type, null padded
+    uint64_t config_hash; // hash of the run parameters that the impacts depend on
+    char reserved[32]; // reserved, zero filled
+
+} mc_checkpoint;
+
+traj_policy init_traj_policy(runparams *run_params){
+    /*
+    Initializes the trajectory recording policy from the run parameters
+
+    INPUTS:
+    ----------
+        run_params: runparams *
+            pointer to the run parameters struct
+    OUTPUTS:
+    ----------
+        policy: traj_policy
+            trajectory recording policy
+    */
+
+    traj_policy policy;
+    policy.every = run_params->traj_every > 1 ? run_params->traj_every : 1;
+    policy.interval[TRAJ_PHASE_BOOST] = run_params->traj_dt_boost;
+    policy.interval[TRAJ_PHASE_MIDCOURSE] = run_params->traj_dt_midcourse;
+    policy.interval[TRAJ_PHASE_REENTRY] = run_params->traj_dt_reentry;
+    policy.step_count = 0;
+    policy.last_time = 0;
+
+    return policy;
+}
+
+int traj_policy_record(traj_policy *policy, double t, int phase){
+    /*
+    Decides whether the state at the end of an integration step is recorded. Must be called once per step
+
+    INPUTS:
+    ----------
+        policy: traj_policy *
+            pointer to the trajectory recording policy
+        t: double
+            time at the end of the step (s)
+        phase: int
+            flight phase (TRAJ_PHASE_BOOST, TRAJ_PHASE_MIDCOURSE or TRAJ_PHASE_REENTRY)
+    OUTPUTS:
+    ----------
+        record: int
+            1 if the state should be recorded, 0 otherwise
+    */
+
+    policy->step_count++;
+    if (policy->step_count % policy->every != 0){
+        return 0;
+    }
+    // Allow for round-off in the accumulated time
+    if (t - policy->last_time < policy->interval[phase] - 1e-9){
+        return 0;
+    }
+
+    policy->last_time = t;
+    return 1;
+}
+
+void traj_write_block(traj_writer *writer, double *buffer, int num_records){
+    /*
+    Writes a block of buffered records to the trajectory file
+
+    INPUTS:
+    ----------
+        writer: traj_writer *
+            pointer to the trajectory writer
+        buffer: double *
+            pointer to the records
+        num_records: int
+            number of records in the buffer
+    */
+
+    if (writer->format == TRAJ_OUTPUT_BINARY){
+        fwrite(buffer, sizeof(double) * TRAJ_NUM_COLUMNS, num_records, writer->file);
+        return;
+    }
+
+    for (int j = 0; j < num_records; j++){
+        double *record = buffer + j * TRAJ_NUM_COLUMNS;
+        for (int i = 0; i < TRAJ_NUM_COLUMNS; i++){
+            fprintf(writer->file, i == 0 ? "%g" : ", %g", record[i]);
+        }
+        fprintf(writer->file, "\n");
+    }
+}
+
+void *traj_writer_thread(void *arg){
+    /*
+    Writer thread: writes each buffer handed over by traj_writer_flush until the writer is closed
+
+    INPUTS:
+    ----------
+        arg: void *
+            pointer to the trajectory writer
+    */
+
+    traj_writer *writer = (traj_writer *)arg;
+
+    pthread_mutex_lock(&writer->lock);
+    while (1){
+        while (writer->pending < 0 && !writer->closing){
+            pthread_cond_wait(&writer->cond, &writer->lock);
+        }
+        if (writer->pending < 0){
+            break;
+        }
+        // The pending buffer is the one not being filled
+        double *buffer = writer->buffers[1 - writer->active];
+        int num_records = writer->pending;
+        pthread_mutex_unlock(&writer->lock);
+
+        traj_write_block(writer, buffer, num_records);
+
+        pthread_mutex_lock(&writer->lock);
+        writer->pending = -1;
+        pthread_cond_broadcast(&writer->cond);
+    }
+    pthread_mutex_unlock(&writer->lock);
+
+    return NULL;
+}
+
+void traj_writer_flush(traj_writer *writer){
+    /*
+    Writes the active buffer to the trajectory file, or hands it to the writer thread and switches to the other buffer
+
+    INPUTS:
+    ----------
+        writer: traj_writer *
+            pointer to the trajectory writer
+    */
+
+    if (writer->num_buffered == 0){
+        return;
+    }
+
+    if (!writer->async){
+        traj_write_block(writer, writer->buffers[writer->active], writer->num_buffered);
+        writer->num_buffered = 0;
+        return;
+    }
+
+    pthread_mutex_lock(&writer->lock);
+    // Wait until the writer thread has finished with the other buffer
+    while (writer->pending >= 0){
+        pthread_cond_wait(&writer->cond, &writer->lock);
+    }
+    writer->pending = writer->num_buffered;
+    writer->active = 1 - writer->active;
+    writer->num_buffered = 0;
+    pthread_cond_broadcast(&writer->cond);
+    pthread_mutex_unlock(&writer->lock);
+}
+
+int traj_writer_open(traj_writer *writer, char *trajectory_path, int format, int async){
+    /*
+    Opens a trajectory file, writes its header and allocates the record buffers
+
+    INPUTS:
+    ----------
+        writer: traj_writer *
+            pointer to the trajectory writer
+        trajectory_path: char *
+            path to the trajectory file
+        format: int
+            trajectory output format (TRAJ_OUTPUT_TEXT or TRAJ_OUTPUT_BINARY)
+        async: int
+            flag to write the buffers from a separate writer thread
+    OUTPUTS:
+    ----------
+        status: int
+            0 on success, 1 if the file could not be opened
+    */
+
+    writer->format = format;
+    writer->file = NULL;
+    writer->buffers[0] = NULL;
+    writer->buffers[1] = NULL;
+    writer->active = 0;
+    writer->num_buffered = 0;
+    writer->async = 0;
+    writer->pending = -1;
+    writer->closing = 0;
+
+    if (format == TRAJ_OUTPUT_BINARY){
+        writer->file = fopen(trajectory_path, "wb");
+        if (writer->file == NULL){
+            printf("Error opening trajectory file\n");
+            return 1;
+        }
+
+        traj_bin_header header;
+        memset(&header, 0, sizeof(header));
+        memcpy(header.magic, TRAJ_BIN_MAGIC, 8);
+        header.version = TRAJ_BIN_VERSION;
+        header.num_columns = TRAJ_NUM_COLUMNS;
+        header.column_name_size = TRAJ_COLUMN_NAME_SIZE;
+        header.data_offset = sizeof(traj_bin_header) + TRAJ_NUM_COLUMNS * TRAJ_COLUMN_NAME_SIZE;
+        fwrite(&header, sizeof(header), 1, writer->file);
+
+        // Write the schema: one null-padded name per column
+        for (int i = 0; i < TRAJ_NUM_COLUMNS; i++){
+            char name[TRAJ_COLUMN_NAME_SIZE];
+            memset(name, 0, sizeof(name));
+            strncpy(name, traj_column_names[i], TRAJ_COLUMN_NAME_SIZE - 1);
+            fwrite(name, sizeof(name), 1, writer->file);
+        }
+    }
+    else{
+        writer->file = fopen(trajectory_path, "w");
+        if (writer->file == NULL){
+            printf("Error opening trajectory file\n");
+            return 1;
+        }
+
+        for (int i = 0; i < TRAJ_NUM_COLUMNS; i++){
+            fprintf(writer->file, i == 0 ? "%s" : ", %s", traj_column_names[i]);
+        }
+        fprintf(writer->file, " \n");
+    }
+
+    // The second buffer is only needed when the buffers are written from a separate thread
+    int num_buffers = async ? 2 : 1;
+    for (int i = 0; i < num_buffers; i++){
+        writer->buffers[i] = malloc(TRAJ_BUFFER_RECORDS * TRAJ_NUM_COLUMNS * sizeof(double));
+        if (writer->buffers[i] == NULL){
+            printf("Error allocating trajectory buffer\n");
+            exit(1);
+        }
+    }
+
+    if (async){
+        pthread_mutex_init(&writer->lock, NULL);
+        pthread_cond_init(&writer->cond, NULL);
+        if (pthread_create(&writer->thread, NULL, traj_writer_thread, writer) == 0){
+            writer->async = 1;
+        }
+        else{
+            // Fall back to writing from the calling thread
+            pthread_mutex_destroy(&writer->lock);
+            pthread_cond_destroy(&writer->cond);
+        }
+    }
+
+    return 0;
+}
+
+void traj_writer_write(traj_writer *writer, double *record){
+    /*
+    Appends a trajectory record to the record buffer, flushing the buffer when it is full
+
+    INPUTS:
+    ----------
+        writer: traj_writer *
+            pointer to the trajectory writer
+        record: double *
+            pointer to the TRAJ_NUM_COLUMNS values of the record
+    */
+
+    if (writer->file == NULL){
+        return;
+    }
+
+    memcpy(writer->buffers[writer->active] + writer->num_buffered * TRAJ_NUM_COLUMNS, record, TRAJ_NUM_COLUMNS * sizeof(double));
+    writer->num_buffered++;
+
+    if (writer->num_buffered == TRAJ_BUFFER_RECORDS){
+        traj_writer_flush(writer);
+    }
+}
+
+void traj_writer_close(traj_writer *writer){
+    /*
+    Writes the remaining records, stops the writer thread and closes the trajectory file
+
+    INPUTS:
+    ----------
+        writer: traj_writer *
+            pointer to the trajectory writer
+    */
+
+    if (writer->file == NULL){
+        return;
+    }
+
+    traj_writer_flush(writer);
+
+    if (writer->async){
+        pthread_mutex_lock(&writer->lock);
+        writer->closing = 1;
+        pthread_cond_broadcast(&writer->cond);
+        pthread_mutex_unlock(&writer->lock);
+        pthread_join(writer->thread, NULL);
+        pthread_mutex_destroy(&writer->lock);
+        pthread_cond_destroy(&writer->cond);
+        writer->async = 0;
+    }
+
+    fclose(writer->file);
+    writer->file = NULL;
+    free(writer->buffers[0]);
+    free(writer->buffers[1]);
+    writer->buffers[0] = NULL;
+    writer->buffers[1] = NULL;
+}
+
+uint64_t fnv1a_hash(uint64_t hash, const void *data, size_t size){
+    /*
+    Continues a 64-bit FNV-1a hash over a block of bytes
+
+    INPUTS:
+    ----------
+        hash: uint64_t
+            hash so far, 14695981039346656037 for an empty input
+        data: const void *
+            pointer to the bytes to add
+        size: size_t
+            number of bytes to add
+    OUTPUTS:
+    ----------
+        hash: uint64_t
+            hash including the bytes
+    */
+
+    const unsigned char *bytes = (const unsigned char *) data;
+    for (size_t i = 0; i < size; i++){
+        hash ^= bytes[i];
+        hash *= 1099511628211ULL;
+    }
+
+    return hash;
+}
+
+// Add a run parameter to the hash of runparams_hash
+#define RUNPARAMS_HASH_FIELD(field) hash = fnv1a_hash(hash, &run_params->field, sizeof(run_params->field))
+
+uint64_t runparams_hash(runparams *run_params){
+    /*
+    Computes the 64-bit FNV-1a hash of the run parameters that the impacts of a Monte Carlo simulation depend on. Each
+    field is hashed on its own, so the padding of the struct does not enter the hash. The paths, the number of threads,
+    the trajectory writer thread and the checkpoint interval do not change the impacts and are left out
+
+    INPUTS:
+    ----------
+        run_params: runparams *
+            pointer to the run parameters struct
+    OUTPUTS:
+    ----------
+        hash: uint64_t
+            hash of the run parameters
+    */
+
+    uint64_t hash = 14695981039346656037ULL;
+    RUNPARAMS_HASH_FIELD(run_type);
+    RUNPARAMS_HASH_FIELD(num_runs);
+    RUNPARAMS_HASH_FIELD(time_step_main);
+    RUNPARAMS_HASH_FIELD(time_step_reentry);
+    RUNPARAMS_HASH_FIELD(traj_output);
+    RUNPARAMS_HASH_FIELD(x_aim);
+    RUNPARAMS_HASH_FIELD(y_aim);
+    RUNPARAMS_HASH_FIELD(z_aim);
+    RUNPARAMS_HASH_FIELD(theta_long);
+    RUNPARAMS_HASH_FIELD(theta_lat);
+    RUNPARAMS_HASH_FIELD(grav_error);
+    RUNPARAMS_HASH_FIELD(atm_model);
+    RUNPARAMS_HASH_FIELD(atm_error);
+    RUNPARAMS_HASH_FIELD(gnss_nav);
+    RUNPARAMS_HASH_FIELD(ins_nav);
+    RUNPARAMS_HASH_FIELD(rv_maneuv);
+    RUNPARAMS_HASH_FIELD(reentry_vel);
+    RUNPARAMS_HASH_FIELD(deflection_time);
+    RUNPARAMS_HASH_FIELD(rv_type);
+    RUNPARAMS_HASH_FIELD(initial_x_error);
+    RUNPARAMS_HASH_FIELD(initial_pos_error);
+    RUNPARAMS_HASH_FIELD(initial_vel_error);
+    RUNPARAMS_HASH_FIELD(initial_angle_error);
+    RUNPARAMS_HASH_FIELD(acc_scale_stability);
+    RUNPARAMS_HASH_FIELD(gyro_bias_stability);
+    RUNPARAMS_HASH_FIELD(gyro_noise);
+    RUNPARAMS_HASH_FIELD(gnss_noise);
+    RUNPARAMS_HASH_FIELD(cl_pert);
+    RUNPARAMS_HASH_FIELD(step_acc_mag);
+    RUNPARAMS_HASH_FIELD(step_acc_hgt);
+    RUNPARAMS_HASH_FIELD(step_acc_dur);
+    RUNPARAMS_HASH_FIELD(traj_every);
+    RUNPARAMS_HASH_FIELD(traj_dt_boost);
+    RUNPARAMS_HASH_FIELD(traj_dt_midcourse);
+    RUNPARAMS_HASH_FIELD(traj_dt_reentry);
+    RUNPARAMS_HASH_FIELD(integrator);
+    RUNPARAMS_HASH_FIELD(rtol);
+    RUNPARAMS_HASH_FIELD(atol);
+    RUNPARAMS_HASH_FIELD(dt_min);
+    RUNPARAMS_HASH_FIELD(dt_max);
+    RUNPARAMS_HASH_FIELD(coast_mode);
+    RUNPARAMS_HASH_FIELD(coast_alt);
+    RUNPARAMS_HASH_FIELD(step_boost);
+    RUNPARAMS_HASH_FIELD(step_exo);
+    RUNPARAMS_HASH_FIELD(step_upper);
+    RUNPARAMS_HASH_FIELD(step_dense);
+    RUNPARAMS_HASH_FIELD(alt_exo);
+    RUNPARAMS_HASH_FIELD(alt_dense);
+    RUNPARAMS_HASH_FIELD(event_location);
+    RUNPARAMS_HASH_FIELD(lanes);
+    RUNPARAMS_HASH_FIELD(rng_mode);
+    RUNPARAMS_HASH_FIELD(seed);
+    RUNPARAMS_HASH_FIELD(sampling);
+    RUNPARAMS_HASH_FIELD(first_run);
+    RUNPARAMS_HASH_FIELD(atm_table);
+
+    return hash;
+}
+
+char *checkpoint_path(char *impact_data_path){
+    /*
+    Builds the path of the checkpoint file of an impact file, allocated to fit however long the impact file path is
+
+    INPUTS:
+    ----------
+        impact_data_path: char *
+            path to the impact file
+    OUTPUTS:
+    ----------
+        path: char *
+            checkpoint path, to be freed by the caller
+    */
+
+    size_t size = strlen(impact_data_path) + sizeof(".ckpt");
+    char *path = malloc(size);
+    if (path == NULL){
+        printf("Error: Could not allocate the checkpoint path\n");
+        exit(1);
+    }
+    snprintf(path, size, "%s.ckpt", impact_data_path);
+
+    return path;
+}
+
+int write_checkpoint(char *impact_data_path, mc_checkpoint *checkpoint){
+    /*
+    Writes the checkpoint of a Monte Carlo simulation. The file is written to a temporary path and renamed, so an
+    interrupted write leaves the previous checkpoint in place
+
+    INPUTS:
+    ----------
+        impact_data_path: char *
+            path to the impact file
+        checkpoint: mc_checkpoint *
+            pointer to the checkpoint, the magic string and version are filled in
+    OUTPUTS:
+    ----------
+        status: int
+            0 on success, 1 on failure
+    */
+
+    memcpy(checkpoint->magic, CHECKPOINT_MAGIC, 8);
+    checkpoint->version = CHECKPOINT_VERSION;
+
+    char *path = checkpoint_path(impact_data_path);
+    // Room for the process id and the .tmp suffix
+    size_t tmpsize = strlen(path) + 32;
+    char *tmppath = malloc(tmpsize);
+    if (tmppath == NULL){
+        free(path);
+        return 1;
+    }
+    snprintf(tmppath, tmpsize, "%s.%d.tmp", path, (int) getpid());
+    FILE *fp = fopen(tmppath, "wb");
+    if (fp == NULL){
+        free(tmppath);
+        free(path);
+        return 1;
+    }
+    size_t written = fwrite(checkpoint, sizeof(mc_checkpoint), 1, fp);
+    int status = fflush(fp);
+    if (status == 0){
+        status = fsync(fileno(fp));
+    }
+    status |= fclose(fp);
+
+    int failed = written != 1 || status != 0 || rename(tmppath, path) != 0;
+    if (failed){
+        remove(tmppath);
+    }
+    free(tmppath);
+    free(path);
+
+    return failed;
+}
+
+int read_checkpoint(char *impact_data_path, mc_checkpoint *checkpoint){
+    /*
+    Reads the checkpoint of a Monte Carlo simulation
+
+    INPUTS:
+    ----------
+        impact_data_path: char *
+            path to the impact file
+        checkpoint: mc_checkpoint *
+            pointer to the checkpoint to fill
+    OUTPUTS:
+    ----------
+        status: int
+            0 on success, 1 if there is no checkpoint file, 2 if the file is not a valid checkpoint
+    */
+
+    char *path = checkpoint_path(impact_data_path);
+    FILE *fp = fopen(path, "rb");
+    free(path);
+    if (fp == NULL){
+        return 1;
+    }
+    size_t num_read = fread(checkpoint, sizeof(mc_checkpoint), 1, fp);
+    fclose(fp);
+
+    if (num_read != 1 || memcmp(checkpoint->magic, CHECKPOINT_MAGIC, 8) != 0 || checkpoint->version != CHECKPOINT_VERSION){
+        return 2;
+    }
+
+    return 0;
+}
+
+void remove_checkpoint(char *impact_data_path){
+    /*
+    Removes the checkpoint file of an impact file, if there is one
+
+    INPUTS:
+    ----------
+        impact_data_path: char *
+            path to the impact file
+    */
+
+    char *path = checkpoint_path(impact_data_path);
+    remove(path);
+    free(path);
+}
+
+#endif
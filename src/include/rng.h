@@ -0,0 +1,679 @@
+#ifndef RNG_H
+#define RNG_H
+
+#include <stdint.h>
+#include <stdlib.h>
+#include <gsl/gsl_rng.h>
+#include <gsl/gsl_randist.h>
+#include <gsl/gsl_cdf.h>
+#include "utils.h"
+
+// Define the random number modes
+#define RNG_MODE_SEQUENTIAL 0 // one gsl_rng_default stream per sample, drawn in order by every subsystem
+#define RNG_MODE_COUNTER 1 // counter-based Philox substreams keyed by (seed, run index, subsystem)
+
+// Define the subsystems that draw random numbers, each with its own substream in the counter-based mode
+#define RNG_STREAM_STATE 0 // initial state errors (init_true_state)
+#define RNG_STREAM_GRAV 1 // geoid height errors (init_grav)
+#define RNG_STREAM_ATM 2 // atmospheric perturbations and EarthGRAM profile number (init_exp_atm)
+#define RNG_STREAM_IMU 3 // initial IMU errors (imu_init)
+#define RNG_STREAM_IMU_UPDATE 4 // gyro random walk (update_imu, update_imu_interval)
+#define RNG_STREAM_GNSS 5 // GNSS measurement noise (gnss_measurement)
+#define RNG_STREAM_IMPACT 6 // direction used for the coriolis shift at impact
+#define RNG_NUM_STREAMS 7 // number of subsystems
+#define RNG_NUM_STATIC_STREAMS 4 // subsystems 0 to 3 draw once per sample, before the flight
+#define RNG_STREAM_SAMPLE 7 // substream of the antithetic and overflow draws of the sampling modes
+#define RNG_STREAM_SEED 8 // substream of the run seed offset of the sequential mode
+
+// Define the sampling modes of the static draws
+#define SAMPLING_RANDOM 0 // pseudo-random draws
+#define SAMPLING_ANTITHETIC 1 // runs 2k and 2k+1 draw opposite standard normals
+#define SAMPLING_SOBOL 2 // run k draws point k of a scrambled Sobol sequence, one dimension per draw
+
+// Define the Sobol sequence constants
+#define SOBOL_DIMS 40 // number of dimensions, further static draws are pseudo-random
+#define SOBOL_BITS 32 // number of bits of each coordinate
+
+// Define the Philox4x32-10 constants
+#define PHILOX_M0 0xD2511F53u // multiplier of the first counter word
+#define PHILOX_M1 0xCD9E8D57u // multiplier of the third counter word
+#define PHILOX_W0 0x9E3779B9u // increment of the first key word
+#define PHILOX_W1 0xBB67AE85u // increment of the second key word
+#define PHILOX_ROUNDS 10 // number of rounds
+
+// Define a struct to hold the state of a Philox4x32-10 generator
+typedef struct philox_state{
+    uint32_t key[2]; // key, set from the seed
+    uint32_t counter[4]; // counter: block index (words 0 and 1), run index (word 2) and subsystem (word 3)
+    uint32_t output[4]; // output block of the counter
+    int position; // next word of the output block to return, 4 when the block is used up
+
+} philox_state;
+
+// Define a struct to hold the state of the generator of the static draws of one sample
+typedef struct sample_state{
+    int sampling; // SAMPLING_ANTITHETIC or SAMPLING_SOBOL
+    uint32_t index; // index of the Sobol point
+    int negate; // flag to mirror the draws, for the second run of an antithetic pair
+    int dim; // number of draws made so far
+    uint32_t scramble[SOBOL_DIMS]; // scrambling seed of each Sobol dimension
+    philox_state base; // generator of the antithetic draws and of the draws past SOBOL_DIMS
+
+} sample_state;
+
+// Define a struct to hold the random number generator of each subsystem of a sample
+typedef struct rng_streams{
+    int mode; // RNG_MODE_SEQUENTIAL or RNG_MODE_COUNTER
+    unsigned long seed; // seed of the streams, GSL_RNG_SEED plus the seed run parameter
+    int sampling; // sampling mode of the static draws
+    gsl_rng *streams[RNG_NUM_STREAMS]; // generator each subsystem draws from
+    gsl_rng *base[RNG_NUM_STREAMS]; // pseudo-random generator of each subsystem, all the same generator in the sequential mode
+    gsl_rng *sample; // generator of the static draws in the antithetic and Sobol modes, NULL otherwise
+
+} rng_streams;
+
+// Primitive polynomial (including its leading and constant terms) and initial direction numbers of each Sobol dimension,
+// from the Joe and Kuo new-joe-kuo-6.21201 table
+static const uint32_t sobol_params[SOBOL_DIMS][9] = {
+    {1, 0, 0, 0, 0, 0, 0, 0, 0},
+    {3, 1, 0, 0, 0, 0, 0, 0, 0},
+    {7, 1, 3, 0, 0, 0, 0, 0, 0},
+    {11, 1, 3, 1, 0, 0, 0, 0, 0},
+    {13, 1, 1, 1, 0, 0, 0, 0, 0},
+    {19, 1, 1, 3, 3, 0, 0, 0, 0},
+    {25, 1, 3, 5, 13, 0, 0, 0, 0},
+    {37, 1, 1, 5, 5, 17, 0, 0, 0},
+    {41, 1, 1, 5, 5, 5, 0, 0, 0},
+    {47, 1, 1, 7, 11, 19, 0, 0, 0},
+    {55, 1, 1, 5, 1, 1, 0, 0, 0},
+    {59, 1, 1, 1, 3, 11, 0, 0, 0},
+    {61, 1, 3, 5, 5, 31, 0, 0, 0},
+    {67, 1, 3, 3, 9, 7, 49, 0, 0},
+    {91, 1, 1, 1, 15, 21, 21, 0, 0},
+    {97, 1, 3, 1, 13, 27, 49, 0, 0},
+    {103, 1, 1, 1, 15, 7, 5, 0, 0},
+    {109, 1, 3, 1, 15, 13, 25, 0, 0},
+    {115, 1, 1, 5, 5, 19, 61, 0, 0},
+    {131, 1, 3, 7, 11, 23, 15, 103, 0},
+    {137, 1, 3, 7, 13, 13, 15, 69, 0},
+    {143, 1, 1, 3, 13, 7, 35, 63, 0},
+    {145, 1, 3, 5, 9, 1, 25, 53, 0},
+    {157, 1, 3, 1, 13, 9, 35, 107, 0},
+    {167, 1, 3, 1, 5, 27, 61, 31, 0},
+    {171, 1, 1, 5, 11, 19, 41, 61, 0},
+    {185, 1, 3, 5, 3, 3, 13, 69, 0},
+    {191, 1, 1, 7, 13, 1, 19, 1, 0},
+    {193, 1, 3, 7, 5, 13, 19, 59, 0},
+    {203, 1, 1, 3, 9, 25, 29, 41, 0},
+    {211, 1, 3, 5, 13, 23, 1, 55, 0},
+    {213, 1, 3, 7, 3, 13, 59, 17, 0},
+    {229, 1, 3, 1, 3, 5, 53, 69, 0},
+    {239, 1, 1, 5, 5, 23, 33, 13, 0},
+    {241, 1, 1, 7, 7, 1, 61, 123, 0},
+    {247, 1, 1, 7, 9, 13, 61, 49, 0},
+    {253, 1, 3, 3, 5, 3, 55, 33, 0},
+    {285, 1, 3, 1, 15, 31, 13, 49, 245},
+    {299, 1, 3, 5, 15, 31, 59, 63, 97},
+    {301, 1, 3, 1, 11, 11, 11, 77, 249}
+};
+
+void philox_block(uint32_t *counter, uint32_t *key, uint32_t *output){
+    /*
+    Computes the Philox4x32-10 output block of a counter
+
+    INPUTS:
+    ----------
+        counter: uint32_t *
+            pointer to the four counter words
+        key: uint32_t *
+            pointer to the two key words
+        output: uint32_t *
+            pointer to the four output words
+    */
+
+    uint32_t c[4] = {counter[0], counter[1], counter[2], counter[3]};
+    uint32_t k[2] = {key[0], key[1]};
+    for (int i = 0; i < PHILOX_ROUNDS; i++){
+        uint64_t product_0 = (uint64_t) PHILOX_M0 * c[0];
+        uint64_t product_1 = (uint64_t) PHILOX_M1 * c[2];
+        uint32_t round[4] = {(uint32_t) (product_1 >> 32) ^ c[1] ^ k[0], (uint32_t) product_1, (uint32_t) (product_0 >> 32) ^ c[3] ^ k[1], (uint32_t) product_0};
+        c[0] = round[0];
+        c[1] = round[1];
+        c[2] = round[2];
+        c[3] = round[3];
+        k[0] += PHILOX_W0;
+        k[1] += PHILOX_W1;
+    }
+    output[0] = c[0];
+    output[1] = c[1];
+    output[2] = c[2];
+    output[3] = c[3];
+}
+
+void philox_set(void *vstate, unsigned long int seed){
+    /*
+    Seeds a Philox generator, as gsl_rng_set does, with the counter at the start of run 0 and subsystem 0
+
+    INPUTS:
+    ----------
+        vstate: void *
+            pointer to the philox_state
+        seed: unsigned long int
+            seed, which becomes the key
+    */
+
+    philox_state *state = (philox_state *) vstate;
+    state->key[0] = (uint32_t) seed;
+    state->key[1] = (uint32_t) ((uint64_t) seed >> 32);
+    state->counter[0] = 0;
+    state->counter[1] = 0;
+    state->counter[2] = 0;
+    state->counter[3] = 0;
+    state->position = 4;
+}
+
+unsigned long int philox_get(void *vstate){
+    /*
+    Returns the next 32 bit word of a Philox generator
+
+    INPUTS:
+    ----------
+        vstate: void *
+            pointer to the philox_state
+    OUTPUTS:
+    ----------
+        word: unsigned long int
+            random integer in [0, 2^32)
+    */
+
+    philox_state *state = (philox_state *) vstate;
+    if (state->position == 4){
+        philox_block(state->counter, state->key, state->output);
+        state->position = 0;
+        // Advance the 64 bit block index
+        state->counter[0]++;
+        if (state->counter[0] == 0){
+            state->counter[1]++;
+        }
+    }
+
+    return state->output[state->position++];
+}
+
+double philox_get_double(void *vstate){
+    /*
+    Returns the next uniform double of a Philox generator
+
+    INPUTS:
+    ----------
+        vstate: void *
+            pointer to the philox_state
+    OUTPUTS:
+    ----------
+        u: double
+            random number in [0, 1)
+    */
+
+    return philox_get(vstate) / 4294967296.0;
+}
+
+// Philox4x32-10 as a GSL generator type, so that it can be used by every gsl_ran function
+static const gsl_rng_type rng_philox_type = {"philox4x32-10", 0xffffffffUL, 0, sizeof(philox_state), &philox_set, &philox_get, &philox_get_double};
+static const gsl_rng_type *rng_philox = &rng_philox_type;
+
+void philox_stream(gsl_rng *rng, unsigned long seed, int run_index, int subsystem){
+    /*
+    Sets a Philox generator to the start of the substream of a run and subsystem. Every substream has 2^64 blocks of
+    four words, so they never overlap
+
+    INPUTS:
+    ----------
+        rng: gsl_rng *
+            pointer to a generator of type rng_philox
+        seed: unsigned long
+            seed of the streams
+        run_index: int
+            index of the Monte Carlo run
+        subsystem: int
+            subsystem drawing from the substream (RNG_STREAM_*)
+    */
+
+    gsl_rng_set(rng, seed);
+    philox_state *state = (philox_state *) gsl_rng_state(rng);
+    state->counter[2] = (uint32_t) run_index;
+    state->counter[3] = (uint32_t) subsystem;
+}
+
+void philox_skip(gsl_rng *rng, unsigned long long num_draws){
+    /*
+    Skips a Philox generator ahead by a number of 32 bit draws in constant time
+
+    INPUTS:
+    ----------
+        rng: gsl_rng *
+            pointer to a generator of type rng_philox
+        num_draws: unsigned long long
+            number of draws to skip
+    */
+
+    philox_state *state = (philox_state *) gsl_rng_state(rng);
+
+    // Position of the next draw counted from the start of the substream
+    uint64_t block = ((uint64_t) state->counter[1] << 32 | state->counter[0]);
+    uint64_t draw = 4 * block - (4 - state->position) + num_draws;
+
+    block = draw / 4;
+    state->counter[0] = (uint32_t) block;
+    state->counter[1] = (uint32_t) (block >> 32);
+    state->position = 4;
+    if (draw % 4 != 0){
+        // Generate the block holding the next draw
+        philox_get(state);
+        state->position = (int) (draw % 4);
+    }
+}
+
+uint32_t sobol_point(uint32_t index, int dim){
+    /*
+    Computes a coordinate of a point of the Sobol sequence, in Gray code order
+
+    INPUTS:
+    ----------
+        index: uint32_t
+            index of the point
+        dim: int
+            dimension of the coordinate, below SOBOL_DIMS
+    OUTPUTS:
+    ----------
+        coordinate: uint32_t
+            coordinate, scaled by 2^32
+    */
+
+    // Direction numbers of the dimension
+    uint32_t poly = sobol_params[dim][0];
+    int degree = 0;
+    while (poly >> (degree + 1)){
+        degree++;
+    }
+    uint32_t directions[SOBOL_BITS];
+    for (int k = 0; k < SOBOL_BITS; k++){
+        if (degree == 0){
+            directions[k] = 1u << (SOBOL_BITS - 1 - k);
+        }
+        else if (k < degree){
+            directions[k] = sobol_params[dim][k + 1] << (SOBOL_BITS - 1 - k);
+        }
+        else{
+            directions[k] = directions[k - degree] ^ (directions[k - degree] >> degree);
+            for (int j = 1; j < degree; j++){
+                if ((poly >> (degree - j)) & 1){
+                    directions[k] ^= directions[k - j];
+                }
+            }
+        }
+    }
+
+    uint32_t gray = index ^ (index >> 1);
+    uint32_t coordinate = 0;
+    for (int k = 0; k < SOBOL_BITS; k++){
+        if ((gray >> k) & 1){
+            coordinate ^= directions[k];
+        }
+    }
+
+    return coordinate;
+}
+
+uint32_t reverse_bits(uint32_t x){
+    /*
+    Reverses the order of the bits of a 32 bit word
+
+    INPUTS:
+    ----------
+        x: uint32_t
+            word
+    OUTPUTS:
+    ----------
+        reversed: uint32_t
+            word with its bits reversed
+    */
+
+    x = ((x >> 1) & 0x55555555u) | ((x & 0x55555555u) << 1);
+    x = ((x >> 2) & 0x33333333u) | ((x & 0x33333333u) << 2);
+    x = ((x >> 4) & 0x0F0F0F0Fu) | ((x & 0x0F0F0F0Fu) << 4);
+    x = ((x >> 8) & 0x00FF00FFu) | ((x & 0x00FF00FFu) << 8);
+
+    return (x >> 16) | (x << 16);
+}
+
+uint32_t sobol_scramble(uint32_t coordinate, uint32_t seed){
+    /*
+    Applies a nested uniform (Owen) scramble to a Sobol coordinate, with the hash-based permutation of Burley (2020)
+
+    INPUTS:
+    ----------
+        coordinate: uint32_t
+            coordinate, scaled by 2^32
+        seed: uint32_t
+            scrambling seed of the dimension
+    OUTPUTS:
+    ----------
+        scrambled: uint32_t
+            scrambled coordinate, scaled by 2^32
+    */
+
+    uint32_t x = reverse_bits(coordinate);
+    x += seed;
+    x ^= x * 0x6c50b47cu;
+    x ^= x * 0xb82f1e52u;
+    x ^= x * 0xc7afe638u;
+    x ^= x * 0x8d22f6e6u;
+
+    return reverse_bits(x);
+}
+
+void sample_set(void *vstate, unsigned long int seed){
+    /*
+    Seeds the generator of the static draws, as gsl_rng_set does. sample_position then selects the sample
+
+    INPUTS:
+    ----------
+        vstate: void *
+            pointer to the sample_state
+        seed: unsigned long int
+            seed of the streams
+    */
+
+    sample_state *state = (sample_state *) vstate;
+    philox_set(&state->base, seed);
+
+    // Derive the scrambling seed of each Sobol dimension from the seed
+    uint32_t counter[4] = {0, 0, 0, RNG_STREAM_SAMPLE};
+    uint32_t output[4];
+    for (int dim = 0; dim < SOBOL_DIMS; dim += 4){
+        counter[0] = (uint32_t) dim;
+        philox_block(counter, state->base.key, output);
+        for (int i = 0; i < 4 && dim + i < SOBOL_DIMS; i++){
+            state->scramble[dim + i] = output[i];
+        }
+    }
+    state->sampling = SAMPLING_SOBOL;
+    state->index = 0;
+    state->negate = 0;
+    state->dim = 0;
+}
+
+double sample_uniform(sample_state *state){
+    /*
+    Returns the next static draw of a sample as a uniform number, before any antithetic mirroring
+
+    INPUTS:
+    ----------
+        state: sample_state *
+            pointer to the sample_state
+    OUTPUTS:
+    ----------
+        u: double
+            random number in (0, 1)
+    */
+
+    uint32_t word;
+    if (state->sampling == SAMPLING_SOBOL && state->dim < SOBOL_DIMS){
+        word = sobol_scramble(sobol_point(state->index, state->dim), state->scramble[state->dim]);
+    }
+    else{
+        word = (uint32_t) philox_get(&state->base);
+    }
+    state->dim++;
+
+    // Centre the draw in its interval, so that it is never 0 or 1
+    return (word + 0.5) / 4294967296.0;
+}
+
+double sample_get_double(void *vstate){
+    /*
+    Returns the next static draw of a sample as a uniform number
+
+    INPUTS:
+    ----------
+        vstate: void *
+            pointer to the sample_state
+    OUTPUTS:
+    ----------
+        u: double
+            random number in (0, 1)
+    */
+
+    sample_state *state = (sample_state *) vstate;
+    double u = sample_uniform(state);
+
+    return state->negate ? 1 - u : u;
+}
+
+unsigned long int sample_get(void *vstate){
+    /*
+    Returns the next static draw of a sample as a 32 bit word
+
+    INPUTS:
+    ----------
+        vstate: void *
+            pointer to the sample_state
+    OUTPUTS:
+    ----------
+        word: unsigned long int
+            random integer in [0, 2^32)
+    */
+
+    return (unsigned long int) (sample_get_double(vstate) * 4294967296.0);
+}
+
+// Generator of the static draws as a GSL generator type, so that gsl_ran_flat and the other gsl_ran functions see the
+// Sobol coordinates and the antithetic draws
+static const gsl_rng_type rng_sample_type = {"sample", 0xffffffffUL, 0, sizeof(sample_state), &sample_set, &sample_get, &sample_get_double};
+static const gsl_rng_type *rng_sample = &rng_sample_type;
+
+void sample_position(gsl_rng *rng, unsigned long seed, int run_index, int sampling){
+    /*
+    Sets the generator of the static draws to the start of a run
+
+    INPUTS:
+    ----------
+        rng: gsl_rng *
+            pointer to a generator of type rng_sample
+        seed: unsigned long
+            seed of the streams
+        run_index: int
+            index of the Monte Carlo run
+        sampling: int
+            SAMPLING_ANTITHETIC or SAMPLING_SOBOL
+    */
+
+    gsl_rng_set(rng, seed);
+    sample_state *state = (sample_state *) gsl_rng_state(rng);
+    state->sampling = sampling;
+    state->index = (uint32_t) run_index;
+    state->negate = 0;
+    if (sampling == SAMPLING_ANTITHETIC){
+        // Both runs of a pair read the substream of the pair, and the second one mirrors it
+        state->base.counter[2] = (uint32_t) (run_index / 2);
+        state->negate = run_index % 2;
+    }
+    else{
+        state->base.counter[2] = (uint32_t) run_index;
+    }
+    state->base.counter[3] = RNG_STREAM_SAMPLE;
+}
+
+double rng_gaussian(gsl_rng *rng, double sigma){
+    /*
+    Draws a Gaussian random number for the static errors of a sample. The generator of the static draws maps its
+    uniform draws through the inverse normal CDF, so that antithetic runs draw exactly opposite numbers and each Sobol
+    dimension gives one normal. Any other generator uses gsl_ran_gaussian
+
+    INPUTS:
+    ----------
+        rng: gsl_rng *
+            pointer to the random number generator
+        sigma: double
+            standard deviation
+    OUTPUTS:
+    ----------
+        x: double
+            Gaussian random number
+    */
+
+    if (rng->type != rng_sample){
+        return gsl_ran_gaussian(rng, sigma);
+    }
+
+    sample_state *state = (sample_state *) gsl_rng_state(rng);
+    double z = gsl_cdf_ugaussian_Pinv(sample_uniform(state));
+
+    return state->negate ? -sigma * z : sigma * z;
+}
+
+rng_streams init_rng_streams(runparams *run_params){
+    /*
+    Allocates the random number generators of a sample, which are then positioned for each run by set_rng_streams
+
+    INPUTS:
+    ----------
+        run_params: runparams *
+            pointer to the run parameters struct
+    OUTPUTS:
+    ----------
+        streams: rng_streams
+            generator of each subsystem
+    */
+
+    rng_streams streams;
+    streams.mode = run_params->rng_mode;
+    streams.sampling = run_params->sampling;
+    streams.seed = gsl_rng_default_seed + (unsigned long) run_params->seed;
+
+    if (streams.mode == RNG_MODE_COUNTER){
+        for (int i = 0; i < RNG_NUM_STREAMS; i++){
+            streams.base[i] = gsl_rng_alloc(rng_philox);
+        }
+    }
+    else{
+        gsl_rng *rng = gsl_rng_alloc(gsl_rng_default);
+        for (int i = 0; i < RNG_NUM_STREAMS; i++){
+            streams.base[i] = rng;
+        }
+    }
+
+    // The static draws come from the sample generator unless they are pseudo-random
+    streams.sample = streams.sampling == SAMPLING_RANDOM ? NULL : gsl_rng_alloc(rng_sample);
+    for (int i = 0; i < RNG_NUM_STREAMS; i++){
+        streams.streams[i] = streams.sample != NULL && i < RNG_NUM_STATIC_STREAMS ? streams.sample : streams.base[i];
+    }
+
+    return streams;
+}
+
+uint32_t mix32(uint32_t x){
+    /*
+    Invertible 32 bit hash (the MurmurHash3 finalizer), which maps 0 to 0 and every other value to a nonzero value
+
+    INPUTS:
+    ----------
+        x: uint32_t
+            value to hash
+    OUTPUTS:
+    ----------
+        hash: uint32_t
+            hashed value
+    */
+
+    x ^= x >> 16;
+    x *= 0x85ebca6bu;
+    x ^= x >> 13;
+    x *= 0xc2b2ae35u;
+    x ^= x >> 16;
+
+    return x;
+}
+
+unsigned long run_seed(unsigned long seed, int run_index){
+    /*
+    Derives the generator seed of a run in the sequential mode. The seed selects an offset from a Philox block, and
+    the offset run index is hashed with mix32. The runs of one seed therefore never share a generator seed, and the
+    runs of different seeds only coincide by chance. The result is never 0, which gsl_rng_set replaces with a default
+    seed for some generators
+
+    INPUTS:
+    ----------
+        seed: unsigned long
+            seed of the streams
+        run_index: int
+            index of the Monte Carlo run
+    OUTPUTS:
+    ----------
+        run_seed: unsigned long
+            seed of the generator of the run
+    */
+
+    uint32_t counter[4] = {0, 0, 0, RNG_STREAM_SEED};
+    uint32_t key[2] = {(uint32_t) seed, (uint32_t) ((uint64_t) seed >> 32)};
+    uint32_t output[4];
+    philox_block(counter, key, output);
+
+    // The offset lies in [1, 2^31], so the offset run index never wraps to 0 for run indices below 2^31
+    uint32_t offset = 1 + (output[0] & 0x7fffffffu);
+
+    return mix32(offset + (uint32_t) run_index);
+}
+
+void set_rng_streams(rng_streams *streams, int run_index){
+    /*
+    Positions the random number generators at the start of a run, so that each sample draws the same numbers
+    regardless of which thread runs it or how many samples come before it
+
+    INPUTS:
+    ----------
+        streams: rng_streams *
+            pointer to the generators of a sample
+        run_index: int
+            index of the Monte Carlo run
+    */
+
+    if (streams->mode == RNG_MODE_COUNTER){
+        for (int i = 0; i < RNG_NUM_STREAMS; i++){
+            philox_stream(streams->base[i], streams->seed, run_index, i);
+        }
+    }
+    else{
+        gsl_rng_set(streams->base[0], run_seed(streams->seed, run_index));
+    }
+
+    if (streams->sample != NULL){
+        sample_position(streams->sample, streams->seed, run_index, streams->sampling);
+    }
+}
+
+void free_rng_streams(rng_streams *streams){
+    /*
+    Frees the random number generators of a sample
+
+    INPUTS:
+    ----------
+        streams: rng_streams *
+            pointer to the generators of a sample
+    */
+
+    int num_generators = streams->mode == RNG_MODE_COUNTER ? RNG_NUM_STREAMS : 1;
+    for (int i = 0; i < num_generators; i++){
+        gsl_rng_free(streams->base[i]);
+    }
+    if (streams->sample != NULL){
+        gsl_rng_free(streams->sample);
+    }
+    for (int i = 0; i < RNG_NUM_STREAMS; i++){
+        streams->streams[i] = NULL;
+        streams->base[i] = NULL;
+    }
+    streams->sample = NULL;
+}
+
+#endif
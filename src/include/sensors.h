@@ -2,6 +2,7 @@
 #define SENSORS_H
 
 #include "utils.h"
+#include "rng.h"
 #include "trajectory.h"
 #include <gsl/gsl_rng.h>
 #include <gsl/gsl_randist.h>
@@ -48,15 +49,15 @@ imu imu_init(runparams *run_params, state *initial_state, gsl_rng *rng){
 
     imu imu;
     imu.acc_scale_stability = run_params->acc_scale_stability;
-    imu.acc_scale_x = imu.acc_scale_stability * gsl_ran_gaussian(rng, 1); // ppm
-    imu.acc_scale_y = imu.acc_scale_stability * gsl_ran_gaussian(rng, 1); // ppm
-    imu.acc_scale_z = imu.acc_scale_stability * gsl_ran_gaussian(rng, 1); // ppm
+    imu.acc_scale_x = imu.acc_scale_stability * rng_gaussian(rng, 1); // ppm
+    imu.acc_scale_y = imu.acc_scale_stability * rng_gaussian(rng, 1); // ppm
+    imu.acc_scale_z = imu.acc_scale_stability * rng_gaussian(rng, 1); // ppm
     
     imu.gyro_bias_stability = run_params->gyro_bias_stability;
     imu.gyro_noise = run_params->gyro_noise;
 
-    imu.gyro_bias_lat = imu.gyro_bias_stability * gsl_ran_gaussian(rng, 1); // rad/s
-    imu.gyro_bias_long = imu.gyro_bias_stability * gsl_ran_gaussian(rng, 1); // rad/s
+    imu.gyro_bias_lat = imu.gyro_bias_stability * rng_gaussian(rng, 1); // rad/s
+    imu.gyro_bias_long = imu.gyro_bias_stability * rng_gaussian(rng, 1); // rad/s
 
     imu.gyro_error_lat = initial_state->initial_theta_lat_pert;
     imu.gyro_error_long = initial_state->initial_theta_long_pert;
@@ -117,6 +118,30 @@ void update_imu(imu *imu, double time_step, gsl_rng *rng){
 
 }
 
+void update_imu_interval(imu *imu, double interval, double time_step, gsl_rng *rng){
+    /*
+    Updates the accelerometer parameters over an interval in one call, drawing the aggregate gyro noise of the
+    interval/time_step updates that update_imu would have made
+
+    INPUTS:
+    ----------
+        imu: imu *
+            pointer to the accelerometer struct
+        interval: double
+            length of the interval in seconds
+        time_step: double
+            time step of the skipped updates in seconds
+        rng: gsl_rng *
+            pointer to the random number generator
+    */
+
+    // The sum of the per-step noise terms is Gaussian with variance gyro_noise^2 * time_step * interval
+    double noise_scale = imu->gyro_noise * sqrt(time_step * interval);
+    imu->gyro_error_long = imu->gyro_error_long + noise_scale * gsl_ran_gaussian(rng, 1) + imu->gyro_bias_long * interval;
+    imu->gyro_error_lat = imu->gyro_error_lat + noise_scale * gsl_ran_gaussian(rng, 1) + imu->gyro_bias_lat * interval;
+
+}
+
 // define a gnss measurement unit struct
 typedef struct gnss{
     double noise; // GNSS noise in meters
@@ -0,0 +1,285 @@
+#ifndef SUMMARY_H
+#define SUMMARY_H
+
+#include <math.h>
+#include <string.h>
+#include "utils.h"
+#include "physics.h"
+
+// Define the streaming quantile estimator
+#define P2_NUM_MARKERS 5 // number of markers of the P-square algorithm
+
+// Define the miss distance quantiles kept by the impact summary
+#define SUMMARY_NUM_QUANTILES 2 // number of quantiles
+#define SUMMARY_QUANTILES {0.5, 0.9} // probabilities of the quantiles (the first one is the CEP)
+
+// Define a struct to hold the P-square estimate of one quantile (Jain and Chlamtac, 1985)
+typedef struct p2_quantile{
+    double p; // probability of the quantile
+    long count; // number of observations
+    double heights[P2_NUM_MARKERS]; // marker heights, the first count observations in sorted order while count < 5
+    double positions[P2_NUM_MARKERS]; // actual marker positions
+    double desired[P2_NUM_MARKERS]; // desired marker positions
+    double increments[P2_NUM_MARKERS]; // increments of the desired marker positions per observation
+
+} p2_quantile;
+
+// Define a struct to hold the running mean and covariance of a two dimensional variable (Welford's algorithm)
+typedef struct welford_2d{
+    long count; // number of observations
+    double mean[2]; // mean
+    double comoment[2][2]; // sum of the products of the deviations from the mean
+
+} welford_2d;
+
+// Define a struct to hold the streaming summary of the impacts of a Monte Carlo simulation
+typedef struct impact_summary{
+    long num_runs; // number of impacts
+    double aim_lon; // longitude of the aimpoint (rad)
+    double aim_lat; // latitude of the aimpoint (rad)
+    double aim[3]; // aimpoint (m)
+
+    p2_quantile miss_quantiles[SUMMARY_NUM_QUANTILES]; // quantiles of the miss distance (m)
+    double miss_mean; // mean miss distance (m)
+    welford_2d offset; // east and north offsets from the aimpoint (m)
+
+    double time_mean; // mean impact time (s)
+    double time_m2; // sum of the squared deviations of the impact time from its mean (s^2)
+    double time_min; // earliest impact time (s)
+    double time_max; // latest impact time (s)
+
+} impact_summary;
+
+p2_quantile p2_init(double p){
+    /*
+    Initializes a P-square quantile estimator
+
+    INPUTS:
+    ----------
+        p: double
+            probability of the quantile
+    OUTPUTS:
+    ----------
+        quantile: p2_quantile
+            quantile estimator with no observations
+    */
+
+    p2_quantile quantile;
+    quantile.p = p;
+    quantile.count = 0;
+    for (int i = 0; i < P2_NUM_MARKERS; i++){
+        quantile.heights[i] = 0;
+        quantile.positions[i] = i + 1;
+    }
+    quantile.desired[0] = 1;
+    quantile.desired[1] = 1 + 2 * p;
+    quantile.desired[2] = 1 + 4 * p;
+    quantile.desired[3] = 3 + 2 * p;
+    quantile.desired[4] = 5;
+    quantile.increments[0] = 0;
+    quantile.increments[1] = p / 2;
+    quantile.increments[2] = p;
+    quantile.increments[3] = (1 + p) / 2;
+    quantile.increments[4] = 1;
+
+    return quantile;
+}
+
+void p2_add(p2_quantile *quantile, double x){
+    /*
+    Adds an observation to a P-square quantile estimator
+
+    INPUTS:
+    ----------
+        quantile: p2_quantile *
+            pointer to the quantile estimator
+        x: double
+            observation
+    */
+
+    double *q = quantile->heights;
+    double *n = quantile->positions;
+
+    // Keep the first observations in sorted order
+    if (quantile->count < P2_NUM_MARKERS){
+        int i = (int) quantile->count;
+        while (i > 0 && q[i - 1] > x){
+            q[i] = q[i - 1];
+            i--;
+        }
+        q[i] = x;
+        quantile->count++;
+        return;
+    }
+    quantile->count++;
+
+    // Find the cell of the observation, extending the extreme markers if needed
+    int k;
+    if (x < q[0]){
+        q[0] = x;
+        k = 0;
+    }
+    else if (x >= q[4]){
+        q[4] = x;
+        k = 3;
+    }
+    else{
+        k = 0;
+        while (x >= q[k + 1]){
+            k++;
+        }
+    }
+
+    for (int i = k + 1; i < P2_NUM_MARKERS; i++){
+        n[i]++;
+    }
+    for (int i = 0; i < P2_NUM_MARKERS; i++){
+        quantile->desired[i] += quantile->increments[i];
+    }
+
+    // Move the middle markers towards their desired positions
+    for (int i = 1; i < 4; i++){
+        double d = quantile->desired[i] - n[i];
+        if ((d >= 1 && n[i + 1] - n[i] > 1) || (d <= -1 && n[i - 1] - n[i] < -1)){
+            double sign = d > 0 ? 1 : -1;
+
+            // Piecewise parabolic prediction, or linear if it would leave the neighbouring heights out of order
+            double parabolic = q[i] + sign / (n[i + 1] - n[i - 1]) * ((n[i] - n[i - 1] + sign) * (q[i + 1] - q[i]) / (n[i + 1] - n[i]) + (n[i + 1] - n[i] - sign) * (q[i] - q[i - 1]) / (n[i] - n[i - 1]));
+            if (q[i - 1] < parabolic && parabolic < q[i + 1]){
+                q[i] = parabolic;
+            }
+            else{
+                int j = i + (int) sign;
+                q[i] = q[i] + sign * (q[j] - q[i]) / (n[j] - n[i]);
+            }
+            n[i] += sign;
+        }
+    }
+}
+
+double p2_value(p2_quantile *quantile){
+    /*
+    Returns the estimate of a P-square quantile estimator. With fewer than 5 observations, the quantile is interpolated
+    exactly between the sorted observations
+
+    INPUTS:
+    ----------
+        quantile: p2_quantile *
+            pointer to the quantile estimator
+    OUTPUTS:
+    ----------
+        value: double
+            estimate of the quantile, NAN with no observations
+    */
+
+    if (quantile->count == 0){
+        return NAN;
+    }
+    if (quantile->count < P2_NUM_MARKERS){
+        double rank = quantile->p * (quantile->count - 1);
+        int i = (int) rank;
+        if (i + 1 >= quantile->count){
+            return quantile->heights[i];
+        }
+        return quantile->heights[i] + (rank - i) * (quantile->heights[i + 1] - quantile->heights[i]);
+    }
+
+    return quantile->heights[2];
+}
+
+void welford_add(welford_2d *welford, double x, double y){
+    /*
+    Adds an observation to the running mean and covariance of a two dimensional variable
+
+    INPUTS:
+    ----------
+        welford: welford_2d *
+            pointer to the running moments
+        x: double
+            first component of the observation
+        y: double
+            second component of the observation
+    */
+
+    double value[2] = {x, y};
+    double deviation[2];
+    welford->count++;
+    for (int i = 0; i < 2; i++){
+        deviation[i] = value[i] - welford->mean[i];
+        welford->mean[i] += deviation[i] / welford->count;
+    }
+    for (int i = 0; i < 2; i++){
+        for (int j = 0; j < 2; j++){
+            welford->comoment[i][j] += deviation[i] * (value[j] - welford->mean[j]);
+        }
+    }
+}
+
+impact_summary init_impact_summary(runparams *run_params){
+    /*
+    Initializes the streaming summary of the impacts of a Monte Carlo simulation
+
+    INPUTS:
+    ----------
+        run_params: runparams *
+            pointer to the run parameters struct, which holds the aimpoint
+    OUTPUTS:
+    ----------
+        summary: impact_summary
+            summary with no impacts
+    */
+
+    impact_summary summary;
+    memset(&summary, 0, sizeof(summary));
+
+    summary.aim[0] = run_params->x_aim;
+    summary.aim[1] = run_params->y_aim;
+    summary.aim[2] = run_params->z_aim;
+    summary.aim_lon = atan2(run_params->y_aim, run_params->x_aim);
+    summary.aim_lat = atan2(run_params->z_aim, sqrt(run_params->x_aim*run_params->x_aim + run_params->y_aim*run_params->y_aim));
+
+    double probabilities[SUMMARY_NUM_QUANTILES] = SUMMARY_QUANTILES;
+    for (int i = 0; i < SUMMARY_NUM_QUANTILES; i++){
+        summary.miss_quantiles[i] = p2_init(probabilities[i]);
+    }
+    summary.time_min = INFINITY;
+    summary.time_max = -INFINITY;
+
+    return summary;
+}
+
+void update_impact_summary(impact_summary *summary, state *impact_state){
+    /*
+    Adds an impact to the streaming summary. The miss distance is measured in the local tangent plane of the aimpoint,
+    as in get_cep in pylib.py
+
+    INPUTS:
+    ----------
+        summary: impact_summary *
+            pointer to the summary
+        impact_state: state *
+            pointer to the impact state
+    */
+
+    double dx = impact_state->x - summary->aim[0];
+    double dy = impact_state->y - summary->aim[1];
+    double dz = impact_state->z - summary->aim[2];
+    double east = -sin(summary->aim_lon)*dx + cos(summary->aim_lon)*dy;
+    double north = -sin(summary->aim_lat)*cos(summary->aim_lon)*dx - sin(summary->aim_lat)*sin(summary->aim_lon)*dy + cos(summary->aim_lat)*dz;
+    double miss = sqrt(east*east + north*north);
+
+    summary->num_runs++;
+    for (int i = 0; i < SUMMARY_NUM_QUANTILES; i++){
+        p2_add(&summary->miss_quantiles[i], miss);
+    }
+    summary->miss_mean += (miss - summary->miss_mean) / summary->num_runs;
+    welford_add(&summary->offset, east, north);
+
+    double deviation = impact_state->t - summary->time_mean;
+    summary->time_mean += deviation / summary->num_runs;
+    summary->time_m2 += deviation * (impact_state->t - summary->time_mean);
+    summary->time_min = fmin(summary->time_min, impact_state->t);
+    summary->time_max = fmax(summary->time_max, impact_state->t);
+}
+
+#endif
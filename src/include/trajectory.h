@@ -10,16 +10,30 @@
 #include "physics.h"
 #include "sensors.h"
 #include "maneuverability.h"
+#include "output.h"
+#include "integrator.h"
+#include "lanes.h"
+#include "rng.h"
+#include "summary.h"
 #include <gsl/gsl_rng.h>
 #include <gsl/gsl_randist.h>
+#include <pthread.h>
 
-// Define a constant upper limit for the number of Monte Carlo runs
-#define MAX_RUNS 1000
+// Define the number of impacts collected in memory before they are written out
+#define IMPACT_BLOCK_SIZE 1024
 
-// Define a struct to store impact data
+// Define the stack size for the Monte Carlo worker threads (the platform default can be as small as 512 kB)
+#define MC_THREAD_STACK_SIZE (16*1024*1024)
+
+// Define the number of columns in an impact record (t, x, y, z, vx, vy, vz)
+#define IMPACT_NUM_COLUMNS 7
+
+// Define a struct to store a block of consecutive impacts
 typedef struct impact_data{
+    int first_run; // index of the first Monte Carlo run in the block
+    int num_states; // number of impacts in the block
     // Impact data
-    state impact_states[MAX_RUNS];
+    state impact_states[IMPACT_BLOCK_SIZE];
 
 } impact_data;
 
@@ -45,33 +59,33 @@ state init_true_state(runparams *run_params, gsl_rng *rng){
     if (run_params->run_type == 0){
         // printf("Initializing full trajectory run\n");
         state.t = 0;
-        state.x = 6371e3 + run_params->initial_x_error * gsl_ran_gaussian(rng, 1);
-        state.y = run_params->initial_pos_error * gsl_ran_gaussian(rng, 1);
-        state.z = run_params->initial_pos_error * gsl_ran_gaussian(rng, 1);
+        state.x = 6371e3 + run_params->initial_x_error * rng_gaussian(rng, 1);
+        state.y = run_params->initial_pos_error * rng_gaussian(rng, 1);
+        state.z = run_params->initial_pos_error * rng_gaussian(rng, 1);
 
-        state.vx = run_params->initial_vel_error * gsl_ran_gaussian(rng, 1);
-        state.vy = run_params->initial_vel_error * gsl_ran_gaussian(rng, 1);
-        state.vz = run_params->initial_vel_error * gsl_ran_gaussian(rng, 1);
+        state.vx = run_params->initial_vel_error * rng_gaussian(rng, 1);
+        state.vy = run_params->initial_vel_error * rng_gaussian(rng, 1);
+        state.vz = run_params->initial_vel_error * rng_gaussian(rng, 1);
         
     }
     // branch for initializing reentry only run
     if (run_params->run_type == 1){
         // printf("Initializing reentry only run\n");
         state.t = 0;
-        state.x = 6371e3 + 500e3 + run_params->initial_x_error * gsl_ran_gaussian(rng, 1);
-        state.y = run_params->initial_pos_error * gsl_ran_gaussian(rng, 1);
-        state.z = run_params->initial_pos_error * gsl_ran_gaussian(rng, 1);
+        state.x = 6371e3 + 500e3 + run_params->initial_x_error * rng_gaussian(rng, 1);
+        state.y = run_params->initial_pos_error * rng_gaussian(rng, 1);
+        state.z = run_params->initial_pos_error * rng_gaussian(rng, 1);
 
-        state.vx = -run_params->reentry_vel + run_params->initial_vel_error * gsl_ran_gaussian(rng, 1);
-        state.vy = run_params->initial_vel_error * gsl_ran_gaussian(rng, 1);
-        state.vz = run_params->initial_vel_error * gsl_ran_gaussian(rng, 1);
+        state.vx = -run_params->reentry_vel + run_params->initial_vel_error * rng_gaussian(rng, 1);
+        state.vy = run_params->initial_vel_error * rng_gaussian(rng, 1);
+        state.vz = run_params->initial_vel_error * rng_gaussian(rng, 1);
 
     }
     
-    double initial_rot_pert = run_params->initial_angle_error * gsl_ran_gaussian(rng, 1);
+    double initial_rot_pert = run_params->initial_angle_error * rng_gaussian(rng, 1);
 
-    state.initial_theta_lat_pert = run_params->initial_angle_error * gsl_ran_gaussian(rng, 1) + run_params->theta_long * initial_rot_pert - fabs(run_params->theta_lat * initial_rot_pert);
-    state.initial_theta_long_pert = run_params->initial_angle_error * gsl_ran_gaussian(rng, 1) - run_params->theta_lat * initial_rot_pert - fabs(run_params->theta_long * initial_rot_pert);
+    state.initial_theta_lat_pert = run_params->initial_angle_error * rng_gaussian(rng, 1) + run_params->theta_long * initial_rot_pert - fabs(run_params->theta_lat * initial_rot_pert);
+    state.initial_theta_long_pert = run_params->initial_angle_error * rng_gaussian(rng, 1) - run_params->theta_lat * initial_rot_pert - fabs(run_params->theta_long * initial_rot_pert);
     state.theta_long = run_params->theta_long + state.initial_theta_long_pert;
     state.theta_lat = run_params->theta_lat + state.initial_theta_lat_pert;
         
@@ -159,6 +173,52 @@ state init_est_state(runparams *run_params){
     return state;
 }
 
+state state_linterp(state *state_0, state *state_1, double interp_factor){
+    /*
+    Performs a linear interpolation between two states
+
+    INPUTS:
+    ----------
+        state_0: state *
+            pointer to initial state of the vehicle
+        state_1: state *
+            pointer to final state of the vehicle
+        interp_factor: double
+            interpolation factor, 0 at state_0 and 1 at state_1
+    OUTPUTS:
+    ----------
+        interp_state: state
+            interpolated state of the vehicle
+    */
+
+    state interp_state = *state_0;
+    interp_state.t = state_0->t + interp_factor * (state_1->t - state_0->t);
+    interp_state.x = state_0->x + interp_factor * (state_1->x - state_0->x);
+    interp_state.y = state_0->y + interp_factor * (state_1->y - state_0->y);
+    interp_state.z = state_0->z + interp_factor * (state_1->z - state_0->z);
+    interp_state.vx = state_0->vx + interp_factor * (state_1->vx - state_0->vx);
+    interp_state.vy = state_0->vy + interp_factor * (state_1->vy - state_0->vy);
+    interp_state.vz = state_0->vz + interp_factor * (state_1->vz - state_0->vz);
+    interp_state.ax_grav = state_0->ax_grav + interp_factor * (state_1->ax_grav - state_0->ax_grav);
+    interp_state.ay_grav = state_0->ay_grav + interp_factor * (state_1->ay_grav - state_0->ay_grav);
+    interp_state.az_grav = state_0->az_grav + interp_factor * (state_1->az_grav - state_0->az_grav);
+    interp_state.ax_drag = state_0->ax_drag + interp_factor * (state_1->ax_drag - state_0->ax_drag);
+    interp_state.ay_drag = state_0->ay_drag + interp_factor * (state_1->ay_drag - state_0->ay_drag);
+    interp_state.az_drag = state_0->az_drag + interp_factor * (state_1->az_drag - state_0->az_drag);
+    interp_state.ax_lift = state_0->ax_lift + interp_factor * (state_1->ax_lift - state_0->ax_lift);
+    interp_state.ay_lift = state_0->ay_lift + interp_factor * (state_1->ay_lift - state_0->ay_lift);
+    interp_state.az_lift = state_0->az_lift + interp_factor * (state_1->az_lift - state_0->az_lift);
+    interp_state.ax_thrust = state_0->ax_thrust + interp_factor * (state_1->ax_thrust - state_0->ax_thrust);
+    interp_state.ay_thrust = state_0->ay_thrust + interp_factor * (state_1->ay_thrust - state_0->ay_thrust);
+    interp_state.az_thrust = state_0->az_thrust + interp_factor * (state_1->az_thrust - state_0->az_thrust);
+    interp_state.ax_total = state_0->ax_total + interp_factor * (state_1->ax_total - state_0->ax_total);
+    interp_state.ay_total = state_0->ay_total + interp_factor * (state_1->ay_total - state_0->ay_total);
+    interp_state.az_total = state_0->az_total + interp_factor * (state_1->az_total - state_0->az_total);
+
+
+    return interp_state;
+}
+
 state impact_linterp(state *state_0, state *state_1){
     /*
     Performs a spatial linear interpolation between two states to find the impact point, velocity, and time
@@ -181,59 +241,256 @@ state impact_linterp(state *state_0, state *state_1){
     double interp_factor = altitude_0 / (altitude_0 - altitude_1);
 
     // Perform the interpolation
-    state impact_state = *state_0;
-    impact_state.t = state_0->t + interp_factor * (state_1->t - state_0->t);
-    impact_state.x = state_0->x + interp_factor * (state_1->x - state_0->x);
-    impact_state.y = state_0->y + interp_factor * (state_1->y - state_0->y);
-    impact_state.z = state_0->z + interp_factor * (state_1->z - state_0->z);
-    impact_state.vx = state_0->vx + interp_factor * (state_1->vx - state_0->vx);
-    impact_state.vy = state_0->vy + interp_factor * (state_1->vy - state_0->vy);
-    impact_state.vz = state_0->vz + interp_factor * (state_1->vz - state_0->vz);
-    impact_state.ax_grav = state_0->ax_grav + interp_factor * (state_1->ax_grav - state_0->ax_grav);
-    impact_state.ay_grav = state_0->ay_grav + interp_factor * (state_1->ay_grav - state_0->ay_grav);
-    impact_state.az_grav = state_0->az_grav + interp_factor * (state_1->az_grav - state_0->az_grav);
-    impact_state.ax_drag = state_0->ax_drag + interp_factor * (state_1->ax_drag - state_0->ax_drag);
-    impact_state.ay_drag = state_0->ay_drag + interp_factor * (state_1->ay_drag - state_0->ay_drag);
-    impact_state.az_drag = state_0->az_drag + interp_factor * (state_1->az_drag - state_0->az_drag);
-    impact_state.ax_lift = state_0->ax_lift + interp_factor * (state_1->ax_lift - state_0->ax_lift);
-    impact_state.ay_lift = state_0->ay_lift + interp_factor * (state_1->ay_lift - state_0->ay_lift);
-    impact_state.az_lift = state_0->az_lift + interp_factor * (state_1->az_lift - state_0->az_lift);
-    impact_state.ax_thrust = state_0->ax_thrust + interp_factor * (state_1->ax_thrust - state_0->ax_thrust);
-    impact_state.ay_thrust = state_0->ay_thrust + interp_factor * (state_1->ay_thrust - state_0->ay_thrust);
-    impact_state.az_thrust = state_0->az_thrust + interp_factor * (state_1->az_thrust - state_0->az_thrust);
-    impact_state.ax_total = state_0->ax_total + interp_factor * (state_1->ax_total - state_0->ax_total);
-    impact_state.ay_total = state_0->ay_total + interp_factor * (state_1->ay_total - state_0->ay_total);
-    impact_state.az_total = state_0->az_total + interp_factor * (state_1->az_total - state_0->az_total);
-
-
-    return impact_state;
+    return state_linterp(state_0, state_1, interp_factor);
+}
+
+double hermite_altitude(state *state_0, state *state_1, double t, double *position, double *velocity){
+    /*
+    Evaluates the cubic Hermite interpolant of the position between two states, built from their positions and
+    velocities, and returns the altitude
+
+    INPUTS:
+    ----------
+        state_0: state *
+            pointer to the state at the start of the step
+        state_1: state *
+            pointer to the state at the end of the step
+        t: double
+            time in seconds, between state_0->t and state_1->t
+        position: double *
+            pointer to the interpolated position (x, y, z) in meters, or NULL
+        velocity: double *
+            pointer to the interpolated velocity (vx, vy, vz) in meters per second, or NULL
+    OUTPUTS:
+    ----------
+        altitude: double
+            interpolated altitude in meters
+    */
+
+    double h = state_1->t - state_0->t;
+    double s = (t - state_0->t) / h;
+
+    // Hermite basis functions and their derivatives with respect to s
+    double h00 = 2*s*s*s - 3*s*s + 1;
+    double h10 = s*s*s - 2*s*s + s;
+    double h01 = -2*s*s*s + 3*s*s;
+    double h11 = s*s*s - s*s;
+    double dh00 = 6*s*s - 6*s;
+    double dh10 = 3*s*s - 4*s + 1;
+    double dh01 = -6*s*s + 6*s;
+    double dh11 = 3*s*s - 2*s;
+
+    double p0[3] = {state_0->x, state_0->y, state_0->z};
+    double v0[3] = {state_0->vx, state_0->vy, state_0->vz};
+    double p1[3] = {state_1->x, state_1->y, state_1->z};
+    double v1[3] = {state_1->vx, state_1->vy, state_1->vz};
+
+    double p[3];
+    for (int i = 0; i < 3; i++){
+        p[i] = h00 * p0[i] + h10 * h * v0[i] + h01 * p1[i] + h11 * h * v1[i];
+        if (position != NULL){
+            position[i] = p[i];
+        }
+        if (velocity != NULL){
+            velocity[i] = (dh00 * p0[i] + dh01 * p1[i]) / h + dh10 * v0[i] + dh11 * v1[i];
+        }
+    }
+
+    return get_altitude(p[0], p[1], p[2]);
+}
+
+int locate_altitude_event(state *state_0, state *state_1, double altitude, state *event_state){
+    /*
+    Locates the crossing of an altitude within a step with a bracketed root solve on the cubic Hermite interpolant of
+    the position. The acceleration components are interpolated linearly
+
+    INPUTS:
+    ----------
+        state_0: state *
+            pointer to the state at the start of the step
+        state_1: state *
+            pointer to the state at the end of the step
+        altitude: double
+            altitude of the event in meters
+        event_state: state *
+            pointer to the state at the crossing, set if the altitude is crossed
+    OUTPUTS:
+    ----------
+        crossed: int
+            1 if the altitude is crossed within the step, 0 otherwise
+    */
+
+    double t_a = state_0->t;
+    double t_b = state_1->t;
+    double f_a = get_altitude(state_0->x, state_0->y, state_0->z) - altitude;
+    double f_b = get_altitude(state_1->x, state_1->y, state_1->z) - altitude;
+
+    if (t_b <= t_a || (f_a > 0) == (f_b > 0)){
+        return 0;
+    }
+
+    // Illinois variant of the false position method, which keeps the root bracketed
+    int side = 0;
+    double t = t_a;
+    for (int i = 0; i < 100; i++){
+        t = (t_a * f_b - t_b * f_a) / (f_b - f_a);
+        double f = hermite_altitude(state_0, state_1, t, NULL, NULL) - altitude;
+        if (fabs(f) < 1e-6 || t_b - t_a < 1e-12){
+            break;
+        }
+        if ((f > 0) == (f_b > 0)){
+            t_b = t;
+            f_b = f;
+            if (side == -1){
+                f_a /= 2;
+            }
+            side = -1;
+        }
+        else{
+            t_a = t;
+            f_a = f;
+            if (side == 1){
+                f_b /= 2;
+            }
+            side = 1;
+        }
+    }
+
+    double position[3];
+    double velocity[3];
+    hermite_altitude(state_0, state_1, t, position, velocity);
+
+    *event_state = state_linterp(state_0, state_1, (t - state_0->t) / (state_1->t - state_0->t));
+    event_state->t = t;
+    event_state->x = position[0];
+    event_state->y = position[1];
+    event_state->z = position[2];
+    event_state->vx = velocity[0];
+    event_state->vy = velocity[1];
+    event_state->vz = velocity[2];
+
+    return 1;
+}
+
+state impact_event(state *state_0, state *state_1){
+    /*
+    Locates the impact (zero altitude) within a step, falling back to impact_linterp if the step does not cross the
+    surface
+
+    INPUTS:
+    ----------
+        state_0: state *
+            pointer to the state at the start of the step
+        state_1: state *
+            pointer to the state at the end of the step
+    OUTPUTS:
+    ----------
+        impact_state: state
+            state of the vehicle at impact
+    */
+
+    state impact_state;
+    if (locate_altitude_event(state_0, state_1, 0, &impact_state)){
+        return impact_state;
+    }
+
+    return impact_linterp(state_0, state_1);
 }
 
-void output_impact(FILE *impact_file, impact_data *impact_data, int num_runs){
+void output_impact(FILE *impact_file, impact_data *impact_data){
     /*
-    Function that outputs the impact data struct to the impact file
+    Function that appends a block of impacts to the impact file
     
     INPUTS:
     ----------
         impact_file: * FILE
             Pointer to the impact file stream
         impact_data: * impact_data
-            Pointer to the impact data struct
-        num_runs: int
-            Number of Monte Carlo runs
+            Pointer to the impact data block
     */
 
-    // Iterate through the number of runs and output the impact data
-    for (int i = 0; i < num_runs; i++){
+    // Iterate through the impacts in the block and output the impact data
+    for (int i = 0; i < impact_data->num_states; i++){
         fprintf(impact_file, "%f, %f, %f, %f, %f, %f, %f\n", impact_data->impact_states[i].t, impact_data->impact_states[i].x, impact_data->impact_states[i].y, impact_data->impact_states[i].z, impact_data->impact_states[i].vx, impact_data->impact_states[i].vy, impact_data->impact_states[i].vz);
     }
-
-    // Close the impact file
-    fclose(impact_file);
     
 }
 
-state fly(runparams *run_params, state *initial_state, vehicle *vehicle, gsl_rng *rng){
+void impact_record(state *impact_state, double *record){
+    /*
+    Function that copies an impact state into an impact record with the same columns as the impact file
+
+    INPUTS:
+    ----------
+        impact_state: state *
+            pointer to the impact state
+        record: double *
+            pointer to the IMPACT_NUM_COLUMNS doubles of the record
+    */
+
+    record[0] = impact_state->t;
+    record[1] = impact_state->x;
+    record[2] = impact_state->y;
+    record[3] = impact_state->z;
+    record[4] = impact_state->vx;
+    record[5] = impact_state->vy;
+    record[6] = impact_state->vz;
+}
+
+void traj_record(state *true_state, state *est_state, vehicle *vehicle, double a_command_total, double a_lift_total, double *record){
+    /*
+    Function that fills a trajectory record with the true and estimated states, in the column order of traj_column_names
+
+    INPUTS:
+    ----------
+        true_state: state *
+            pointer to the true state of the vehicle
+        est_state: state *
+            pointer to the estimated state of the vehicle
+        vehicle: vehicle *
+            pointer to the vehicle struct
+        a_command_total: double
+            magnitude of the commanded acceleration
+        a_lift_total: double
+            magnitude of the lift acceleration
+        record: double *
+            pointer to the TRAJ_NUM_COLUMNS doubles of the record
+    */
+
+    record[0] = true_state->t;
+    record[1] = vehicle->current_mass;
+    record[2] = true_state->x;
+    record[3] = true_state->y;
+    record[4] = true_state->z;
+    record[5] = true_state->vx;
+    record[6] = true_state->vy;
+    record[7] = true_state->vz;
+    record[8] = true_state->ax_grav;
+    record[9] = true_state->ay_grav;
+    record[10] = true_state->az_grav;
+    record[11] = true_state->ax_drag;
+    record[12] = true_state->ay_drag;
+    record[13] = true_state->az_drag;
+    record[14] = a_command_total;
+    record[15] = a_lift_total;
+    record[16] = true_state->ax_thrust;
+    record[17] = true_state->ay_thrust;
+    record[18] = true_state->az_thrust;
+    record[19] = true_state->ax_total;
+    record[20] = true_state->ay_total;
+    record[21] = true_state->az_total;
+    record[22] = est_state->x;
+    record[23] = est_state->y;
+    record[24] = est_state->z;
+    record[25] = est_state->vx;
+    record[26] = est_state->vy;
+    record[27] = est_state->vz;
+    record[28] = est_state->ax_total;
+    record[29] = est_state->ay_total;
+    record[30] = est_state->az_total;
+}
+
+state fly(runparams *run_params, state *initial_state, vehicle *vehicle, rng_streams *rngs, integrator_stats *stats){
     /*
     Function that simulates the flight of a vehicle, updating the state of the vehicle at each time step
     
@@ -245,8 +502,10 @@ state fly(runparams *run_params, state *initial_state, vehicle *vehicle, gsl_rng
             pointer to the initial state of the vehicle
         vehicle: vehicle *
             pointer to the vehicle struct
-        rng: gsl_rng *
-            pointer to the random number generator
+        rngs: rng_streams *
+            pointer to the random number generator of each subsystem
+        stats: integrator_stats *
+            pointer to the adaptive integrator step counters, or NULL
 
     OUTPUTS:
     ----------
@@ -257,79 +516,113 @@ state fly(runparams *run_params, state *initial_state, vehicle *vehicle, gsl_rng
     // Initialize the variables and structures
     int max_steps = 1000000;
 
-    grav true_grav = init_grav(run_params, rng);
-    grav est_grav = init_grav(run_params, rng);
+    grav true_grav = init_grav(run_params, rngs->streams[RNG_STREAM_GRAV]);
+    grav est_grav = init_grav(run_params, rngs->streams[RNG_STREAM_GRAV]);
     est_grav.perturb_flag = 0;
 
-    atm_model exp_atm_model = init_exp_atm(run_params, rng);
-    
-    char *atmprofilepath = "input/atmprofiles.txt";
+    atm_model exp_atm_model = init_exp_atm(run_params, rngs->streams[RNG_STREAM_ATM]);
 
     double a_command_total = 0;
     double a_lift_total = 0;
 
     int atm_profile_num;
     // Generate a random integer between 0 and 100
-    atm_profile_num = (int)gsl_ran_flat(rng, 0, 100);
-
-    eg16_profile atm_profile = parse_atm(atmprofilepath, atm_profile_num);
+    atm_profile_num = (int)gsl_ran_flat(rngs->streams[RNG_STREAM_ATM], 0, 100);
+
+    // Only look up the EarthGRAM profile if the EarthGRAM branch of get_atm_cond is active
+    eg16_store *atm_store = NULL;
+    eg16_profile *atm_profile = NULL;
+    if (run_params->atm_error != 0 && run_params->atm_model != 0){
+        atm_store = get_atm_store(ATM_PROFILE_PATH);
+        atm_profile = select_atm_profile(atm_store, atm_profile_num);
+    }
+    if (run_params->atm_table == 1){
+        init_atm_table(&exp_atm_model, atm_store != NULL ? select_eg_table(atm_store, atm_profile_num) : NULL);
+    }
 
     state old_true_state = *initial_state;
     state new_true_state = *initial_state;
 
     state old_est_state = init_est_state(run_params);
     state new_est_state = init_est_state(run_params);
-    state old_des_state = init_est_state(run_params);
     state new_des_state = init_est_state(run_params);
 
     int traj_output = run_params->traj_output;
     double time_step;
+    step_schedule step_schedule = init_step_schedule(run_params);
+
+    // The adaptive integrator evaluates the forces on the true state itself
+    force_model true_force_model = {run_params, vehicle, &true_grav, &exp_atm_model, atm_profile};
+    state next_true_state;
+    double adaptive_step = step_schedule.upper;
+
+    // Flag set once the coast phase has been propagated in closed form
+    int coasted = 0;
     // Initialize the IMU
-    imu imu = imu_init(run_params, initial_state, rng);
+    imu imu = imu_init(run_params, initial_state, rngs->streams[RNG_STREAM_IMU]);
 
     // Initialize the GNSS
     gnss gnss = gnss_init(run_params);
 
-    // Create a .txt file to store the trajectory data
-    FILE *traj_file;
-    if (traj_output == 1){
-        traj_file = fopen(run_params->trajectory_path, "w");
-        fprintf(traj_file, "t, current_mass, x, y, z, vx, vy, vz, ax_grav, ay_grav, az_grav, ax_drag, ay_drag, az_drag, a_command, a_lift, ax_thrust, ay_thrust, az_thrust, ax_total, ay_total, az_total, est_x, est_y, est_z, est_vx, est_vy, est_vz, est_ax_total, est_ay_total, est_az_total \n");
-        // Write the initial state to the trajectory file
-        fprintf(traj_file, "%g, %g, %g, %g, %g, %g, %g, %g, %g, %g, %g, %g, %g, %g, %g, %g, %g, %g, %g, %g, %g, %g, %g, %g, %g, %g, %g, %g, %g, %g, %g\n", old_true_state.t, vehicle->current_mass, old_true_state.x, old_true_state.y, old_true_state.z, old_true_state.vx, old_true_state.vy, old_true_state.vz, old_true_state.ax_grav, old_true_state.ay_grav, old_true_state.az_grav, old_true_state.ax_drag, old_true_state.ay_drag, old_true_state.az_drag, a_command_total, a_lift_total, old_true_state.ax_thrust, old_true_state.ay_thrust, old_true_state.az_thrust, old_true_state.ax_total, old_true_state.ay_total, old_true_state.az_total, old_est_state.x, old_est_state.y, old_est_state.z, old_est_state.vx, old_est_state.vy, old_est_state.vz, old_est_state.ax_total, old_est_state.ay_total, old_est_state.az_total);
+    // Open the trajectory file (text or binary, depending on traj_output)
+    traj_writer traj_writer;
+    traj_policy traj_policy = init_traj_policy(run_params);
+    double traj_row[TRAJ_NUM_COLUMNS];
+    if (traj_output != TRAJ_OUTPUT_NONE){
+        if (traj_writer_open(&traj_writer, run_params->trajectory_path, traj_output, run_params->traj_async) != 0){
+            traj_output = TRAJ_OUTPUT_NONE;
+        }
+        else{
+            // Write the initial state to the trajectory file
+            traj_record(&old_true_state, &old_est_state, vehicle, a_command_total, a_lift_total, traj_row);
+            traj_writer_write(&traj_writer, traj_row);
+        }
     }
 
     // Variables for step function anomaly (only used for run_type = 1)
     double step_timer = 0; // time since step function was activated
+    // The step function anomaly advances its timer in every drag evaluation, so it keeps all of them
+    int step_anomaly = run_params->run_type == 1 && run_params->step_acc_mag != 0;
 
     // Begin the integration loop
     for (int i = 0; i < max_steps; i++){
+        // The desired state is only read by the perfect maneuver at burnout, and the estimated drag only reaches the
+        // estimated acceleration when the IMU measurement does not replace it, so they are not propagated otherwise
+        int des_active = step_anomaly || (run_params->run_type == 0 && new_des_state.t <= vehicle->booster.total_burn_time);
+        int est_drag_active = des_active || run_params->ins_nav == 0;
+
         // Get the atmospheric conditions
         double old_altitude = get_altitude(old_true_state.x, old_true_state.y, old_true_state.z);
         
-        atm_cond true_atm_cond = get_atm_cond(old_altitude, &exp_atm_model, run_params, &atm_profile);
+        atm_cond true_atm_cond = get_atm_cond(old_altitude, &exp_atm_model, run_params, atm_profile);
         // printf("true_atm_cond: %f, %f, %f\n", true_atm_cond.density, true_atm_cond.meridional_wind, true_atm_cond.zonal_wind);
-        atm_cond est_atm_cond = get_exp_atm_cond(old_altitude, &exp_atm_model);
-        // if during boost or outside atmosphere, dt = main time step, else dt = reentry time step
-        if (old_true_state.t < vehicle->booster.total_burn_time || old_altitude > 1e6){
-            time_step = run_params->time_step_main;
-        }
-        else{
-            time_step = run_params->time_step_reentry;
+        atm_cond est_atm_cond;
+        if (est_drag_active || run_params->rv_maneuv == 1){
+            est_atm_cond = get_exp_atm_cond(old_altitude, &exp_atm_model);
         }
+        // Look up the time step for the flight phase and altitude band
+        time_step = get_time_step(&step_schedule, old_true_state.t, vehicle->booster.total_burn_time, old_altitude);
         // Update the thrust of the vehicle
         update_thrust(vehicle, &new_true_state);
         update_thrust(vehicle, &new_est_state);
-        update_thrust(vehicle, &new_des_state);
+        if (des_active){
+            update_thrust(vehicle, &new_des_state);
+        }
         // Update the gravity acceleration components
         update_gravity(&true_grav, &new_true_state);
         update_gravity(&est_grav, &new_est_state);
-        update_gravity(&true_grav, &new_des_state);
+        if (des_active){
+            update_gravity(&true_grav, &new_des_state);
+        }
 
         // Update the drag acceleration components
         update_drag(run_params, vehicle, &true_atm_cond, &new_true_state, &step_timer);
-        update_drag(run_params, vehicle, &est_atm_cond, &new_est_state, &step_timer);
-        update_drag(run_params, vehicle, &est_atm_cond, &new_des_state, &step_timer);
+        if (est_drag_active){
+            update_drag(run_params, vehicle, &est_atm_cond, &new_est_state, &step_timer);
+        }
+        if (des_active){
+            update_drag(run_params, vehicle, &est_atm_cond, &new_des_state, &step_timer);
+        }
 
         // If maneuverable RV, use proportional navigation during reentry
         if (run_params->rv_maneuv == 1 && old_true_state.t >= vehicle->booster.total_burn_time && get_altitude(new_true_state.x, new_true_state.y, new_true_state.z) < 1e6){
@@ -354,26 +647,36 @@ state fly(runparams *run_params, state *initial_state, vehicle *vehicle, gsl_rng
         new_est_state.ax_total = new_est_state.ax_grav + new_est_state.ax_drag + new_est_state.ax_lift + new_est_state.ax_thrust;
         new_est_state.ay_total = new_est_state.ay_grav + new_est_state.ay_drag + new_est_state.ay_lift + new_est_state.ay_thrust;
         new_est_state.az_total = new_est_state.az_grav + new_est_state.az_drag + new_est_state.az_lift + new_est_state.az_thrust;
-        new_des_state.ax_total = new_des_state.ax_grav + new_des_state.ax_drag + new_des_state.ax_lift + new_des_state.ax_thrust;
-        new_des_state.ay_total = new_des_state.ay_grav + new_des_state.ay_drag + new_des_state.ay_lift + new_des_state.ay_thrust;
-        new_des_state.az_total = new_des_state.az_grav + new_des_state.az_drag + new_des_state.az_lift + new_des_state.az_thrust;
+        if (des_active){
+            new_des_state.ax_total = new_des_state.ax_grav + new_des_state.ax_drag + new_des_state.ax_lift + new_des_state.ax_thrust;
+            new_des_state.ay_total = new_des_state.ay_grav + new_des_state.ay_drag + new_des_state.ay_lift + new_des_state.ay_thrust;
+            new_des_state.az_total = new_des_state.az_grav + new_des_state.az_drag + new_des_state.az_lift + new_des_state.az_thrust;
+        }
+
+        // After burnout, the adaptive integrator takes the step now, so that the IMU is propagated over the accepted step.
+        // The boost phase stays on the fixed-step RK4 shared with the estimated and desired states, which the perfect maneuver at burnout compares against
+        int adaptive = run_params->integrator == INTEGRATOR_DP54 && new_true_state.t >= vehicle->booster.total_burn_time;
+        if (adaptive){
+            next_true_state = new_true_state;
+            time_step = dp54_adapt(&true_force_model, &next_true_state, &adaptive_step, stats);
+        }
 
         double a_drag = sqrt(new_true_state.ax_drag*new_true_state.ax_drag + new_true_state.ay_drag*new_true_state.ay_drag + new_true_state.az_drag*new_true_state.az_drag);
         if (run_params->ins_nav == 1){
             // INS Measurement
-            imu_measurement(&imu, &new_true_state, &new_est_state, vehicle, rng);
+            imu_measurement(&imu, &new_true_state, &new_est_state, vehicle, rngs->streams[RNG_STREAM_IMU_UPDATE]);
 
             if (run_params->rv_maneuv == 0 ){ 
-                update_imu(&imu, time_step, rng);
+                update_imu(&imu, time_step, rngs->streams[RNG_STREAM_IMU_UPDATE]);
             }
             else if (a_drag > 1e-3 || old_true_state.t < vehicle->booster.total_burn_time){
-                update_imu(&imu, time_step, rng);
+                update_imu(&imu, time_step, rngs->streams[RNG_STREAM_IMU_UPDATE]);
             }
         }
 
         if (run_params->gnss_nav == 1){
             // GNSS Measurement
-            gnss_measurement(&gnss, &new_true_state, &new_est_state, rng);
+            gnss_measurement(&gnss, &new_true_state, &new_est_state, rngs->streams[RNG_STREAM_GNSS]);
         }
 
         if  (new_true_state.t == (vehicle->booster.total_burn_time) && run_params->run_type == 0){
@@ -383,25 +686,53 @@ state fly(runparams *run_params, state *initial_state, vehicle *vehicle, gsl_rng
             imu.gyro_error_lat = 0;
             imu.gyro_error_long = 0;
 
+            // Repeat the adaptive step from the corrected state
+            if (adaptive){
+                next_true_state = new_true_state;
+                dp54step(&true_force_model, &next_true_state, time_step);
+            }
+
         }
     
         // Perform a Runge-Kutta step
-        rk4step(&new_true_state, time_step);
         rk4step(&new_est_state, time_step);
-        rk4step(&new_des_state, time_step);
+        if (des_active){
+            rk4step(&new_des_state, time_step);
+        }
+        if (adaptive){
+            // Carry the higher order part of the true state step over to the estimated and desired states, so that they
+            // only drift from the true state through their own accelerations
+            state rk4_true_state = new_true_state;
+            rk4step(&rk4_true_state, time_step);
+            step_correction(&new_est_state, &rk4_true_state, &next_true_state);
+            if (des_active){
+                step_correction(&new_des_state, &rk4_true_state, &next_true_state);
+            }
+            new_true_state = next_true_state;
+        }
+        else{
+            rk4step(&new_true_state, time_step);
+        }
         // Update the mass of the vehicle
         update_mass(vehicle, new_true_state.t);
 
         // Check if the vehicle has impacted the Earth
         double new_altitude = get_altitude(new_true_state.x, new_true_state.y, new_true_state.z);
         if (new_altitude < 0){
-            state true_final_state = impact_linterp(&old_true_state, &new_true_state);
-            state est_final_state = impact_linterp(&old_est_state, &new_est_state);
-            state des_final_state = impact_linterp(&old_des_state, &new_des_state);
+            state true_final_state;
+            state est_final_state;
+            if (run_params->event_location == 1){
+                true_final_state = impact_event(&old_true_state, &new_true_state);
+                est_final_state = impact_event(&old_est_state, &new_est_state);
+            }
+            else{
+                true_final_state = impact_linterp(&old_true_state, &new_true_state);
+                est_final_state = impact_linterp(&old_est_state, &new_est_state);
+            }
 
             // Add coriolis effect based on the latitude and the impact time error
-            double lat = gsl_ran_flat(rng, -M_PI/2, M_PI/2);
-            double lon = gsl_ran_flat(rng, -M_PI, M_PI);
+            double lat = gsl_ran_flat(rngs->streams[RNG_STREAM_IMPACT], -M_PI/2, M_PI/2);
+            double lon = gsl_ran_flat(rngs->streams[RNG_STREAM_IMPACT], -M_PI, M_PI);
             double time_error = true_final_state.t - est_final_state.t;
             double rot_speed = 464 * cos(lat);
             // printf("Impact time error: %f\n", time_error);
@@ -419,32 +750,83 @@ state fly(runparams *run_params, state *initial_state, vehicle *vehicle, gsl_rng
                 true_final_state.y = true_final_state.y - est_final_state.y;
                 true_final_state.z = true_final_state.z - est_final_state.z;
             }
-            if (traj_output == 1){
+            if (traj_output != TRAJ_OUTPUT_NONE){
                 // Write the final state to the trajectory file
-                fprintf(traj_file, "%g, %g, %g, %g, %g, %g, %g, %g, %g, %g, %g, %g, %g, %g, %g, %g, %g, %g, %g, %g, %g, %g, %g, %g, %g, %g, %g, %g, %g, %g, %g\n", true_final_state.t, vehicle->current_mass, true_final_state.x, true_final_state.y, true_final_state.z, true_final_state.vx, true_final_state.vy, true_final_state.vz, true_final_state.ax_grav, true_final_state.ay_grav, true_final_state.az_grav, true_final_state.ax_drag, true_final_state.ay_drag, true_final_state.az_drag, a_command_total, a_lift_total, true_final_state.ax_thrust, true_final_state.ay_thrust, true_final_state.az_thrust, true_final_state.ax_total, true_final_state.ay_total, true_final_state.az_total, est_final_state.x, est_final_state.y, est_final_state.z, est_final_state.vx, est_final_state.vy, est_final_state.vz, est_final_state.ax_total, est_final_state.ay_total, est_final_state.az_total);
-                fclose(traj_file);
+                traj_record(&true_final_state, &est_final_state, vehicle, a_command_total, a_lift_total, traj_row);
+                traj_writer_write(&traj_writer, traj_row);
+                traj_writer_close(&traj_writer);
             }
+            release_atm_store(atm_store);
 
             return true_final_state;
         }
 
-        // output the trajectory data
-        if (traj_output == 1){
-            fprintf(traj_file, "%g, %g, %g, %g, %g, %g, %g, %g, %g, %g, %g, %g, %g, %g, %g, %g, %g, %g, %g, %g, %g, %g, %g, %g, %g, %g, %g, %g, %g, %g, %g\n", new_true_state.t, vehicle->current_mass, new_true_state.x, new_true_state.y, new_true_state.z, new_true_state.vx, new_true_state.vy, new_true_state.vz, new_true_state.ax_grav, new_true_state.ay_grav, new_true_state.az_grav, new_true_state.ax_drag, new_true_state.ay_drag, new_true_state.az_drag, a_command_total, a_lift_total, new_true_state.ax_thrust, new_true_state.ay_thrust, new_true_state.az_thrust, new_true_state.ax_total, new_true_state.ay_total, new_true_state.az_total, new_est_state.x, new_est_state.y, new_est_state.z, new_est_state.vx, new_est_state.vy, new_est_state.vz, new_est_state.ax_total, new_est_state.ay_total, new_est_state.az_total);
+        // output the exact crossings of the step schedule altitudes, in time order
+        if (traj_output != TRAJ_OUTPUT_NONE && run_params->event_location == 1){
+            double event_altitudes[2] = {run_params->alt_exo, run_params->alt_dense};
+            if (new_altitude > old_altitude){
+                event_altitudes[0] = run_params->alt_dense;
+                event_altitudes[1] = run_params->alt_exo;
+            }
+            for (int j = 0; j < 2; j++){
+                state true_event_state;
+                if (locate_altitude_event(&old_true_state, &new_true_state, event_altitudes[j], &true_event_state)){
+                    double event_factor = (true_event_state.t - old_true_state.t) / (new_true_state.t - old_true_state.t);
+                    state est_event_state = state_linterp(&old_est_state, &new_est_state, event_factor);
+                    traj_record(&true_event_state, &est_event_state, vehicle, a_command_total, a_lift_total, traj_row);
+                    traj_writer_write(&traj_writer, traj_row);
+                }
+            }
+        }
+
+        // output the trajectory data, if the recording policy selects this step
+        if (traj_output != TRAJ_OUTPUT_NONE){
+            int traj_phase = TRAJ_PHASE_REENTRY;
+            if (new_true_state.t <= vehicle->booster.total_burn_time){
+                traj_phase = TRAJ_PHASE_BOOST;
+            }
+            else if (new_altitude > run_params->alt_exo){
+                traj_phase = TRAJ_PHASE_MIDCOURSE;
+            }
+            if (traj_policy_record(&traj_policy, new_true_state.t, traj_phase)){
+                traj_record(&new_true_state, &new_est_state, vehicle, a_command_total, a_lift_total, traj_row);
+                traj_writer_write(&traj_writer, traj_row);
+            }
+        }
+
+        // Coast from the exit state to the atmospheric interface in one closed-form step
+        if (run_params->coast_mode == 1 && !coasted && new_true_state.t > vehicle->booster.total_burn_time && new_altitude > run_params->coast_alt){
+            double coast_time = kepler_time_to_radius(&new_true_state, grav_param(&true_grav), true_grav.earth_radius + run_params->coast_alt);
+            if (coast_time > 0){
+                kepler_propagate(&new_true_state, grav_param(&true_grav), coast_time);
+                kepler_propagate(&new_est_state, grav_param(&est_grav), coast_time);
+                if (des_active){
+                    kepler_propagate(&new_des_state, grav_param(&true_grav), coast_time);
+                }
+
+                // Apply the IMU updates and the last GNSS measurement that the skipped steps would have made
+                if (run_params->ins_nav == 1 && run_params->rv_maneuv == 0){
+                    update_imu_interval(&imu, coast_time, step_schedule.exo, rngs->streams[RNG_STREAM_IMU_UPDATE]);
+                }
+                if (run_params->gnss_nav == 1){
+                    gnss_measurement(&gnss, &new_true_state, &new_est_state, rngs->streams[RNG_STREAM_GNSS]);
+                }
+                coasted = 1;
+            }
         }
 
         // Update the old state
         old_true_state = new_true_state;
         old_est_state = new_est_state;
-        old_des_state = new_des_state;
     }
     
     printf("Warning: Maximum number of steps reached with no impact\n");
 
     // Close the trajectory file
-    if (traj_output == 1){
-        fclose(traj_file);
+    if (traj_output != TRAJ_OUTPUT_NONE){
+        traj_writer_close(&traj_writer);
     }
+    release_atm_store(atm_store);
 
     return new_true_state;
 }
@@ -494,12 +876,10 @@ cart_vector update_aimpoint(runparams run_params, double thrust_angle_long){
     run_params_temp.gyro_noise = 0;
     run_params_temp.gnss_noise = 0;
     
-    // Initialize the random number generator (unused in this case, but still required)
-    const gsl_rng_type *T;
-    gsl_rng *rng;
+    // Initialize the random number generators (unused in this case, but still required)
     gsl_rng_env_setup();
-    T = gsl_rng_default;
-    rng = gsl_rng_alloc(T);
+    rng_streams rngs = init_rng_streams(&run_params_temp);
+    set_rng_streams(&rngs, 0);
 
     // Initialize the vehicle 
     vehicle vehicle;
@@ -515,11 +895,12 @@ cart_vector update_aimpoint(runparams run_params, double thrust_angle_long){
     }
     
 
-    state initial_state = init_true_state(&run_params_temp, rng);
+    state initial_state = init_true_state(&run_params_temp, rngs.streams[RNG_STREAM_STATE]);
     initial_state.theta_long = thrust_angle_long;
 
     // Call the fly function to get the final state
-    state final_state = fly(&run_params_temp, &initial_state, &vehicle, rng);
+    state final_state = fly(&run_params_temp, &initial_state, &vehicle, &rngs, NULL);
+    free_rng_streams(&rngs);
 
     // Update the aimpoint based on the final state
     aimpoint.x = final_state.x;
@@ -529,9 +910,621 @@ cart_vector update_aimpoint(runparams run_params, double thrust_angle_long){
     return aimpoint;
 }
 
+vehicle init_vehicle(runparams *run_params){
+    /*
+    Function that initializes the vehicle selected by the run type and RV type
+
+    INPUTS:
+    ----------
+        run_params: runparams *
+            pointer to the run parameters struct
+
+    OUTPUTS:
+    ----------
+        vehicle: vehicle
+            initialized vehicle struct, used as the template for every Monte Carlo sample
+    */
+
+    vehicle vehicle;
+    if (run_params->run_type == 0){
+        if (run_params->rv_type == 0){
+            vehicle = init_mmiii_ballistic();
+        }
+        else if (run_params->rv_type == 1){
+            vehicle = init_mmiii_swerve();
+        }
+        else{
+            printf("Error: Invalid RV type\n");
+            exit(1);
+        }
+    }
+    else if (run_params->run_type == 1){
+        vehicle = init_reentry_only();
+    }
+    else{
+        printf("Error: Invalid run type\n");
+        exit(1);
+    }
+
+    return vehicle;
+}
+
+state mc_sample(runparams *run_params, vehicle *vehicle_template, int run_index, rng_streams *rngs, integrator_stats *stats){
+    /*
+    Function that simulates a single Monte Carlo sample. The random number generator is reseeded from the run index, so that each sample draws from its own stream regardless of which thread runs it
+
+    INPUTS:
+    ----------
+        run_params: runparams *
+            pointer to the run parameters struct
+        vehicle_template: vehicle *
+            pointer to the initialized vehicle, which is copied for the sample
+        run_index: int
+            index of the Monte Carlo run
+        rngs: rng_streams *
+            pointer to the random number generators owned by the calling thread
+        stats: integrator_stats *
+            pointer to the adaptive integrator step counters of the calling thread
+
+    OUTPUTS:
+    ----------
+        impact_state: state
+            final state of the vehicle (impact point)
+    */
+
+    // Position the random number generators at the start of this sample
+    set_rng_streams(rngs, run_index);
+
+    // Only the last run writes the trajectory file, which matches the file left behind by a serial run
+    runparams sample_params = *run_params;
+    if (run_index != run_params->first_run + run_params->num_runs - 1){
+        sample_params.traj_output = 0;
+    }
+
+    vehicle vehicle = *vehicle_template;
+
+    state initial_true_state = init_true_state(&sample_params, rngs->streams[RNG_STREAM_STATE]);
+
+    return fly(&sample_params, &initial_true_state, &vehicle, rngs, stats);
+}
+
+int lanes_supported(runparams *run_params){
+    /*
+    Function that checks whether the struct-of-arrays lane engine can fly a configuration. The adaptive integrator, the
+    closed-form coast, the maneuverable RV guidance and the step function anomaly are only handled by fly()
+
+    INPUTS:
+    ----------
+        run_params: runparams *
+            pointer to the run parameters struct
+    OUTPUTS:
+    ----------
+        supported: int
+            1 if fly_lanes gives the same impacts as fly, 0 otherwise
+    */
+
+    if (run_params->lanes < 2 || run_params->integrator != INTEGRATOR_RK4 || run_params->coast_mode != 0 || run_params->rv_maneuv == 1){
+        return 0;
+    }
+    if (run_params->run_type == 1 && run_params->step_acc_mag != 0){
+        return 0;
+    }
+
+    return 1;
+}
+
+void fly_lanes(runparams *run_params, state *initial_states, vehicle *vehicle_template, rng_streams *rngs, int num_lanes, state *final_states){
+    /*
+    Function that simulates the flights of a block of vehicles together, with their states in struct-of-arrays layout so
+    that the gravity, drag and integration steps run across the lanes. Each lane draws from its own random number
+    generator in the same order as fly(), so the impacts match fly() for the configurations accepted by lanes_supported.
+    Impacted lanes are masked out with a time step of zero until every lane has impacted
+
+    INPUTS:
+    ----------
+        run_params: runparams *
+            pointer to the run parameters struct
+        initial_states: state *
+            pointer to the initial state of each lane
+        vehicle_template: vehicle *
+            pointer to the initialized vehicle, which is copied for each lane
+        rngs: rng_streams *
+            pointer to the random number generators of each lane
+        num_lanes: int
+            number of lanes, at most LANES_MAX
+        final_states: state *
+            pointer to the final state (impact point) of each lane
+    */
+
+    int max_steps = 1000000;
+    double burn_time = vehicle_template->booster.total_burn_time;
+
+    // Per-lane models, initialized in the same order as fly() draws them
+    vehicle vehicles[LANES_MAX];
+    grav true_grav[LANES_MAX];
+    grav est_grav[LANES_MAX];
+    atm_model exp_atm_model[LANES_MAX];
+    eg16_store *atm_store = NULL;
+    eg16_profile *atm_profile[LANES_MAX];
+    imu imu[LANES_MAX];
+    double true_geoid[LANES_MAX];
+    double est_geoid[LANES_MAX];
+    double mass[LANES_MAX];
+    double time_step[LANES_MAX];
+    int active[LANES_MAX];
+
+    lane_state true_lanes;
+    lane_state est_lanes;
+    lane_state des_lanes;
+    lane_state old_true_lanes;
+    lane_state old_est_lanes;
+    lane_atm_cond true_atm;
+    lane_atm_cond est_atm;
+
+    state est_initial_state = init_est_state(run_params);
+    for (int l = 0; l < num_lanes; l++){
+        vehicles[l] = *vehicle_template;
+        true_grav[l] = init_grav(run_params, rngs[l].streams[RNG_STREAM_GRAV]);
+        est_grav[l] = init_grav(run_params, rngs[l].streams[RNG_STREAM_GRAV]);
+        est_grav[l].perturb_flag = 0;
+        exp_atm_model[l] = init_exp_atm(run_params, rngs[l].streams[RNG_STREAM_ATM]);
+        int atm_profile_num = (int)gsl_ran_flat(rngs[l].streams[RNG_STREAM_ATM], 0, 100);
+        atm_profile[l] = NULL;
+        if (run_params->atm_error != 0 && run_params->atm_model != 0){
+            if (atm_store == NULL){
+                atm_store = get_atm_store(ATM_PROFILE_PATH);
+            }
+            atm_profile[l] = select_atm_profile(atm_store, atm_profile_num);
+        }
+        if (run_params->atm_table == 1){
+            init_atm_table(&exp_atm_model[l], atm_store != NULL ? select_eg_table(atm_store, atm_profile_num) : NULL);
+        }
+        imu[l] = imu_init(run_params, &initial_states[l], rngs[l].streams[RNG_STREAM_IMU]);
+
+        true_geoid[l] = true_grav[l].geoid_height_error;
+        est_geoid[l] = est_grav[l].geoid_height_error;
+        mass[l] = vehicles[l].current_mass;
+        active[l] = 1;
+        lane_set_state(&true_lanes, l, &initial_states[l]);
+        lane_set_state(&est_lanes, l, &est_initial_state);
+        lane_set_state(&des_lanes, l, &est_initial_state);
+    }
+    old_true_lanes = true_lanes;
+    old_est_lanes = est_lanes;
+
+    gnss gnss = gnss_init(run_params);
+    step_schedule step_schedule = init_step_schedule(run_params);
+    int num_active = num_lanes;
+
+    for (int i = 0; i < max_steps && num_active > 0; i++){
+        // As in fly(), the desired states are dropped once every lane is past burnout, and the estimated drag is only
+        // evaluated when the IMU measurement does not replace it
+        int des_active = 0;
+        for (int l = 0; l < num_lanes; l++){
+            if (active[l] && run_params->run_type == 0 && des_lanes.t[l] <= burn_time){
+                des_active = 1;
+            }
+        }
+        int est_drag_active = des_active || run_params->ins_nav == 0;
+
+        // Get the atmospheric conditions and the time step of each lane
+        true_atm.windy = 0;
+        est_atm.windy = 0;
+        for (int l = 0; l < num_lanes; l++){
+            double old_altitude = get_altitude(true_lanes.x[l], true_lanes.y[l], true_lanes.z[l]);
+            atm_cond true_atm_cond = get_atm_cond(old_altitude, &exp_atm_model[l], run_params, atm_profile[l]);
+            true_atm.density[l] = true_atm_cond.density;
+            true_atm.meridional_wind[l] = true_atm_cond.meridional_wind;
+            true_atm.zonal_wind[l] = true_atm_cond.zonal_wind;
+            true_atm.vertical_wind[l] = true_atm_cond.vertical_wind;
+            if (est_drag_active){
+                est_atm.density[l] = get_exp_atm_cond(old_altitude, &exp_atm_model[l]).density;
+                est_atm.meridional_wind[l] = 0;
+                est_atm.zonal_wind[l] = 0;
+                est_atm.vertical_wind[l] = 0;
+            }
+            if (true_atm_cond.meridional_wind != 0 || true_atm_cond.zonal_wind != 0 || true_atm_cond.vertical_wind != 0){
+                true_atm.windy = 1;
+            }
+            time_step[l] = active[l] ? get_time_step(&step_schedule, true_lanes.t[l], burn_time, old_altitude) : 0;
+        }
+
+        // Update the acceleration components of every lane
+        update_thrust_lanes(vehicle_template, mass, &true_lanes, num_lanes);
+        update_thrust_lanes(vehicle_template, mass, &est_lanes, num_lanes);
+        update_gravity_lanes(&true_grav[0], true_geoid, &true_lanes, num_lanes);
+        update_gravity_lanes(&true_grav[0], est_geoid, &est_lanes, num_lanes);
+        update_drag_lanes(run_params, vehicle_template, mass, &true_atm, &true_lanes, num_lanes);
+        if (est_drag_active){
+            update_drag_lanes(run_params, vehicle_template, mass, &est_atm, &est_lanes, num_lanes);
+        }
+        update_total_lanes(&true_lanes, num_lanes);
+        update_total_lanes(&est_lanes, num_lanes);
+        if (des_active){
+            update_thrust_lanes(vehicle_template, mass, &des_lanes, num_lanes);
+            update_gravity_lanes(&true_grav[0], true_geoid, &des_lanes, num_lanes);
+            update_drag_lanes(run_params, vehicle_template, mass, &est_atm, &des_lanes, num_lanes);
+            update_total_lanes(&des_lanes, num_lanes);
+        }
+
+        // Navigation and maneuvers, which draw random numbers, are done one lane at a time
+        for (int l = 0; l < num_lanes; l++){
+            if (!active[l]){
+                continue;
+            }
+            if (run_params->ins_nav == 1){
+                // INS measurement, as in imu_measurement
+                est_lanes.theta_long[l] = true_lanes.theta_long[l] + imu[l].gyro_error_long - true_lanes.initial_theta_long_pert[l];
+                est_lanes.theta_lat[l] = true_lanes.theta_lat[l] + imu[l].gyro_error_lat - true_lanes.initial_theta_lat_pert[l];
+                double a_measurable_x = true_lanes.ax_total[l] - true_lanes.ax_grav[l];
+                double a_measurable_y = true_lanes.ay_total[l] - true_lanes.ay_grav[l];
+                double a_measurable_z = true_lanes.az_total[l] - true_lanes.az_grav[l];
+                est_lanes.ax_total[l] = a_measurable_x * (1 + imu[l].acc_scale_x) + a_measurable_y * imu[l].gyro_error_long - a_measurable_z * imu[l].gyro_error_lat + est_lanes.ax_grav[l];
+                est_lanes.ay_total[l] = a_measurable_y * (1 + imu[l].acc_scale_y) - a_measurable_x * imu[l].gyro_error_long + a_measurable_z * imu[l].gyro_error_long * imu[l].gyro_error_lat + est_lanes.ay_grav[l];
+                est_lanes.az_total[l] = a_measurable_z * (1 + imu[l].acc_scale_z) + a_measurable_x * imu[l].gyro_error_lat + est_lanes.az_grav[l];
+
+                double a_drag = sqrt(true_lanes.ax_drag[l]*true_lanes.ax_drag[l] + true_lanes.ay_drag[l]*true_lanes.ay_drag[l] + true_lanes.az_drag[l]*true_lanes.az_drag[l]);
+                if (run_params->rv_maneuv == 0 || a_drag > 1e-3 || true_lanes.t[l] < burn_time){
+                    update_imu(&imu[l], time_step[l], rngs[l].streams[RNG_STREAM_IMU_UPDATE]);
+                }
+            }
+
+            if (run_params->gnss_nav == 1){
+                // GNSS measurement, as in gnss_measurement
+                est_lanes.x[l] = true_lanes.x[l] + gnss.noise * gsl_ran_gaussian(rngs[l].streams[RNG_STREAM_GNSS], 1);
+                est_lanes.y[l] = true_lanes.y[l] + gnss.noise * gsl_ran_gaussian(rngs[l].streams[RNG_STREAM_GNSS], 1);
+                est_lanes.z[l] = true_lanes.z[l] + gnss.noise * gsl_ran_gaussian(rngs[l].streams[RNG_STREAM_GNSS], 1);
+            }
+
+            if (true_lanes.t[l] == burn_time && run_params->run_type == 0){
+                // Perform a perfect maneuver at burnout
+                state true_state = lane_get_state(&true_lanes, l);
+                state est_state = lane_get_state(&est_lanes, l);
+                state des_state = lane_get_state(&des_lanes, l);
+                true_state = perfect_maneuv(&true_state, &est_state, &des_state);
+                lane_set_state(&true_lanes, l, &true_state);
+                lane_set_state(&est_lanes, l, &est_state);
+                imu[l].gyro_error_lat = 0;
+                imu[l].gyro_error_long = 0;
+            }
+        }
+
+        // Advance every lane; the impacted lanes have a time step of zero
+        rk4step_lanes(&est_lanes, time_step, num_lanes);
+        if (des_active){
+            rk4step_lanes(&des_lanes, time_step, num_lanes);
+        }
+        rk4step_lanes(&true_lanes, time_step, num_lanes);
+
+        // Update the masses and check for impacts
+        for (int l = 0; l < num_lanes; l++){
+            if (!active[l]){
+                continue;
+            }
+            update_mass(&vehicles[l], true_lanes.t[l]);
+            mass[l] = vehicles[l].current_mass;
+
+            if (get_altitude(true_lanes.x[l], true_lanes.y[l], true_lanes.z[l]) >= 0){
+                continue;
+            }
+
+            state old_true_state = lane_get_state(&old_true_lanes, l);
+            state new_true_state = lane_get_state(&true_lanes, l);
+            state old_est_state = lane_get_state(&old_est_lanes, l);
+            state new_est_state = lane_get_state(&est_lanes, l);
+            state true_final_state;
+            state est_final_state;
+            if (run_params->event_location == 1){
+                true_final_state = impact_event(&old_true_state, &new_true_state);
+                est_final_state = impact_event(&old_est_state, &new_est_state);
+            }
+            else{
+                true_final_state = impact_linterp(&old_true_state, &new_true_state);
+                est_final_state = impact_linterp(&old_est_state, &new_est_state);
+            }
+
+            // Add the coriolis effect, as in fly()
+            double lat = gsl_ran_flat(rngs[l].streams[RNG_STREAM_IMPACT], -M_PI/2, M_PI/2);
+            double lon = gsl_ran_flat(rngs[l].streams[RNG_STREAM_IMPACT], -M_PI, M_PI);
+            double time_error = true_final_state.t - est_final_state.t;
+            double rot_speed = 464 * cos(lat);
+            double coriolis = rot_speed * time_error;
+            true_final_state.x = true_final_state.x - coriolis * sin(lon)*cos(lat);
+            true_final_state.y = true_final_state.y + coriolis * cos(lon)*cos(lat);
+            true_final_state.z = true_final_state.z + coriolis * sin(lat);
+            if (run_params->rv_maneuv == 2){
+                true_final_state.x = true_final_state.x - est_final_state.x;
+                true_final_state.y = true_final_state.y - est_final_state.y;
+                true_final_state.z = true_final_state.z - est_final_state.z;
+            }
+
+            final_states[l] = true_final_state;
+            active[l] = 0;
+            num_active--;
+        }
+
+        // Update the old states
+        old_true_lanes = true_lanes;
+        old_est_lanes = est_lanes;
+    }
+
+    for (int l = 0; l < num_lanes; l++){
+        if (active[l]){
+            printf("Warning: Maximum number of steps reached with no impact\n");
+            final_states[l] = lane_get_state(&true_lanes, l);
+        }
+    }
+    release_atm_store(atm_store);
+}
+
+void mc_sample_lanes(runparams *run_params, vehicle *vehicle_template, int *run_indices, int num_lanes, rng_streams *rngs, state *impact_states){
+    /*
+    Function that simulates a block of Monte Carlo samples together with the lane engine. Each lane's random number
+    generator is reseeded from its run index, as in mc_sample, so the impacts do not depend on how the samples are
+    grouped
+
+    INPUTS:
+    ----------
+        run_params: runparams *
+            pointer to the run parameters struct
+        vehicle_template: vehicle *
+            pointer to the initialized vehicle, which is copied for each sample
+        run_indices: int *
+            index of the Monte Carlo run of each lane
+        num_lanes: int
+            number of lanes, at most LANES_MAX
+        rngs: rng_streams *
+            pointer to the random number generators of each lane
+        impact_states: state *
+            pointer to the final state (impact point) of each lane
+    */
+
+    state initial_states[LANES_MAX];
+    for (int l = 0; l < num_lanes; l++){
+        set_rng_streams(&rngs[l], run_indices[l]);
+        initial_states[l] = init_true_state(run_params, rngs[l].streams[RNG_STREAM_STATE]);
+    }
+
+    fly_lanes(run_params, initial_states, vehicle_template, rngs, num_lanes, impact_states);
+}
+
+// Define a struct to pass the work assignment to a Monte Carlo worker thread
+typedef struct mc_worker{
+    runparams *run_params; // pointer to the run parameters struct
+    vehicle *vehicle; // pointer to the vehicle template
+    impact_data *impact_data; // pointer to the preallocated impact data block
+    int thread_id; // index of the worker thread
+    int num_threads; // total number of worker threads
+    integrator_stats stats; // adaptive integrator step counters of the worker thread
+} mc_worker;
+
+void *mc_worker_run(void *arg){
+    /*
+    Thread entry point that runs every num_threads-th Monte Carlo sample of an impact data block, starting at the thread index, and writes each impact into its own slot of the block
+
+    INPUTS:
+    ----------
+        arg: void *
+            pointer to the mc_worker struct
+    */
+
+    mc_worker *worker = (mc_worker *) arg;
+    impact_data *block = worker->impact_data;
+
+    // Each thread owns its random number generators, which are repositioned for every sample
+    rng_streams rngs = init_rng_streams(worker->run_params);
+
+    if (lanes_supported(worker->run_params)){
+        // Fly the thread's samples in blocks of lanes, each lane with its own generators
+        int num_lanes = worker->run_params->lanes < LANES_MAX ? worker->run_params->lanes : LANES_MAX;
+        rng_streams lane_rngs[LANES_MAX];
+        int run_indices[LANES_MAX];
+        state impact_states[LANES_MAX];
+        for (int l = 0; l < num_lanes; l++){
+            lane_rngs[l] = init_rng_streams(worker->run_params);
+        }
+
+        int n = 0;
+        for (int i = worker->thread_id; i < block->num_states; i += worker->num_threads){
+            int run_index = block->first_run + i;
+            if (worker->run_params->traj_output != TRAJ_OUTPUT_NONE && run_index == worker->run_params->first_run + worker->run_params->num_runs - 1){
+                // The run that writes the trajectory file is flown on its own
+                block->impact_states[i] = mc_sample(worker->run_params, worker->vehicle, run_index, &rngs, &worker->stats);
+                continue;
+            }
+            run_indices[n++] = run_index;
+            if (n == num_lanes){
+                mc_sample_lanes(worker->run_params, worker->vehicle, run_indices, n, lane_rngs, impact_states);
+                for (int l = 0; l < n; l++){
+                    block->impact_states[run_indices[l] - block->first_run] = impact_states[l];
+                }
+                n = 0;
+            }
+        }
+        if (n > 0){
+            // Fly the last, partly filled block
+            mc_sample_lanes(worker->run_params, worker->vehicle, run_indices, n, lane_rngs, impact_states);
+            for (int l = 0; l < n; l++){
+                block->impact_states[run_indices[l] - block->first_run] = impact_states[l];
+            }
+        }
+
+        for (int l = 0; l < num_lanes; l++){
+            free_rng_streams(&lane_rngs[l]);
+        }
+    }
+    else{
+        for (int i = worker->thread_id; i < block->num_states; i += worker->num_threads){
+            block->impact_states[i] = mc_sample(worker->run_params, worker->vehicle, block->first_run + i, &rngs, &worker->stats);
+        }
+    }
+
+    free_rng_streams(&rngs);
+
+    return NULL;
+}
+
+void mc_run_block(runparams *run_params, vehicle *vehicle, impact_data *impact_data, int num_threads, integrator_stats *stats){
+    /*
+    Function that fills an impact data block by running its Monte Carlo samples on num_threads worker threads
+
+    INPUTS:
+    ----------
+        run_params: runparams *
+            pointer to the run parameters struct
+        vehicle: vehicle *
+            pointer to the vehicle template
+        impact_data: impact_data *
+            pointer to the impact data block, with first_run and num_states set
+        num_threads: int
+            number of worker threads
+        stats: integrator_stats *
+            pointer to the adaptive integrator step counters, to which the steps of the block are added
+    */
+
+    if (num_threads > impact_data->num_states){
+        num_threads = impact_data->num_states;
+    }
+    if (num_threads < 1){
+        num_threads = 1;
+    }
+
+    mc_worker workers[num_threads];
+    for (int i = 0; i < num_threads; i++){
+        workers[i].run_params = run_params;
+        workers[i].vehicle = vehicle;
+        workers[i].impact_data = impact_data;
+        workers[i].thread_id = i;
+        workers[i].num_threads = num_threads;
+        workers[i].stats = (integrator_stats) {0, 0};
+    }
+
+    if (num_threads == 1){
+        mc_worker_run(&workers[0]);
+        stats->accepted += workers[0].stats.accepted;
+        stats->rejected += workers[0].stats.rejected;
+        return;
+    }
+
+    pthread_t threads[num_threads];
+    pthread_attr_t attr;
+    pthread_attr_init(&attr);
+    pthread_attr_setstacksize(&attr, MC_THREAD_STACK_SIZE);
+    int started[num_threads];
+    for (int i = 0; i < num_threads; i++){
+        started[i] = pthread_create(&threads[i], &attr, mc_worker_run, &workers[i]) == 0;
+    }
+    for (int i = 0; i < num_threads; i++){
+        // Run the share of a thread that could not be created on the calling thread
+        if (started[i]){
+            pthread_join(threads[i], NULL);
+        }
+        else{
+            mc_worker_run(&workers[i]);
+        }
+        stats->accepted += workers[i].stats.accepted;
+        stats->rejected += workers[i].stats.rejected;
+    }
+    pthread_attr_destroy(&attr);
+}
+
+mc_checkpoint init_checkpoint(runparams *run_params){
+    /*
+    Function that initializes the checkpoint of a Monte Carlo simulation with no completed runs. The random number
+    generator environment must be set up first
+
+    INPUTS:
+    ----------
+        run_params: runparams *
+            pointer to the run parameters struct
+    OUTPUTS:
+    ----------
+        checkpoint: mc_checkpoint
+            checkpoint holding the run range, the random number generator setup and the run parameter hash
+    */
+
+    mc_checkpoint checkpoint;
+    memset(&checkpoint, 0, sizeof(checkpoint));
+    checkpoint.first_run = run_params->first_run;
+    checkpoint.num_runs = run_params->num_runs;
+    checkpoint.completed = 0;
+    checkpoint.base_seed = gsl_rng_default_seed;
+    strncpy(checkpoint.rng_name, gsl_rng_default->name, sizeof(checkpoint.rng_name) - 1);
+    checkpoint.config_hash = runparams_hash(run_params);
+
+    return checkpoint;
+}
+
+void mc_run_impacts(runparams *run_params, FILE *impact_file, mc_checkpoint *checkpoint, integrator_stats *stats){
+    /*
+    Function that runs the Monte Carlo runs that are not yet in the impact file, from checkpoint->completed on, and
+    appends their impacts to the impact file one block at a time. With run_params->checkpoint set, the blocks hold at
+    most that many runs and the checkpoint is written every run_params->checkpoint runs. The checkpoint file is removed
+    once every run is complete
+
+    INPUTS:
+    ----------
+        run_params: runparams *
+            pointer to the run parameters struct
+        impact_file: FILE *
+            impact file stream, positioned after the completed runs
+        checkpoint: mc_checkpoint *
+            pointer to the checkpoint of the simulation, updated as the runs complete
+        stats: integrator_stats *
+            pointer to the adaptive integrator step counters, to which the steps of the runs are added
+    */
+
+    int num_threads = run_params->num_threads;
+    if (num_threads < 1){
+        num_threads = 1;
+    }
+
+    impact_data *impact_data = malloc(sizeof(*impact_data));
+    if (impact_data == NULL){
+        printf("Error: Could not allocate the impact data block\n");
+        exit(1);
+    }
+
+    vehicle vehicle = init_vehicle(run_params);
+
+    // Each block ends on a checkpoint when the checkpoints are closer together than a full block
+    int block_size = IMPACT_BLOCK_SIZE;
+    if (run_params->checkpoint > 0 && run_params->checkpoint < block_size){
+        block_size = run_params->checkpoint;
+    }
+    int last_checkpoint = checkpoint->completed;
+
+    // Run the Monte Carlo simulation one block at a time, writing out each completed block
+    int last_run = run_params->first_run + run_params->num_runs;
+    for (int first_run = run_params->first_run + checkpoint->completed; first_run < last_run; first_run += block_size){
+        impact_data->first_run = first_run;
+        impact_data->num_states = last_run - first_run < block_size ? last_run - first_run : block_size;
+
+        mc_run_block(run_params, &vehicle, impact_data, num_threads, stats);
+
+        // Output the impact data
+        output_impact(impact_file, impact_data);
+        checkpoint->completed += impact_data->num_states;
+
+        // Make the completed runs durable before the checkpoint points past them
+        if (run_params->checkpoint > 0 && checkpoint->completed < run_params->num_runs && checkpoint->completed - last_checkpoint >= run_params->checkpoint){
+            fflush(impact_file);
+            fsync(fileno(impact_file));
+            checkpoint->impact_offset = ftell(impact_file);
+            if (write_checkpoint(run_params->impact_data_path, checkpoint) != 0){
+                printf("Warning: Could not write the checkpoint of %s\n", run_params->impact_data_path);
+            }
+            last_checkpoint = checkpoint->completed;
+        }
+    }
+
+    remove_checkpoint(run_params->impact_data_path);
+    free(impact_data);
+}
+
 void mc_run(runparams run_params){
     /*
-    Function that runs a Monte Carlo simulation of the vehicle flight
+    Function that runs a Monte Carlo simulation of the vehicle flight, spreading the runs over run_params.num_threads worker threads. The impacts are collected and written out in blocks of IMPACT_BLOCK_SIZE runs, so memory use does not depend on the number of runs. With run_params.checkpoint set, a checkpoint is kept next to the impact file so that an interrupted simulation can be continued with mc_resume
     
     INPUTS:
     ----------
@@ -542,69 +1535,357 @@ void mc_run(runparams run_params){
     // Print the run parameters to the console
     // print_config(&run_params);
 
-    // Initialize the variables
-    int num_runs = run_params.num_runs;
-    // printf("Simulating %d Monte Carlo runs...\n", num_runs);
-    if (num_runs > MAX_RUNS){
-        printf("Error: Number of runs exceeds the maximum limit. Increase MAX_RUNS in src/include/trajectory.h and recompile. \n");
-        printf("num_runs: %d, MAX_RUNS: %d\n", num_runs, MAX_RUNS);
-        exit(1);
-    }
-    // state initial_state = init_state();
-    // vehicle vehicle = init_mmiii_ballistic();
-    impact_data impact_data;
+    // printf("Simulating %d Monte Carlo runs...\n", run_params.num_runs);
     
     // Print an updated aimpoint
     // cart_vector aimpoint = update_aimpoint(run_params, 0.785398163397);
     // printf("Updated aimpoint: %f, %f, %f\n", aimpoint.x, aimpoint.y, aimpoint.z);
 
-    // Create a .txt file to store the impact data
+    // Create a .txt file to store the impact data, replacing the checkpoint of any earlier simulation
     FILE *impact_file;
     impact_file = fopen(run_params.impact_data_path, "w");
     fprintf(impact_file, "t, x, y, z, vx, vy, vz\n");
+    remove_checkpoint(run_params.impact_data_path);
     
-    // Initialize the random number generator
-    const gsl_rng_type *T;
-    gsl_rng *rng;
+    // Set up the random number generator environment (base seed and generator type) before any threads start
     gsl_rng_env_setup();
-    T = gsl_rng_default;
-    rng = gsl_rng_alloc(T);
 
-    // Run the Monte Carlo simulation
-    for (int i = 0; i < num_runs; i++){
+    mc_checkpoint checkpoint = init_checkpoint(&run_params);
+    integrator_stats stats = {0, 0};
+    mc_run_impacts(&run_params, impact_file, &checkpoint, &stats);
 
-        vehicle vehicle;
-        if (run_params.run_type == 0){
-            if (run_params.rv_type == 0){
-                vehicle = init_mmiii_ballistic();
-            }
-            else if (run_params.rv_type == 1){
-                vehicle = init_mmiii_swerve();
-            }
-            else{
-                printf("Error: Invalid RV type\n");
-                exit(1);
-            }
+    // Close the impact file
+    fclose(impact_file);
+
+}
+
+int mc_resume(runparams run_params){
+    /*
+    Function that continues a Monte Carlo simulation that was interrupted while writing the impact file with
+    run_params.checkpoint set. The impact file is cut back to the runs recorded in the checkpoint, and the remaining
+    runs are flown with the random number setup of the interrupted simulation, so the finished impact file is the one an
+    uninterrupted mc_run would have written. Without a checkpoint file, the whole simulation is run
+
+    INPUTS:
+    ----------
+        run_params: runparams
+            run parameters struct, the same as those of the interrupted simulation apart from the paths, the number of
+            threads and the checkpoint interval
+    OUTPUTS:
+    ----------
+        completed: int
+            number of runs taken from the checkpoint, or -1 if the checkpoint does not match the run parameters
+    */
+
+    // Set up the random number generator environment (base seed and generator type) before any threads start
+    gsl_rng_env_setup();
+
+    mc_checkpoint checkpoint;
+    int status = read_checkpoint(run_params.impact_data_path, &checkpoint);
+    if (status == 1){
+        mc_run(run_params);
+        return 0;
+    }
+
+    mc_checkpoint expected = init_checkpoint(&run_params);
+    if (status != 0 || checkpoint.first_run != expected.first_run || checkpoint.num_runs != expected.num_runs || checkpoint.config_hash != expected.config_hash || strncmp(checkpoint.rng_name, expected.rng_name, sizeof(checkpoint.rng_name)) != 0){
+        printf("Error: The checkpoint of %s does not match the run parameters\n", run_params.impact_data_path);
+        return -1;
+    }
+
+    // Drop any impacts written after the checkpoint
+    if (truncate(run_params.impact_data_path, checkpoint.impact_offset) != 0){
+        printf("Error: Could not truncate the impact file %s\n", run_params.impact_data_path);
+        return -1;
+    }
+    FILE *impact_file = fopen(run_params.impact_data_path, "a");
+    if (impact_file == NULL){
+        printf("Error: Could not open the impact file %s\n", run_params.impact_data_path);
+        return -1;
+    }
+
+    // Draw the remaining runs from the base seed of the interrupted simulation
+    unsigned long base_seed = gsl_rng_default_seed;
+    gsl_rng_default_seed = checkpoint.base_seed;
+
+    int completed = checkpoint.completed;
+    integrator_stats stats = {0, 0};
+    mc_run_impacts(&run_params, impact_file, &checkpoint, &stats);
+
+    gsl_rng_default_seed = base_seed;
+    fclose(impact_file);
+
+    return completed;
+}
+
+int mc_run_array(runparams run_params, double *impact_buffer, integrator_stats *stats){
+    /*
+    Function that runs a Monte Carlo simulation of the vehicle flight and fills a caller-provided buffer with the impact records instead of writing the impact file
+    
+    INPUTS:
+    ----------
+        run_params: runparams
+            run parameters struct
+        impact_buffer: double *
+            pointer to a contiguous, row-major buffer of num_runs x IMPACT_NUM_COLUMNS doubles (t, x, y, z, vx, vy, vz)
+        stats: integrator_stats *
+            pointer to the adaptive integrator step counters to fill, summed over all runs, or NULL
+    OUTPUTS:
+    ----------
+        num_runs: int
+            number of impact records written to the buffer
+    */
+
+    int num_runs = run_params.num_runs;
+    int num_threads = run_params.num_threads;
+    if (num_threads < 1){
+        num_threads = 1;
+    }
+
+    impact_data *impact_data = malloc(sizeof(*impact_data));
+    if (impact_data == NULL){
+        printf("Error: Could not allocate the impact data block\n");
+        exit(1);
+    }
+
+    // Set up the random number generator environment (base seed and generator type) before any threads start
+    gsl_rng_env_setup();
+
+    vehicle vehicle = init_vehicle(&run_params);
+    integrator_stats run_stats = {0, 0};
+
+    // Run the Monte Carlo simulation one block at a time, copying each completed block into the buffer
+    int last_run = run_params.first_run + num_runs;
+    for (int first_run = run_params.first_run; first_run < last_run; first_run += IMPACT_BLOCK_SIZE){
+        impact_data->first_run = first_run;
+        impact_data->num_states = last_run - first_run < IMPACT_BLOCK_SIZE ? last_run - first_run : IMPACT_BLOCK_SIZE;
+
+        mc_run_block(&run_params, &vehicle, impact_data, num_threads, &run_stats);
+
+        for (int i = 0; i < impact_data->num_states; i++){
+            impact_record(&impact_data->impact_states[i], &impact_buffer[(size_t) (first_run - run_params.first_run + i) * IMPACT_NUM_COLUMNS]);
+        }
+    }
+
+    free(impact_data);
+    if (stats != NULL){
+        *stats = run_stats;
+    }
+
+    return num_runs;
+}
+
+impact_summary mc_run_summary(runparams run_params, integrator_stats *stats){
+    /*
+    Function that runs a Monte Carlo simulation of the vehicle flight and returns streaming statistics of the impacts instead of the impacts themselves. Each completed block of impacts is added to the summary in run order, so memory use does not depend on the number of runs and the summary does not depend on the number of threads
+    
+    INPUTS:
+    ----------
+        run_params: runparams
+            run parameters struct
+        stats: integrator_stats *
+            pointer to the adaptive integrator step counters to fill, summed over all runs, or NULL
+    OUTPUTS:
+    ----------
+        summary: impact_summary
+            miss distance quantiles, mean and covariance of the impact offsets and impact time statistics
+    */
+
+    int num_runs = run_params.num_runs;
+    int num_threads = run_params.num_threads;
+    if (num_threads < 1){
+        num_threads = 1;
+    }
+
+    impact_data *impact_data = malloc(sizeof(*impact_data));
+    if (impact_data == NULL){
+        printf("Error: Could not allocate the impact data block\n");
+        exit(1);
+    }
+
+    // Set up the random number generator environment (base seed and generator type) before any threads start
+    gsl_rng_env_setup();
+
+    vehicle vehicle = init_vehicle(&run_params);
+    integrator_stats run_stats = {0, 0};
+    impact_summary summary = init_impact_summary(&run_params);
+
+    // Run the Monte Carlo simulation one block at a time, adding each completed block to the summary
+    int last_run = run_params.first_run + num_runs;
+    for (int first_run = run_params.first_run; first_run < last_run; first_run += IMPACT_BLOCK_SIZE){
+        impact_data->first_run = first_run;
+        impact_data->num_states = last_run - first_run < IMPACT_BLOCK_SIZE ? last_run - first_run : IMPACT_BLOCK_SIZE;
+
+        mc_run_block(&run_params, &vehicle, impact_data, num_threads, &run_stats);
+
+        for (int i = 0; i < impact_data->num_states; i++){
+            update_impact_summary(&summary, &impact_data->impact_states[i]);
         }
-        else if (run_params.run_type == 1){
-            vehicle = init_reentry_only();
+    }
+
+    free(impact_data);
+    if (stats != NULL){
+        *stats = run_stats;
+    }
+
+    return summary;
+}
+
+// Define a struct to pass the work assignment to a sweep worker thread
+typedef struct mc_sweep_worker{
+    runparams *variants; // pointer to the run parameters of each sweep point
+    vehicle *vehicles; // pointer to the vehicle template of each sweep point
+    long *offsets; // index of the first sample of each sweep point, followed by the total number of samples
+    int num_variants; // number of sweep points
+    double *impact_buffer; // pointer to the impact records of all sweep points
+    int thread_id; // index of the worker thread
+    int num_threads; // total number of worker threads
+    integrator_stats stats; // adaptive integrator step counters of the worker thread
+} mc_sweep_worker;
+
+void *mc_sweep_worker_run(void *arg){
+    /*
+    Thread entry point that runs every num_threads-th sample of the flattened sweep, starting at the thread index, and writes each impact record into its own row of the impact buffer
+
+    INPUTS:
+    ----------
+        arg: void *
+            pointer to the mc_sweep_worker struct
+    */
+
+    mc_sweep_worker *worker = (mc_sweep_worker *) arg;
+
+    // The random number mode and seed of the first sweep point apply to the whole sweep
+    rng_streams rngs = init_rng_streams(&worker->variants[0]);
+
+    // The samples are visited in increasing order, so the sweep point only ever moves forward
+    int variant = 0;
+    for (long k = worker->thread_id; k < worker->offsets[worker->num_variants]; k += worker->num_threads){
+        while (k >= worker->offsets[variant + 1]){
+            variant++;
         }
-        else{
-            printf("Error: Invalid run type\n");
-            exit(1);
+        state impact_state = mc_sample(&worker->variants[variant], &worker->vehicles[variant], worker->variants[variant].first_run + (int) (k - worker->offsets[variant]), &rngs, &worker->stats);
+        impact_record(&impact_state, &worker->impact_buffer[k * IMPACT_NUM_COLUMNS]);
+    }
+
+    free_rng_streams(&rngs);
+
+    return NULL;
+}
+
+long mc_sweep(runparams *variants, int num_variants, double *impact_buffer, int num_threads, integrator_stats *stats){
+    /*
+    Function that runs the Monte Carlo simulations of several sweep points in one call. The setup (random number generator environment, vehicle templates and atmospheric profiles) is done once, and the samples of all sweep points are spread over num_threads worker threads. No trajectory files are written
+    
+    INPUTS:
+    ----------
+        variants: runparams *
+            pointer to the run parameters of each sweep point
+        num_variants: int
+            number of sweep points
+        impact_buffer: double *
+            pointer to a contiguous, row-major buffer of IMPACT_NUM_COLUMNS doubles per sample, holding the impact records of each sweep point in turn
+        num_threads: int
+            number of worker threads
+        stats: integrator_stats *
+            pointer to the adaptive integrator step counters to fill, summed over all samples, or NULL
+    OUTPUTS:
+    ----------
+        num_samples: long
+            number of impact records written to the buffer
+    */
+
+    if (num_variants < 1){
+        return 0;
+    }
+
+    runparams *sweep_params = malloc(num_variants * sizeof(runparams));
+    vehicle *vehicles = malloc(num_variants * sizeof(vehicle));
+    long *offsets = malloc((num_variants + 1) * sizeof(long));
+    if (sweep_params == NULL || vehicles == NULL || offsets == NULL){
+        printf("Error: Could not allocate the sweep\n");
+        exit(1);
+    }
+
+    gsl_rng_env_setup();
+
+    offsets[0] = 0;
+    eg16_store *atm_store = NULL;
+    int use_atm_store = 0;
+    for (int i = 0; i < num_variants; i++){
+        // The sweep points would all write the same trajectory file
+        sweep_params[i] = variants[i];
+        sweep_params[i].traj_output = 0;
+        vehicles[i] = init_vehicle(&sweep_params[i]);
+        offsets[i + 1] = offsets[i] + sweep_params[i].num_runs;
+        if (sweep_params[i].atm_error != 0 && sweep_params[i].atm_model != 0){
+            use_atm_store = 1;
         }
-        
+    }
 
-        state initial_true_state = init_true_state(&run_params, rng);
-        
-        impact_data.impact_states[i] = fly(&run_params, &initial_true_state, &vehicle, rng);
+    // Load the atmospheric profiles before the workers start, so that they share one copy
+    if (use_atm_store){
+        atm_store = get_atm_store(ATM_PROFILE_PATH);
+    }
+
+    long num_samples = offsets[num_variants];
+    if (num_threads > num_samples){
+        num_threads = (int) num_samples;
+    }
+    if (num_threads < 1){
+        num_threads = 1;
+    }
 
+    mc_sweep_worker workers[num_threads];
+    for (int i = 0; i < num_threads; i++){
+        workers[i].variants = sweep_params;
+        workers[i].vehicles = vehicles;
+        workers[i].offsets = offsets;
+        workers[i].num_variants = num_variants;
+        workers[i].impact_buffer = impact_buffer;
+        workers[i].thread_id = i;
+        workers[i].num_threads = num_threads;
+        workers[i].stats = (integrator_stats) {0, 0};
     }
 
-    // Output the impact data
-    output_impact(impact_file, &impact_data, num_runs);
+    if (num_threads == 1){
+        mc_sweep_worker_run(&workers[0]);
+    }
+    else{
+        pthread_t threads[num_threads];
+        pthread_attr_t attr;
+        pthread_attr_init(&attr);
+        pthread_attr_setstacksize(&attr, MC_THREAD_STACK_SIZE);
+        int started[num_threads];
+        for (int i = 0; i < num_threads; i++){
+            started[i] = pthread_create(&threads[i], &attr, mc_sweep_worker_run, &workers[i]) == 0;
+        }
+        for (int i = 0; i < num_threads; i++){
+            // Run the share of a thread that could not be created on the calling thread
+            if (started[i]){
+                pthread_join(threads[i], NULL);
+            }
+            else{
+                mc_sweep_worker_run(&workers[i]);
+            }
+        }
+        pthread_attr_destroy(&attr);
+    }
+
+    if (stats != NULL){
+        *stats = (integrator_stats) {0, 0};
+        for (int i = 0; i < num_threads; i++){
+            stats->accepted += workers[i].stats.accepted;
+            stats->rejected += workers[i].stats.rejected;
+        }
+    }
 
+    release_atm_store(atm_store);
+    free(sweep_params);
+    free(vehicles);
+    free(offsets);
 
+    return num_samples;
 }
 
 #endif
\ No newline at end of file
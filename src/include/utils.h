@@ -13,7 +13,7 @@ typedef struct runparams{
     int num_runs; // number of Monte Carlo runs
     double time_step_main; // time step in seconds during boost and outside the atmosphere
     double time_step_reentry; // time step in seconds during reentry
-    int traj_output; // flag to output trajectory data
+    int traj_output; // trajectory output (0: none, 1: text, 2: binary)
     double x_aim; // target x-coordinate in meters
     double y_aim; // target y-coordinate in meters
     double z_aim; // target z-coordinate in meters
@@ -44,6 +44,44 @@ typedef struct runparams{
     double step_acc_hgt; // Step acceleration perturbation height (altitude) in meters
     double step_acc_dur; // Step acceleration perturbation duration in seconds
 
+    int num_threads; // number of worker threads for the Monte Carlo runs
+
+    int traj_every; // record the trajectory every Nth integration step
+    double traj_dt_boost; // minimum time between trajectory records during boost (s), 0 records every step
+    double traj_dt_midcourse; // minimum time between trajectory records during midcourse (s), 0 records every step
+    double traj_dt_reentry; // minimum time between trajectory records during reentry (s), 0 records every step
+    int traj_async; // flag to write the trajectory from a separate writer thread
+
+    int integrator; // true state integrator (0: fixed-step RK4, 1: adaptive Dormand-Prince 5(4))
+    double rtol; // relative local error tolerance of the adaptive integrator
+    double atol; // absolute local error tolerance of the adaptive integrator (m, m/s)
+    double dt_min; // minimum time step of the adaptive integrator (s)
+    double dt_max; // maximum time step of the adaptive integrator (s)
+
+    int coast_mode; // flag to propagate the exoatmospheric coast in closed form
+    double coast_alt; // altitude of the atmospheric interface that ends the closed-form coast (m)
+
+    double step_boost; // time step during boost (s), 0 for time_step_main
+    double step_exo; // time step above alt_exo after burnout (s), 0 for time_step_main
+    double step_upper; // time step between alt_dense and alt_exo after burnout (s), 0 for time_step_reentry
+    double step_dense; // time step below alt_dense after burnout (s), 0 for time_step_reentry
+    double alt_exo; // altitude of the top of the atmosphere for the step schedule (m)
+    double alt_dense; // altitude of the top of the dense atmosphere for the step schedule (m)
+
+    int event_location; // flag to locate impact and altitude crossings with a root solve on the interpolated step
+
+    int lanes; // number of Monte Carlo samples advanced together by the struct-of-arrays engine, 1 for one at a time
+
+    int rng_mode; // random number streams (0: one sequential stream per sample, 1: counter-based substreams per subsystem)
+    int seed; // seed of the random number streams, added to GSL_RNG_SEED
+    int sampling; // sampling of the static errors (0: pseudo-random, 1: antithetic pairs, 2: scrambled Sobol)
+
+    int first_run; // index of the first Monte Carlo run, so that a run can continue the samples of an earlier one
+
+    int checkpoint; // number of runs between checkpoints of the impact file, 0 for none
+
+    int atm_table; // flag to look up the sampled atmosphere in tables instead of evaluating the model at every step
+
 } runparams;
 
 typedef struct cart_vector{
@@ -187,6 +225,44 @@ void print_config(runparams *run_params){
     printf("Step acceleration perturbation height: %f\n", run_params->step_acc_hgt);
     printf("Step acceleration perturbation duration: %f\n", run_params->step_acc_dur);
 
+    printf("Number of threads: %d\n", run_params->num_threads);
+
+    printf("Trajectory record every N steps: %d\n", run_params->traj_every);
+    printf("Trajectory record interval (boost): %f\n", run_params->traj_dt_boost);
+    printf("Trajectory record interval (midcourse): %f\n", run_params->traj_dt_midcourse);
+    printf("Trajectory record interval (reentry): %f\n", run_params->traj_dt_reentry);
+    printf("Asynchronous trajectory writer: %d\n", run_params->traj_async);
+
+    printf("Integrator: %d\n", run_params->integrator);
+    printf("Relative tolerance: %e\n", run_params->rtol);
+    printf("Absolute tolerance: %e\n", run_params->atol);
+    printf("Minimum time step: %f\n", run_params->dt_min);
+    printf("Maximum time step: %f\n", run_params->dt_max);
+
+    printf("Closed-form coast: %d\n", run_params->coast_mode);
+    printf("Coast interface altitude: %f\n", run_params->coast_alt);
+
+    printf("Boost time step: %f\n", run_params->step_boost);
+    printf("Exoatmospheric time step: %f\n", run_params->step_exo);
+    printf("Upper atmosphere time step: %f\n", run_params->step_upper);
+    printf("Dense atmosphere time step: %f\n", run_params->step_dense);
+    printf("Top of the atmosphere altitude: %f\n", run_params->alt_exo);
+    printf("Top of the dense atmosphere altitude: %f\n", run_params->alt_dense);
+
+    printf("Event location: %d\n", run_params->event_location);
+
+    printf("Lanes: %d\n", run_params->lanes);
+
+    printf("Random number mode: %d\n", run_params->rng_mode);
+    printf("Seed: %d\n", run_params->seed);
+    printf("Sampling: %d\n", run_params->sampling);
+
+    printf("First run: %d\n", run_params->first_run);
+
+    printf("Checkpoint interval: %d\n", run_params->checkpoint);
+
+    printf("Atmosphere table: %d\n", run_params->atm_table);
+
 }
 
 double linterp(double x, double xs[], double ys[], int n){
@@ -3,4 +3,9 @@
 #include "include/gravity.h"
 #include "include/atmosphere.h"
 #include "include/physics.h"
+#include "include/output.h"
+#include "include/integrator.h"
+#include "include/lanes.h"
+#include "include/rng.h"
+#include "include/summary.h"
 #include "include/trajectory.h"
\ No newline at end of file
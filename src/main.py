@@ -6,6 +6,9 @@ from impact_plot import *
 # Specify the input file name (without the extension)
 config_file = "run_0"
 
+# Take the impacts of a run made before with the same inputs from the result cache (opt-in with --cache)
+use_cache = "--cache" in sys.argv[1:]
+
 # Check for the existence of the input file
 config_path = f"./input/{config_file}.toml"
 if not os.path.isfile(config_path):
@@ -33,7 +36,17 @@ if __name__ == "__main__":
     aimpoint = update_aimpoint(run_params, config_path)
     print(f"Aimpoint: ({aimpoint.x}, {aimpoint.y}, {aimpoint.z})")
 
-    impact_data_pointer = pytraj.mc_run(run_params)
+    if run_params.checkpoint:
+        # continue from the checkpoint of an interrupted run, if there is one
+        completed = mc_resume(run_params)
+        if completed:
+            print(f"Resumed after {completed} completed runs.")
+    elif use_cache:
+        # reuse the impacts of an identical earlier run, and write them out for plotting
+        impact_data = mc_run_cached(run_params)
+        save_impact_data(impact_data, run_params.impact_data_path.decode('utf-8'))
+    else:
+        impact_data_pointer = pytraj.mc_run(run_params)
     print("Monte Carlo simulation complete.")
 
     # Copy the input file to the output directory
@@ -42,7 +55,7 @@ if __name__ == "__main__":
     # Plot the trajectory
     if run_params.traj_output:
         print("Plotting trajectory...")
-        traj_plot("./output/" + config_file + "/")
+        traj_plot("./output/" + config_file + "/", run_params.traj_output)
         print("Trajectory plotted.")
 
     # Plot the impact data
@@ -2,10 +2,21 @@ import numpy as np
 from ctypes import *
 import configparser
 import os
+import hashlib
+import json
+from concurrent.futures import ProcessPoolExecutor
+from statistics import NormalDist
 
 so_file = "./build/libPyTraj.so"
 pytraj = CDLL(so_file)
 
+# location and size limit of the opt-in Monte Carlo result cache: $PYTRAJ_CACHE_DIR, or pytraj in the user cache directory
+cache_dir = os.environ.get("PYTRAJ_CACHE_DIR") or os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "pytraj")
+cache_max_bytes = 1 << 30
+
+# run parameters that do not change the impacts, left out of the cache key as in runparams_hash (output.h)
+cache_ignored_fields = ("run_name", "output_path", "impact_data_path", "trajectory_path", "num_threads", "traj_async", "checkpoint")
+
 # define the runparam struct
 class runparams(Structure):
     _fields_ = [
@@ -47,6 +58,79 @@ class runparams(Structure):
         ("step_acc_mag", c_double),
         ("step_acc_hgt", c_double),
         ("step_acc_dur", c_double),
+
+        ("num_threads", c_int),
+
+        ("traj_every", c_int),
+        ("traj_dt_boost", c_double),
+        ("traj_dt_midcourse", c_double),
+        ("traj_dt_reentry", c_double),
+        ("traj_async", c_int),
+
+        ("integrator", c_int),
+        ("rtol", c_double),
+        ("atol", c_double),
+        ("dt_min", c_double),
+        ("dt_max", c_double),
+
+        ("coast_mode", c_int),
+        ("coast_alt", c_double),
+
+        ("step_boost", c_double),
+        ("step_exo", c_double),
+        ("step_upper", c_double),
+        ("step_dense", c_double),
+        ("alt_exo", c_double),
+        ("alt_dense", c_double),
+        ("event_location", c_int),
+        ("lanes", c_int),
+        ("rng_mode", c_int),
+        ("seed", c_int),
+        ("sampling", c_int),
+        ("first_run", c_int),
+        ("checkpoint", c_int),
+        ("atm_table", c_int),
+    ]
+
+class integrator_stats(Structure):
+    _fields_ = [
+        ("accepted", c_long),
+        ("rejected", c_long),
+    ]
+
+# define the layout of the streaming impact summary (see summary.h)
+SUMMARY_QUANTILES = (0.5, 0.9)
+
+class p2_quantile(Structure):
+    _fields_ = [
+        ("p", c_double),
+        ("count", c_long),
+        ("heights", c_double * 5),
+        ("positions", c_double * 5),
+        ("desired", c_double * 5),
+        ("increments", c_double * 5),
+    ]
+
+class welford_2d(Structure):
+    _fields_ = [
+        ("count", c_long),
+        ("mean", c_double * 2),
+        ("comoment", (c_double * 2) * 2),
+    ]
+
+class impact_summary(Structure):
+    _fields_ = [
+        ("num_runs", c_long),
+        ("aim_lon", c_double),
+        ("aim_lat", c_double),
+        ("aim", c_double * 3),
+        ("miss_quantiles", p2_quantile * len(SUMMARY_QUANTILES)),
+        ("miss_mean", c_double),
+        ("offset", welford_2d),
+        ("time_mean", c_double),
+        ("time_m2", c_double),
+        ("time_min", c_double),
+        ("time_max", c_double),
     ]
 
 class cart_vector(Structure):
@@ -55,6 +139,28 @@ class cart_vector(Structure):
         ("y", c_double),
         ("z", c_double),
     ]
+
+# define the layout of the binary atmospheric profile file (see eg16_bin_header and eg16_profile in atmosphere.h)
+atm_bin_header_dtype = np.dtype([
+    ("magic", "S8"),
+    ("version", np.int32),
+    ("num_profiles", np.int32),
+    ("num_levels", np.int32),
+    ("num_columns", np.int32),
+    ("record_size", np.int32),
+    ("data_offset", np.int32),
+    ("reserved", "V32"),
+])
+
+eg16_profile_dtype = np.dtype([
+    ("profile_num", np.int32),
+    ("padding", np.int32),
+    ("alt_data", np.float64, 100),
+    ("density_data", np.float64, 100),
+    ("meridional_wind_data", np.float64, 100),
+    ("zonal_wind_data", np.float64, 100),
+    ("vertical_wind_data", np.float64, 100),
+])
     
 def read_config(run_name):
     """
@@ -86,12 +192,14 @@ def read_config(run_name):
     run_params.run_type = c_int(int(config['RUN']['run_type']))
     run_params.output_path = c_char_p(config['RUN']['output_path'].encode('utf-8'))
     run_params.impact_data_path = run_params.output_path + b"/" + run_params.run_name + b"/impact_data.txt"
-    run_params.trajectory_path = run_params.output_path + b"/" + run_params.run_name + b"/trajectory.txt"
+    traj_output = int(config['RUN']['traj_output'])
+    traj_file = b"/trajectory.bin" if traj_output == 2 else b"/trajectory.txt"
+    run_params.trajectory_path = run_params.output_path + b"/" + run_params.run_name + traj_file
 
     run_params.num_runs = c_int(int(config['RUN']['num_runs']))
     run_params.time_step_main = c_double(float(config['RUN']['time_step_main']))
     run_params.time_step_reentry = c_double(float(config['RUN']['time_step_reentry']))
-    run_params.traj_output = c_int(int(config['RUN']['traj_output']))
+    run_params.traj_output = c_int(traj_output)
     run_params.x_aim = c_double(float(config['RUN']['x_aim']))
     run_params.y_aim = c_double(float(config['RUN']['y_aim']))
     run_params.z_aim = c_double(float(config['RUN']['z_aim']))
@@ -125,11 +233,370 @@ def read_config(run_name):
     run_params.step_acc_hgt = c_double(float(config['ERRORPARAMS']['step_acc_hgt'])) # height of step acceleration
     run_params.step_acc_dur = c_double(float(config['ERRORPARAMS']['step_acc_dur'])) # duration of step acceleration
 
+    # set the execution parameters
+    run_params.num_threads = c_int(int(config['RUN'].get('num_threads', '1')))
+
+    # set the trajectory recording policy; traj_dt applies to every phase unless overridden
+    traj_dt = config['RUN'].get('traj_dt', '0')
+    run_params.traj_every = c_int(int(config['RUN'].get('traj_every', '1')))
+    run_params.traj_dt_boost = c_double(float(config['RUN'].get('traj_dt_boost', traj_dt)))
+    run_params.traj_dt_midcourse = c_double(float(config['RUN'].get('traj_dt_midcourse', traj_dt)))
+    run_params.traj_dt_reentry = c_double(float(config['RUN'].get('traj_dt_reentry', traj_dt)))
+    run_params.traj_async = c_int(int(config['RUN'].get('traj_async', '0')))
+
+    # set the integrator parameters
+    run_params.integrator = c_int(int(config['RUN'].get('integrator', '0')))
+    run_params.rtol = c_double(float(config['RUN'].get('rtol', '1e-9')))
+    run_params.atol = c_double(float(config['RUN'].get('atol', '1e-6')))
+    run_params.dt_min = c_double(float(config['RUN'].get('dt_min', '1e-4')))
+    run_params.dt_max = c_double(float(config['RUN'].get('dt_max', '1.0')))
+
+    # set the coast propagation parameters
+    run_params.coast_mode = c_int(int(config['RUN'].get('coast_mode', '0')))
+    run_params.coast_alt = c_double(float(config['RUN'].get('coast_alt', '1e6')))
+
+    # set the step size schedule; a step of 0 falls back to time_step_main or time_step_reentry
+    steps = config['STEPS'] if config.has_section('STEPS') else {}
+    run_params.step_boost = c_double(float(steps.get('boost', '0')))
+    run_params.step_exo = c_double(float(steps.get('exo', '0')))
+    run_params.step_upper = c_double(float(steps.get('upper', '0')))
+    run_params.step_dense = c_double(float(steps.get('dense', '0')))
+    run_params.alt_exo = c_double(float(steps.get('alt_exo', '1e6')))
+    run_params.alt_dense = c_double(float(steps.get('alt_dense', '1e5')))
+
+    # set the event location flag
+    run_params.event_location = c_int(int(config['RUN'].get('event_location', '0')))
+    run_params.lanes = c_int(int(config['RUN'].get('lanes', '1')))
+    run_params.rng_mode = c_int(int(config['RUN'].get('rng_mode', '0')))
+    run_params.seed = c_int(int(config['RUN'].get('seed', '0')))
+    run_params.sampling = c_int(int(config['RUN'].get('sampling', '0')))
+    run_params.first_run = c_int(int(config['RUN'].get('first_run', '0')))
+    run_params.checkpoint = c_int(int(config['RUN'].get('checkpoint', '0')))
+    run_params.atm_table = c_int(int(config['FLIGHT'].get('atm_table', '0')))
+
     return run_params
 
-def get_cep(impact_data, run_params):
+def load_atm_profiles(profile_path="./input/atmprofiles.txt"):
     """
-    Function to calculate the circular error probable (CEP) from the impact data.
+    Function to memory map the binary EarthGRAM 2016 atmospheric profile file. The binary file is generated from the text file the first time it is needed, and the mapping is shared read-only with every other process using it.
+
+    INPUTS:
+    ----------
+        profile_path: str
+            The path to the text or binary atmospheric profile file.
+    OUTPUTS:
+    ----------
+        profiles: numpy.memmap
+            The atmospheric profiles, with one eg16_profile_dtype record per profile.
+    """
+    bin_path = os.path.splitext(profile_path)[0] + ".bin"
+
+    # generate the binary file if it is missing or older than the text file
+    if profile_path != bin_path:
+        if not os.path.isfile(bin_path) or os.path.getmtime(profile_path) > os.path.getmtime(bin_path):
+            if pytraj.write_atm_bin(profile_path.encode('utf-8'), bin_path.encode('utf-8')) != 0:
+                raise IOError(f"Could not convert {profile_path} to {bin_path}")
+
+    header = np.fromfile(bin_path, dtype=atm_bin_header_dtype, count=1)[0]
+    if header["magic"] != b"EG16PRF1" or header["record_size"] != eg16_profile_dtype.itemsize:
+        raise ValueError(f"{bin_path} is not a valid binary atmospheric profile file")
+
+    profiles = np.memmap(bin_path, dtype=eg16_profile_dtype, mode='r', offset=int(header["data_offset"]), shape=(int(header["num_profiles"]),))
+
+    return profiles
+
+def mc_run_array(run_params, return_stats=False):
+    """
+    Function to run the Monte Carlo simulation and return the impact data as a NumPy array, without writing or reading the impact data file.
+
+    INPUTS:
+    ----------
+        run_params: runparams
+            The run parameters.
+        return_stats: bool
+            Also return the adaptive integrator step counts of the simulation.
+    OUTPUTS:
+    ----------
+        impact_data: numpy.ndarray
+            The impact data, with one row (t, x, y, z, vx, vy, vz) per Monte Carlo run.
+        stats: integrator_stats
+            The accepted and rejected step counts, summed over all runs (only if return_stats).
+    """
+    impact_data = np.zeros((run_params.num_runs, 7), dtype=np.float64)
+    stats = integrator_stats()
+
+    pytraj.mc_run_array.restype = c_int
+    pytraj.mc_run_array(run_params, impact_data.ctypes.data_as(POINTER(c_double)), byref(stats))
+
+    if return_stats:
+        return impact_data, stats
+    return impact_data
+
+def mc_resume(run_params):
+    """
+    Function to continue a Monte Carlo simulation that was interrupted while writing the impact data file with run_params.checkpoint set. The runs recorded in the checkpoint next to the impact data file are kept and only the remaining runs are simulated, so the finished file matches an uninterrupted run. Without a checkpoint, the whole simulation is run.
+
+    INPUTS:
+    ----------
+        run_params: runparams
+            The run parameters of the interrupted simulation. The number of threads and the checkpoint interval may differ.
+    OUTPUTS:
+    ----------
+        completed: int
+            The number of runs taken from the checkpoint.
+    """
+    pytraj.mc_resume.restype = c_int
+    completed = pytraj.mc_resume(run_params)
+    if completed < 0:
+        raise ValueError(f"The checkpoint of {run_params.impact_data_path.decode('utf-8')} does not match the run parameters")
+
+    return completed
+
+def save_impact_data(impact_data, impact_data_path):
+    """
+    Function to write impact data to a text file in the format written by mc_run.
+
+    INPUTS:
+    ----------
+        impact_data: numpy.ndarray
+            The impact data, with one row (t, x, y, z, vx, vy, vz) per Monte Carlo run.
+        impact_data_path: str
+            The path of the impact data file.
+    """
+    np.savetxt(impact_data_path, impact_data, fmt="%f", delimiter=", ", header="t, x, y, z, vx, vy, vz", comments="")
+
+_build_fingerprints = {}
+
+def build_fingerprint(so_path=so_file):
+    """
+    Function to get the fingerprint of a build of the shared library, so that results cached by one build are never returned by another. The hash is kept until the file changes.
+
+    INPUTS:
+    ----------
+        so_path: str
+            The path of the shared library.
+    OUTPUTS:
+    ----------
+        fingerprint: str
+            The SHA-256 hash of the shared library.
+    """
+    stat = os.stat(so_path)
+    key = (so_path, stat.st_mtime_ns, stat.st_size)
+    if key not in _build_fingerprints:
+        with open(so_path, "rb") as so:
+            _build_fingerprints[key] = hashlib.sha256(so.read()).hexdigest()
+
+    return _build_fingerprints[key]
+
+def cache_key(run_params):
+    """
+    Function to get the result cache key of a Monte Carlo simulation. The key hashes every run parameter that the impacts depend on, including the seed, together with the GSL_RNG_SEED and GSL_RNG_TYPE environment variables and the build fingerprint of the shared library.
+
+    INPUTS:
+    ----------
+        run_params: runparams
+            The run parameters.
+    OUTPUTS:
+    ----------
+        key: str
+            The SHA-256 hash of the simulation inputs.
+    """
+    params = {name: value for name, value in runparams_to_dict(run_params).items() if name not in cache_ignored_fields}
+    inputs = {
+        "params": params,
+        "gsl_rng_seed": os.environ.get("GSL_RNG_SEED"),
+        "gsl_rng_type": os.environ.get("GSL_RNG_TYPE"),
+        "build": build_fingerprint(),
+    }
+
+    return hashlib.sha256(json.dumps(inputs, sort_keys=True).encode('utf-8')).hexdigest()
+
+def cache_load(run_params, cache_path=None):
+    """
+    Function to look up the impact data of a Monte Carlo simulation in the result cache, marking the entry as recently used.
+
+    INPUTS:
+    ----------
+        run_params: runparams
+            The run parameters.
+        cache_path: str
+            The cache directory. Defaults to cache_dir.
+    OUTPUTS:
+    ----------
+        impact_data: numpy.ndarray
+            The cached impact data, or None if the simulation is not in the cache.
+    """
+    entry = os.path.join(cache_path or cache_dir, cache_key(run_params) + ".npy")
+    try:
+        impact_data = np.load(entry)
+        os.utime(entry)
+    except (OSError, ValueError, EOFError):
+        return None
+
+    return impact_data
+
+def cache_store(run_params, impact_data, cache_path=None, max_bytes=None):
+    """
+    Function to add the impact data of a Monte Carlo simulation to the result cache, then evict the least recently used entries beyond the size limit. The entry is written to a temporary file and renamed, so concurrent readers never see a partial entry.
+
+    INPUTS:
+    ----------
+        run_params: runparams
+            The run parameters.
+        impact_data: numpy.ndarray
+            The impact data of the simulation.
+        cache_path: str
+            The cache directory. Defaults to cache_dir.
+        max_bytes: int
+            The size limit of the cache directory in bytes. Defaults to cache_max_bytes.
+    """
+    cache_path = cache_path or cache_dir
+    os.makedirs(cache_path, exist_ok=True)
+    entry = os.path.join(cache_path, cache_key(run_params) + ".npy")
+    tmp_path = f"{entry}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as tmp:
+        np.save(tmp, impact_data)
+    os.replace(tmp_path, entry)
+
+    evict_cache(cache_path, max_bytes)
+
+def evict_cache(cache_path=None, max_bytes=None):
+    """
+    Function to remove the least recently used entries of the result cache until its size is within the limit.
+
+    INPUTS:
+    ----------
+        cache_path: str
+            The cache directory. Defaults to cache_dir.
+        max_bytes: int
+            The size limit of the cache directory in bytes. Defaults to cache_max_bytes.
+    OUTPUTS:
+    ----------
+        size: int
+            The size of the remaining entries in bytes.
+    """
+    cache_path = cache_path or cache_dir
+    max_bytes = cache_max_bytes if max_bytes is None else max_bytes
+
+    entries = []
+    for name in os.listdir(cache_path):
+        if name.endswith(".npy"):
+            try:
+                stat = os.stat(os.path.join(cache_path, name))
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, name))
+
+    # keep the most recently used entries that fit
+    size = 0
+    for _, entry_size, name in sorted(entries, reverse=True):
+        if size + entry_size <= max_bytes:
+            size += entry_size
+            continue
+        try:
+            os.remove(os.path.join(cache_path, name))
+        except FileNotFoundError:
+            pass
+
+    return size
+
+def mc_run_cached(run_params, cache_path=None, max_bytes=None):
+    """
+    Function to run the Monte Carlo simulation like mc_run_array, returning the stored impact data instead when a simulation with the same inputs (see cache_key) has been run by the same build. Simulations that write a trajectory file always run, since the cache does not hold the trajectory.
+
+    INPUTS:
+    ----------
+        run_params: runparams
+            The run parameters.
+        cache_path: str
+            The cache directory. Defaults to cache_dir.
+        max_bytes: int
+            The size limit of the cache directory in bytes. Defaults to cache_max_bytes.
+    OUTPUTS:
+    ----------
+        impact_data: numpy.ndarray
+            The impact data, with one row (t, x, y, z, vx, vy, vz) per Monte Carlo run.
+    """
+    if run_params.traj_output:
+        return mc_run_array(run_params)
+
+    impact_data = cache_load(run_params, cache_path)
+    if impact_data is None:
+        impact_data = mc_run_array(run_params)
+        cache_store(run_params, impact_data, cache_path, max_bytes)
+
+    return impact_data
+
+def mc_run_summary(run_params):
+    """
+    Function to run the Monte Carlo simulation and return summary statistics of the impacts, which are accumulated in the C code as the runs complete, without keeping or writing the impact data.
+
+    INPUTS:
+    ----------
+        run_params: runparams
+            The run parameters.
+    OUTPUTS:
+    ----------
+        summary: dict
+            The number of runs ("num_runs"), the CEP ("cep") and 90th percentile ("miss_90") of the miss distance from streaming P-square estimates, the mean miss distance ("miss_mean"), the mean ("offset_mean") and covariance ("offset_cov") of the east and north offsets from the aimpoint, the mean, standard deviation, minimum and maximum of the impact time ("time_mean", "time_std", "time_min" and "time_max"), and the adaptive integrator step counts ("integrator_stats").
+    """
+    stats = integrator_stats()
+    pytraj.mc_run_summary.restype = impact_summary
+    summary = pytraj.mc_run_summary(run_params, byref(stats))
+
+    num_runs = summary.num_runs
+    pytraj.p2_value.restype = c_double
+    p2_values = [pytraj.p2_value(byref(quantile)) for quantile in summary.miss_quantiles]
+
+    return {
+        "num_runs": num_runs,
+        "cep": p2_values[0],
+        "miss_90": p2_values[1],
+        "miss_mean": summary.miss_mean,
+        "offset_mean": np.array(summary.offset.mean[:]),
+        "offset_cov": np.array([row[:] for row in summary.offset.comoment]) / (num_runs - 1) if num_runs > 1 else np.full((2, 2), np.nan),
+        "time_mean": summary.time_mean,
+        "time_std": np.sqrt(summary.time_m2 / (num_runs - 1)) if num_runs > 1 else np.nan,
+        "time_min": summary.time_min,
+        "time_max": summary.time_max,
+        "integrator_stats": stats,
+    }
+
+def mc_sweep_array(variants, num_threads=1, return_stats=False):
+    """
+    Function to run the Monte Carlo simulations of several sweep points in a single native call, sharing the setup and the worker threads between them. No trajectory files are written.
+
+    INPUTS:
+    ----------
+        variants: list of runparams
+            The run parameters of each sweep point.
+        num_threads: int
+            The number of worker threads.
+        return_stats: bool
+            Also return the adaptive integrator step counts of the sweep.
+    OUTPUTS:
+    ----------
+        impact_data: list of numpy.ndarray
+            The impact data of each sweep point, with one row (t, x, y, z, vx, vy, vz) per Monte Carlo run.
+        stats: integrator_stats
+            The accepted and rejected step counts, summed over all sweep points (only if return_stats).
+    """
+    variant_array = (runparams * len(variants))(*variants)
+    num_runs = [variant.num_runs for variant in variants]
+    impact_buffer = np.zeros((sum(num_runs), 7), dtype=np.float64)
+    stats = integrator_stats()
+
+    pytraj.mc_sweep.restype = c_long
+    pytraj.mc_sweep(variant_array, c_int(len(variants)), impact_buffer.ctypes.data_as(POINTER(c_double)), c_int(num_threads), byref(stats))
+
+    impact_data = np.split(impact_buffer, np.cumsum(num_runs)[:-1])
+    if return_stats:
+        return impact_data, stats
+    return impact_data
+
+def get_local_impacts(impact_data, run_params):
+    """
+    Function to convert the impact points to offsets from the aimpoint in the local tangent plane of the aimpoint.
 
     INPUTS:
     ----------
@@ -139,8 +606,8 @@ def get_cep(impact_data, run_params):
             The run parameters.
     OUTPUTS:
     ----------
-        cep: double
-            The circular error probable.
+        local_impacts: numpy.ndarray
+            The east and north offsets of each impact from the aimpoint.
     """
     # get longitude and latitude of aimpoint
     aimpoint_lon = np.arctan2(run_params.y_aim, run_params.x_aim)
@@ -159,12 +626,155 @@ def get_cep(impact_data, run_params):
     impact_x_local = -np.sin(aimpoint_lon)*impact_x + np.cos(aimpoint_lon)*impact_y
     impact_y_local = -np.sin(aimpoint_lat)*np.cos(aimpoint_lon)*impact_x - np.sin(aimpoint_lat)*np.sin(aimpoint_lon)*impact_y + np.cos(aimpoint_lat)*impact_z
 
+    return np.column_stack((impact_x_local, impact_y_local))
+
+def get_cep(impact_data, run_params):
+    """
+    Function to calculate the circular error probable (CEP) from the impact data.
+
+    INPUTS:
+    ----------
+        impact_data: numpy.ndarray
+            The impact data.
+        run_params: runparams
+            The run parameters.
+    OUTPUTS:
+    ----------
+        cep: double
+            The circular error probable.
+    """
     # get the miss distances
-    miss_distance = np.sqrt(impact_x_local**2 + impact_y_local**2)
+    local_impacts = get_local_impacts(impact_data, run_params)
+    miss_distance = np.sqrt(local_impacts[:,0]**2 + local_impacts[:,1]**2)
     cep = np.percentile(miss_distance, 50)
 
     return cep
 
+def get_cep_interval(impact_data, run_params, confidence=0.95):
+    """
+    Function to calculate the circular error probable (CEP) and a distribution-free confidence interval for it, bounded by the order statistics of the miss distances around the median.
+
+    INPUTS:
+    ----------
+        impact_data: numpy.ndarray
+            The impact data.
+        run_params: runparams
+            The run parameters.
+        confidence: double
+            The confidence level of the interval.
+    OUTPUTS:
+    ----------
+        cep: double
+            The circular error probable.
+        cep_lower: double
+            The lower bound of the interval, 0 if there are too few runs to bound it.
+        cep_upper: double
+            The upper bound of the interval, infinite if there are too few runs to bound it.
+    """
+    local_impacts = get_local_impacts(impact_data, run_params)
+    miss_distance = np.sort(np.sqrt(local_impacts[:,0]**2 + local_impacts[:,1]**2))
+    cep = np.percentile(miss_distance, 50)
+
+    # ranks (counted from 1) of the order statistics that bracket the median, from the normal approximation to the binomial distribution
+    num_runs = len(miss_distance)
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    lower_rank = int(np.floor(num_runs / 2 - z * np.sqrt(num_runs) / 2))
+    upper_rank = int(np.ceil(1 + num_runs / 2 + z * np.sqrt(num_runs) / 2))
+
+    cep_lower = miss_distance[lower_rank - 1] if lower_rank >= 1 else 0.0
+    cep_upper = miss_distance[upper_rank - 1] if upper_rank <= num_runs else np.inf
+
+    return cep, cep_lower, cep_upper
+
+def mc_run_sequential(run_params, batch_size=100, rel_precision=0.05, confidence=0.95, max_runs=None):
+    """
+    Function to run the Monte Carlo simulation in batches until the CEP is known to a relative precision. After each batch, the CEP and its confidence interval are updated from all the runs so far. The batches continue the run indices of the previous ones, so the runs are the same as those of a single mc_run_array call with as many runs.
+
+    INPUTS:
+    ----------
+        run_params: runparams
+            The run parameters. num_runs is ignored.
+        batch_size: int
+            The number of runs in each batch.
+        rel_precision: double
+            The target half-width of the confidence interval, relative to the CEP.
+        confidence: double
+            The confidence level of the interval.
+        max_runs: int
+            The run budget. Defaults to run_params.num_runs.
+    OUTPUTS:
+    ----------
+        impact_data: numpy.ndarray
+            The impact data of all the runs.
+        summary: dict
+            The CEP ("cep"), the bounds of its confidence interval ("cep_lower" and "cep_upper"), the number of runs ("num_runs") and whether the precision target was reached ("converged").
+    """
+    if max_runs is None:
+        max_runs = run_params.num_runs
+    if batch_size < 1:
+        raise ValueError(f"Invalid batch size {batch_size}")
+    if max_runs < 1:
+        raise ValueError(f"Invalid run budget {max_runs}")
+    batch_params = runparams_from_dict(runparams_to_dict(run_params))
+
+    impact_batches = []
+    num_runs = 0
+    converged = False
+    while num_runs < max_runs and not converged:
+        batch_params.first_run = run_params.first_run + num_runs
+        batch_params.num_runs = min(batch_size, max_runs - num_runs)
+        impact_batches.append(mc_run_array(batch_params))
+        num_runs += batch_params.num_runs
+
+        impact_data = np.concatenate(impact_batches)
+        cep, cep_lower, cep_upper = get_cep_interval(impact_data, run_params, confidence)
+        converged = (cep_upper - cep_lower) / 2 <= rel_precision * cep
+
+    summary = {
+        "cep": cep,
+        "cep_lower": cep_lower,
+        "cep_upper": cep_upper,
+        "num_runs": num_runs,
+        "converged": bool(converged),
+    }
+
+    return impact_data, summary
+
+def get_variance_reduction(run_params, num_replicates=8):
+    """
+    Function to estimate the variance reduction of the sampling mode of the run parameters. The Monte Carlo simulation is repeated with num_replicates seeds, once in the configured sampling mode and once with pseudo-random sampling, and the variances of the estimates over the replicates are compared.
+
+    INPUTS:
+    ----------
+        run_params: runparams
+            The run parameters.
+        num_replicates: int
+            The number of independent replicates of each sampling mode.
+    OUTPUTS:
+    ----------
+        variance_reduction: dict
+            The variance with pseudo-random sampling divided by the variance with the configured sampling, for the CEP ("cep") and the mean impact point ("mean_impact", summed over the east and north offsets). Values above 1 mean that the configured sampling needs that many times fewer runs for the same precision.
+    """
+    params = runparams_to_dict(run_params)
+    variances = {}
+    for sampling in (0, run_params.sampling):
+        ceps = []
+        mean_impacts = []
+        for replicate in range(num_replicates):
+            # each replicate uses its own seed
+            replicate_params = runparams_from_dict({**params, "sampling": sampling, "seed": run_params.seed + replicate})
+            impact_data = mc_run_array(replicate_params)
+            ceps.append(get_cep(impact_data, replicate_params))
+            mean_impacts.append(np.mean(get_local_impacts(impact_data, replicate_params), axis=0))
+        variances[sampling] = (np.var(ceps, ddof=1), np.sum(np.var(mean_impacts, axis=0, ddof=1)))
+
+    variance_reduction = {
+        "cep": float(variances[0][0] / variances[run_params.sampling][0]),
+        "mean_impact": float(variances[0][1] / variances[run_params.sampling][1]),
+    }
+
+    return variance_reduction
+
 def update_aimpoint(run_params, config_path):
     """
     Function to update the aimpoint based on the current run parameters.
@@ -194,4 +804,132 @@ def update_aimpoint(run_params, config_path):
     config['RUN']['y_aim'] = str(aimpoint.y)
     config['RUN']['z_aim'] = str(aimpoint.z)
 
-    return aimpoint
\ No newline at end of file
+    return aimpoint
+
+def runparams_to_dict(run_params):
+    """
+    Function to convert the run parameters to a dictionary, so that they can be sent to other processes.
+
+    INPUTS:
+    ----------
+        run_params: runparams
+            The run parameters.
+    OUTPUTS:
+    ----------
+        params: dict
+            The run parameters, keyed by field name.
+    """
+    return {name: getattr(run_params, name) for name, _ in runparams._fields_}
+
+def runparams_from_dict(params):
+    """
+    Function to build the run parameters from a dictionary created by runparams_to_dict.
+
+    INPUTS:
+    ----------
+        params: dict
+            The run parameters, keyed by field name.
+    OUTPUTS:
+    ----------
+        run_params: runparams
+            The run parameters.
+    """
+    run_params = runparams()
+    for name, value in params.items():
+        setattr(run_params, name, value)
+
+    return run_params
+
+def sweep_point(params, overrides, point_path, cache=False):
+    """
+    Function to run the Monte Carlo simulation for a single sweep point. Runs in a worker process of sweep.
+
+    INPUTS:
+    ----------
+        params: dict
+            The base run parameters, as created by runparams_to_dict.
+        overrides: dict
+            The run parameters to override for this point, keyed by field name.
+        point_path: str
+            The output directory of this point.
+        cache: bool
+            Take the impact data from the result cache when the point has been run before (see mc_run_cached).
+    OUTPUTS:
+    ----------
+        cep: double
+            The circular error probable (CEP) of the point.
+    """
+    run_params = runparams_from_dict({**params, **overrides})
+
+    # keep the output files of each point apart
+    os.makedirs(point_path, exist_ok=True)
+    run_params.impact_data_path = (point_path + "/impact_data.txt").encode('utf-8')
+    traj_file = "/trajectory.bin" if run_params.traj_output == 2 else "/trajectory.txt"
+    run_params.trajectory_path = (point_path + traj_file).encode('utf-8')
+
+    impact_data = mc_run_cached(run_params) if cache else mc_run_array(run_params)
+
+    return get_cep(impact_data, run_params)
+
+def sweep(run_params, overrides, num_workers=None, native=False, common_random_numbers=False, cache=False):
+    """
+    Function to run the Monte Carlo simulation for a list of parameter overrides across a pool of worker processes, or across the threads of a single mc_sweep call.
+
+    INPUTS:
+    ----------
+        run_params: runparams
+            The base run parameters.
+        overrides: list of dict
+            The run parameters to override at each sweep point, keyed by field name.
+        num_workers: int
+            The number of worker processes (or threads if native). Defaults to the number of CPUs; 1 runs the points in this process.
+        native: bool
+            Run all the points in one mc_sweep call instead of a process pool. No output files are written.
+        common_random_numbers: bool
+            Give sample i of every point the same standard normal draws, scaled by the parameters of the point, by
+            running every point with the counter-based random number streams (rng_mode = 1) and the same seed.
+        cache: bool
+            Take the impact data of points that have been run before from the result cache, and add the others to it
+            (see mc_run_cached).
+    OUTPUTS:
+    ----------
+        sweep_data: dict of numpy.ndarray
+            One column per overridden run parameter, holding its value at each point, and a "cep" column.
+    """
+    params = runparams_to_dict(run_params)
+    if common_random_numbers:
+        if any(name in point for point in overrides for name in ("rng_mode", "seed")):
+            raise ValueError("common_random_numbers cannot be combined with rng_mode or seed overrides")
+        params["rng_mode"] = 1
+    run_path = os.path.join(run_params.output_path.decode('utf-8'), run_params.run_name.decode('utf-8'), "sweep")
+    point_paths = [os.path.join(run_path, f"point_{i}") for i in range(len(overrides))]
+
+    if native:
+        variants = [runparams_from_dict({**params, **point}) for point in overrides]
+        if cache:
+            # only sweep the points that are not in the cache
+            impact_data = [cache_load(variant) for variant in variants]
+            misses = [i for i, data in enumerate(impact_data) if data is None]
+            if misses:
+                miss_data = mc_sweep_array([variants[i] for i in misses], num_workers or os.cpu_count())
+                for i, data in zip(misses, miss_data):
+                    cache_store(variants[i], data)
+                    impact_data[i] = data
+        else:
+            impact_data = mc_sweep_array(variants, num_workers or os.cpu_count())
+        ceps = [get_cep(data, variant) for data, variant in zip(impact_data, variants)]
+    elif num_workers == 1:
+        ceps = [sweep_point(params, point, path, cache) for point, path in zip(overrides, point_paths)]
+    else:
+        with ProcessPoolExecutor(max_workers=num_workers) as executor:
+            ceps = list(executor.map(sweep_point, [params] * len(overrides), overrides, point_paths, [cache] * len(overrides)))
+
+    # collect the results into columns, in the order of the overrides
+    sweep_data = {}
+    for point in overrides:
+        for name in point:
+            if name not in sweep_data:
+                sweep_data[name] = np.array([point.get(name, params[name]) for point in overrides])
+    sweep_data["cep"] = np.array(ceps)
+
+    return sweep_data
@@ -0,0 +1,47 @@
+# This module contains code to read the trajectory files written by the simulation, without loading the C library.
+
+import os
+import numpy as np
+
+# define the header of the binary trajectory file (see traj_bin_header in output.h)
+traj_bin_header_dtype = np.dtype([
+    ("magic", "S8"),
+    ("version", np.int32),
+    ("num_columns", np.int32),
+    ("column_name_size", np.int32),
+    ("data_offset", np.int32),
+    ("reserved", "S40"),
+])
+
+def load_trajectory(run_path, traj_output=1):
+    """
+    Function to load the trajectory data of a run in the format it was written in. The binary trajectory.bin file is memory mapped, and the trajectory.txt file is read.
+
+    INPUTS:
+    ----------
+        run_path: str
+            The path to the run output directory, including the trailing slash.
+        traj_output: int
+            The trajectory output format of the run (1 for trajectory.txt, 2 for trajectory.bin).
+    OUTPUTS:
+    ----------
+        traj_data: numpy.ndarray
+            The trajectory data, with one row of 31 columns per recorded step.
+    """
+    if traj_output == 1:
+        return np.loadtxt(run_path + "trajectory.txt", delimiter=",", skiprows=1, ndmin=2)
+    if traj_output != 2:
+        raise ValueError(f"Invalid trajectory output format {traj_output}")
+
+    bin_path = run_path + "trajectory.bin"
+    header = np.fromfile(bin_path, dtype=traj_bin_header_dtype, count=1)[0]
+    if header["magic"] != b"PYTRAJTR":
+        raise ValueError(f"{bin_path} is not a valid binary trajectory file")
+
+    num_columns = int(header["num_columns"])
+    data_offset = int(header["data_offset"])
+    num_rows = (os.path.getsize(bin_path) - data_offset) // (8 * num_columns)
+
+    traj_data = np.memmap(bin_path, dtype=np.float64, mode='r', offset=data_offset, shape=(num_rows, num_columns))
+
+    return traj_data
@@ -2,6 +2,7 @@
 
 import matplotlib.pyplot as plt
 import numpy as np
+from traj_io import load_trajectory
 
 params = {
     'axes.labelsize': 18,
@@ -13,12 +14,12 @@ params = {
 }
 plt.rcParams.update(params)
 
-def traj_plot(run_path):
+def traj_plot(run_path, traj_output=1):
     """
     Function to plot the trajectory of the vehicle.
     """
-    # load the trajectory data from the .txt file, skipping the first row
-    traj_data = np.loadtxt(run_path + "trajectory.txt", delimiter = ",", skiprows=1)
+    # load the trajectory data in the configured format (1 for trajectory.txt, 2 for trajectory.bin)
+    traj_data = load_trajectory(run_path, traj_output)
 
     true_t = traj_data[:,0]
     true_mass = traj_data[:,1]
@@ -397,6 +397,117 @@ TEST(atmosphere, parse_atm){
     REQUIRE_NE(density_0, density_1);
 }
 
+TEST(atmosphere, get_atm_store){
+    char* atmprofile = "input/atmprofiles.txt";
+
+    eg16_store *store = get_atm_store(atmprofile);
+    REQUIRE_EQ(store->num_profiles, 100);
+
+    // The store is only loaded once per process
+    REQUIRE_TRUE(get_atm_store(atmprofile) == store);
+
+    // Profiles are selected by index and match the parsed profile
+    eg16_profile *atm_profile = select_atm_profile(store, 1);
+    eg16_profile atm_data = parse_atm(atmprofile, 1);
+    REQUIRE_EQ(atm_profile->profile_num, 1);
+    for (int i = 0; i < 100; i++){
+        REQUIRE_EQ(atm_profile->alt_data[i], atm_data.alt_data[i]);
+        REQUIRE_EQ(atm_profile->density_data[i], atm_data.density_data[i]);
+        REQUIRE_EQ(atm_profile->meridional_wind_data[i], atm_data.meridional_wind_data[i]);
+        REQUIRE_EQ(atm_profile->zonal_wind_data[i], atm_data.zonal_wind_data[i]);
+        REQUIRE_EQ(atm_profile->vertical_wind_data[i], atm_data.vertical_wind_data[i]);
+    }
+    REQUIRE_EQ(store->profiles[99].alt_data[99], 99.0);
+
+    // Requesting a different file replaces the process-wide store, but the old store stays loaded while it is referenced
+    eg16_store *other = get_atm_store("input/atmprofiles.bin");
+    REQUIRE_TRUE(other != store);
+    REQUIRE_EQ(store->refcount, 2);
+    REQUIRE_EQ(store->profiles[99].alt_data[99], 99.0);
+    REQUIRE_EQ(other->profiles[99].alt_data[99], 99.0);
+    release_atm_store(store);
+    REQUIRE_EQ(store->refcount, 1);
+    release_atm_store(store);
+    release_atm_store(other);
+}
+
+TEST(atmosphere, write_atm_bin){
+    char* atmprofile = "input/atmprofiles.txt";
+    char* binprofile = "test/atmprofiles_test.bin";
+
+    char binpath[256];
+    REQUIRE_EQ(atm_bin_path(atmprofile, binpath, sizeof(binpath)), 0);
+    REQUIRE_EQ(strcmp(binpath, "input/atmprofiles.bin"), 0);
+
+    // A path that does not fit in the buffer is refused rather than cut off
+    REQUIRE_EQ(atm_bin_path(atmprofile, binpath, strlen("input/atmprofiles.bin")), 1);
+    REQUIRE_EQ(atm_bin_path(atmprofile, binpath, strlen("input/atmprofiles.bin") + 1), 0);
+
+    // Convert the text file and map the binary file
+    REQUIRE_EQ(write_atm_bin(atmprofile, binprofile), 0);
+    eg16_store store;
+    REQUIRE_EQ(load_atm_profiles(binprofile, &store), 0);
+    REQUIRE_TRUE(store.map != NULL);
+    REQUIRE_EQ(store.num_profiles, 100);
+
+    eg16_bin_header *header = (eg16_bin_header *) store.map;
+    REQUIRE_EQ(header->version, 1);
+    REQUIRE_EQ(header->num_levels, 100);
+    REQUIRE_EQ(header->data_offset, 64);
+    REQUIRE_EQ(store.map_size, 64 + 100*sizeof(eg16_profile));
+
+    // The mapped profiles match the text file
+    for (int n = 0; n < 100; n += 33){
+        eg16_profile atm_data = parse_atm(atmprofile, n);
+        REQUIRE_EQ(store.profiles[n].profile_num, n);
+        for (int i = 0; i < 100; i++){
+            REQUIRE_EQ(store.profiles[n].alt_data[i], atm_data.alt_data[i]);
+            REQUIRE_EQ(store.profiles[n].density_data[i], atm_data.density_data[i]);
+            REQUIRE_EQ(store.profiles[n].meridional_wind_data[i], atm_data.meridional_wind_data[i]);
+            REQUIRE_EQ(store.profiles[n].zonal_wind_data[i], atm_data.zonal_wind_data[i]);
+            REQUIRE_EQ(store.profiles[n].vertical_wind_data[i], atm_data.vertical_wind_data[i]);
+        }
+    }
+
+    free_atm_profiles(&store);
+    remove(binprofile);
+
+    // A missing binary file is an error
+    REQUIRE_EQ(load_atm_profiles(binprofile, &store), 1);
+}
+
+TEST(atmosphere, atm_store_switch){
+    // A text file whose binary file cannot be written is loaded into a heap copy
+    char* heapprofile = "test/atmprofiles_heap.txt";
+    char* heapbin = "test/atmprofiles_heap.bin";
+    remove(heapprofile);
+    rmdir(heapbin);
+    REQUIRE_EQ(symlink("../input/atmprofiles.txt", heapprofile), 0);
+    REQUIRE_EQ(mkdir(heapbin, 0700), 0);
+
+    eg16_store *mapped = get_atm_store("input/atmprofiles.txt");
+    REQUIRE_TRUE(mapped->map != NULL);
+
+    // Switching between the mapped store and the heap copy keeps the store in use loaded
+    eg16_store *heap = get_atm_store(heapprofile);
+    REQUIRE_TRUE(heap->map == NULL);
+    REQUIRE_EQ(heap->num_profiles, 100);
+    REQUIRE_EQ(mapped->refcount, 1);
+    REQUIRE_EQ(mapped->profiles[99].alt_data[99], 99.0);
+
+    eg16_store *remapped = get_atm_store("input/atmprofiles.txt");
+    REQUIRE_TRUE(remapped != mapped);
+    REQUIRE_EQ(heap->refcount, 1);
+    REQUIRE_EQ(heap->profiles[99].alt_data[99], 99.0);
+    REQUIRE_EQ(mapped->profiles[99].alt_data[99], 99.0);
+
+    release_atm_store(heap);
+    release_atm_store(mapped);
+    release_atm_store(remapped);
+    rmdir(heapbin);
+    remove(heapprofile);
+}
+
 TEST(atmosphere, get_eg_atm_cond){
     // Test the get_eg_atm_cond function
 
@@ -449,4 +560,75 @@ TEST(atmosphere, get_eg_atm_cond){
 
     REQUIRE_EQ(atm_conditions.altitude, 100);
     REQUIRE_GT(atm_data.density_data[99], atm_conditions.density);
-}
\ No newline at end of file
+}
+TEST(atmosphere, eg16_bracket){
+    // The bracket matches the linear scan of linterp at, between and beyond the profile levels
+    eg16_profile atm_data = parse_atm("input/atmprofiles.txt", 3);
+
+    for (int k = -20; k <= 1020; k++){
+        double altitude = 100.0 * k / 1000;
+        int i = eg16_bracket(altitude, &atm_data);
+        REQUIRE_GE(i, 0);
+        REQUIRE_LT(i, ATM_NUM_LEVELS);
+        if (i > 0){
+            REQUIRE_GT(altitude, atm_data.alt_data[i-1]);
+        }
+        if (i < ATM_NUM_LEVELS - 1){
+            REQUIRE_LE(altitude, atm_data.alt_data[i]);
+        }
+
+        if (altitude <= 99){
+            REQUIRE_EQ(get_eg_atm_cond(100.0 * k, &atm_data).density, linterp(altitude < 0 ? 0 : altitude, atm_data.alt_data, atm_data.density_data, ATM_NUM_LEVELS));
+        }
+    }
+}
+TEST(atmosphere, atm_table){
+    runparams run_params;
+    run_params.atm_model = 0;
+    run_params.atm_error = 1;
+
+    const gsl_rng_type *T;
+    gsl_rng *rng;
+    gsl_rng_env_setup();
+    T = gsl_rng_default;
+    rng = gsl_rng_alloc(T);
+
+    // The band constants reproduce the perturbed model up to rounding
+    atm_model atm_model = init_exp_atm(&run_params, rng);
+    double altitudes[8] = {-10, 0, 4999, 5000, 23456.7, 98999.5, 150000, 5e5};
+    atm_cond direct[8];
+    for (int i = 0; i < 8; i++){
+        direct[i] = get_atm_cond(altitudes[i], &atm_model, &run_params, NULL);
+    }
+    init_atm_table(&atm_model, NULL);
+    for (int i = 0; i < 8; i++){
+        atm_cond table = get_atm_cond(altitudes[i], &atm_model, &run_params, NULL);
+        REQUIRE_LE(fabs(table.density - direct[i].density), 1e-14 * direct[i].density);
+        REQUIRE_EQ(table.meridional_wind, direct[i].meridional_wind);
+        REQUIRE_EQ(table.zonal_wind, direct[i].zonal_wind);
+        REQUIRE_EQ(table.vertical_wind, direct[i].vertical_wind);
+    }
+
+    // The EarthGRAM tables are built once per store and reproduce the profile exactly
+    eg16_store *store = get_atm_store(ATM_PROFILE_PATH);
+    eg16_table *eg_table = select_eg_table(store, 7);
+    REQUIRE_TRUE(select_eg_table(store, 7) == eg_table);
+    REQUIRE_TRUE(select_eg_table(store, 8) == eg_table + 1);
+    eg16_profile *atm_profile = select_atm_profile(store, 7);
+
+    run_params.atm_model = 1;
+    init_atm_table(&atm_model, eg_table);
+    for (int k = -20; k <= 10200; k++){
+        double altitude = 9.7 * k;
+        atm_cond expected = get_eg_atm_cond(altitude, atm_profile);
+        atm_cond table = get_atm_cond(altitude, &atm_model, &run_params, atm_profile);
+        REQUIRE_EQ(table.altitude, expected.altitude);
+        REQUIRE_EQ(table.density, expected.density);
+        REQUIRE_EQ(table.meridional_wind, expected.meridional_wind);
+        REQUIRE_EQ(table.zonal_wind, expected.zonal_wind);
+        REQUIRE_EQ(table.vertical_wind, expected.vertical_wind);
+    }
+    release_atm_store(store);
+
+    gsl_rng_free(rng);
+}
@@ -6,6 +6,7 @@ import numpy as np
 
 sys.path.append('.')
 from src.pylib import *
+from src.traj_io import *
 so_file = "./build/libPyTraj.so"
 pytraj = CDLL(so_file)
 
@@ -54,6 +55,11 @@ def test_read_config():
     assert run_params.step_acc_mag == 0.0
     assert run_params.step_acc_hgt == 0.0
     assert run_params.step_acc_dur == 0.0
+
+    assert run_params.num_threads == 1
+    assert run_params.traj_every == 1
+    assert run_params.traj_dt_reentry == 0
+    assert run_params.traj_async == 0
     
 
 
@@ -852,4 +858,733 @@ def test_integration_15():
 
     cep3 = get_cep(impact_data, run_params)
 
-    assert cep1 < cep2 < cep3
\ No newline at end of file
+    assert cep1 < cep2 < cep3
+
+
+def test_integration_16():
+    """
+    Verify that the impact data does not depend on the number of worker threads
+    """
+
+    run_params = read_config("test")
+    run_params.num_runs = 8
+    run_params.rv_maneuv = 0
+    run_params.atm_error = 1
+    run_params.initial_pos_error = c_double(1.0)
+    run_params.gyro_noise = c_double(1e-6)
+
+    run_params.num_threads = 1
+    impact_data_pointer = pytraj.mc_run(run_params)
+
+    # Read the impact data
+    run_path = "./output/test/"
+    impact_data_serial = np.loadtxt(run_path + "impact_data.txt", delimiter = ",", skiprows=1)
+
+    run_params.num_threads = 4
+    impact_data_pointer = pytraj.mc_run(run_params)
+
+    # Read the impact data
+    impact_data_parallel = np.loadtxt(run_path + "impact_data.txt", delimiter = ",", skiprows=1)
+
+    assert impact_data_serial.shape == (8, 7)
+    assert np.array_equal(impact_data_serial, impact_data_parallel)
+    assert not np.allclose(impact_data_serial[0,:], impact_data_serial[1,:], atol=1e-6)
+
+
+def test_load_atm_profiles():
+    """
+    Verify that the memory mapped binary atmospheric profiles match the text file
+    """
+
+    profiles = load_atm_profiles("./input/atmprofiles.txt")
+    atm_data = np.loadtxt("./input/atmprofiles.txt")
+
+    assert profiles.shape == (100,)
+    assert profiles["profile_num"][7] == 7
+    assert np.array_equal(profiles["alt_data"].ravel(), atm_data[:,1])
+    assert np.array_equal(profiles["density_data"].ravel(), atm_data[:,2])
+    assert np.array_equal(profiles["meridional_wind_data"].ravel(), atm_data[:,3])
+    assert np.array_equal(profiles["zonal_wind_data"].ravel(), atm_data[:,4])
+    assert np.array_equal(profiles["vertical_wind_data"].ravel(), atm_data[:,5])
+
+
+def test_integration_17():
+    """
+    Verify that more runs than a single impact block (and the old MAX_RUNS limit) are collected in order
+    """
+
+    # Reentry only runs with a coarse time step keep this test fast
+    run_params = read_config("test")
+    run_params.run_type = 1
+    run_params.num_runs = 2100
+    run_params.rv_maneuv = 0
+    run_params.time_step_reentry = 1.0
+    run_params.initial_pos_error = c_double(1.0)
+
+    run_params.num_threads = 1
+    impact_data_pointer = pytraj.mc_run(run_params)
+
+    # Read the impact data
+    run_path = "./output/test/"
+    impact_data_serial = np.loadtxt(run_path + "impact_data.txt", delimiter = ",", skiprows=1)
+
+    run_params.num_threads = 3
+    impact_data_pointer = pytraj.mc_run(run_params)
+
+    # Read the impact data
+    impact_data_parallel = np.loadtxt(run_path + "impact_data.txt", delimiter = ",", skiprows=1)
+
+    assert impact_data_serial.shape == (2100, 7)
+    assert np.array_equal(impact_data_serial, impact_data_parallel)
+    assert len(np.unique(impact_data_serial[:,2])) == 2100
+
+
+def test_integration_18():
+    """
+    Verify that the impact data returned as an array matches the impact data file
+    """
+
+    run_params = read_config("test")
+    run_params.num_runs = 4
+    run_params.rv_maneuv = 0
+    run_params.initial_pos_error = c_double(1.0)
+
+    impact_data_pointer = pytraj.mc_run(run_params)
+
+    # Read the impact data
+    run_path = "./output/test/"
+    impact_data_file = np.loadtxt(run_path + "impact_data.txt", delimiter = ",", skiprows=1)
+
+    impact_data = mc_run_array(run_params)
+
+    assert impact_data.shape == (4, 7)
+    assert np.allclose(impact_data, impact_data_file, rtol=0, atol=1e-6)
+    assert get_cep(impact_data, run_params) == pytest.approx(get_cep(impact_data_file, run_params), abs=1e-5)
+
+def test_integration_19():
+    """
+    Verify that the binary trajectory file matches the text trajectory file
+    """
+
+    run_params = read_config("test")
+    run_params.num_runs = 1
+    run_params.rv_maneuv = 0
+
+    # Write the text trajectory file
+    run_params.traj_output = 1
+    run_params.trajectory_path = b"./output/test/trajectory.txt"
+    impact_data_pointer = pytraj.mc_run(run_params)
+
+    # Write the binary trajectory file
+    run_params.traj_output = 2
+    run_params.trajectory_path = b"./output/test/trajectory.bin"
+    impact_data_pointer = pytraj.mc_run(run_params)
+
+    traj_data_bin = load_trajectory("./output/test/", 2)
+    header = np.fromfile("./output/test/trajectory.bin", dtype=traj_bin_header_dtype, count=1)[0]
+    column_names = np.fromfile("./output/test/trajectory.bin", dtype="S32", count=31, offset=64)
+    traj_data_txt = load_trajectory("./output/test/", 1)
+    os.remove("./output/test/trajectory.bin")
+
+    assert header["num_columns"] == 31
+    assert column_names[0] == b"t"
+    assert column_names[30] == b"est_az_total"
+    assert traj_data_bin.shape == traj_data_txt.shape
+    assert np.allclose(traj_data_bin, traj_data_txt, rtol=1e-5, atol=1e-6)
+
+def test_integration_20():
+    """
+    Verify that the trajectory recording policies decimate the trajectory and that the writer thread does not change it
+    """
+
+    run_params = read_config("test")
+    run_params.num_runs = 1
+    run_params.rv_maneuv = 0
+    run_params.traj_output = 2
+    run_params.trajectory_path = b"./output/test/trajectory.bin"
+
+    # Record every step
+    impact_data_pointer = pytraj.mc_run(run_params)
+    traj_full = np.array(load_trajectory("./output/test/", 2))
+
+    # Record every 10th step, from the writer thread
+    run_params.traj_every = 10
+    run_params.traj_async = 1
+    impact_data_pointer = pytraj.mc_run(run_params)
+    traj_every = np.array(load_trajectory("./output/test/", 2))
+
+    # Record at most once every 5 seconds
+    run_params.traj_every = 1
+    run_params.traj_async = 0
+    run_params.traj_dt_boost = 5.0
+    run_params.traj_dt_midcourse = 5.0
+    run_params.traj_dt_reentry = 5.0
+    impact_data_pointer = pytraj.mc_run(run_params)
+    traj_dt = np.array(load_trajectory("./output/test/", 2))
+    os.remove("./output/test/trajectory.bin")
+
+    # The initial and final states are always recorded
+    num_steps = traj_full.shape[0] - 2
+    assert traj_every.shape[0] == num_steps // 10 + 2
+    assert np.array_equal(traj_every[1:-1], traj_full[10:num_steps+1:10])
+    assert np.array_equal(traj_every[[0, -1]], traj_full[[0, -1]])
+
+    assert traj_dt.shape[0] < traj_full.shape[0]
+    assert np.array_equal(traj_dt[[0, -1]], traj_full[[0, -1]])
+    assert np.all(np.diff(traj_dt[:-1, 0]) > 5 - 1e-6)
+
+    # The midcourse and reentry records are split at alt_exo
+    run_params.alt_exo = 5e5
+    run_params.traj_dt_boost = 0
+    run_params.traj_dt_midcourse = 20.0
+    run_params.traj_dt_reentry = 0
+    impact_data_pointer = pytraj.mc_run(run_params)
+    traj_phase = np.array(load_trajectory("./output/test/", 2))
+    os.remove("./output/test/trajectory.bin")
+
+    pytraj.get_altitude.restype = c_double
+    pytraj.get_altitude.argtypes = [c_double, c_double, c_double]
+    altitude = np.array([pytraj.get_altitude(x, y, z) for x, y, z in traj_phase[:, 2:5]])
+    coasting = np.all(traj_phase[:, 16:19] == 0, axis=1) & (traj_phase[:, 0] > 0)
+    midcourse_times = traj_phase[coasting & (altitude > 5e5 + 1e3), 0]
+    reentry_times = traj_phase[coasting & (altitude < 5e5 - 1e3) & (traj_phase[:, 0] > midcourse_times[-1]), 0][:-1]
+    assert len(midcourse_times) > 2 and np.all(np.diff(midcourse_times) > 20 - 1e-6)
+    assert len(reentry_times) > 2 and np.all(np.diff(reentry_times) < 20)
+
+def test_integration_21():
+    """
+    Verify that the sweep runner matches running each sweep point in turn
+    """
+
+    run_params = read_config("test")
+    run_params.num_runs = 3
+    run_params.rv_maneuv = 0
+
+    overrides = [{"initial_pos_error": 1.0 * i, "initial_vel_error": 0.0} for i in range(1, 4)]
+    overrides.append({"initial_vel_error": 0.1})
+
+    sweep_data = sweep(run_params, overrides, num_workers=2)
+
+    assert set(sweep_data.keys()) == {"initial_pos_error", "initial_vel_error", "cep"}
+    assert np.array_equal(sweep_data["initial_pos_error"], [1.0, 2.0, 3.0, run_params.initial_pos_error])
+    assert np.array_equal(sweep_data["initial_vel_error"], [0.0, 0.0, 0.0, 0.1])
+
+    for i, point in enumerate(overrides):
+        point_params = read_config("test")
+        point_params.num_runs = 3
+        point_params.rv_maneuv = 0
+        for name, value in point.items():
+            setattr(point_params, name, value)
+        cep = get_cep(mc_run_array(point_params), point_params)
+
+        assert sweep_data["cep"][i] == pytest.approx(cep)
+        assert os.path.isdir(f"./output/test/sweep/point_{i}")
+
+def test_integration_22():
+    """
+    Verify that a native sweep matches running each sweep point with mc_run_array
+    """
+
+    run_params = read_config("test")
+    run_params.num_runs = 3
+    run_params.rv_maneuv = 0
+
+    variants = []
+    for i in range(3):
+        variant = read_config("test")
+        variant.num_runs = 2 + i
+        variant.rv_maneuv = 0
+        variant.initial_pos_error = c_double(10.0 * i)
+        variants.append(variant)
+
+    impact_data = mc_sweep_array(variants, num_threads=3)
+
+    assert len(impact_data) == 3
+    for variant, data in zip(variants, impact_data):
+        assert data.shape == (variant.num_runs, 7)
+        assert np.array_equal(data, mc_run_array(variant))
+
+    # The native sweep gives the same table as the process pool
+    overrides = [{"initial_pos_error": 10.0 * i} for i in range(3)]
+    sweep_data = sweep(run_params, overrides, num_workers=2, native=True)
+    assert np.allclose(sweep_data["cep"], sweep(run_params, overrides, num_workers=1)["cep"])
+
+def test_integration_23():
+    """
+    Verify that the adaptive integrator converges as the tolerances are tightened and reports its step counts
+    """
+
+    run_params = read_config("test")
+    run_params.num_runs = 1
+    run_params.rv_maneuv = 0
+    run_params.integrator = 1
+
+    impact_data, stats = mc_run_array(run_params, return_stats=True)
+
+    assert stats.accepted > 0
+    assert stats.rejected >= 0
+
+    # Tighter tolerances and a smaller maximum step
+    run_params.rtol = 1e-12
+    run_params.atol = 1e-9
+    run_params.dt_max = 0.1
+    impact_data_ref, stats_ref = mc_run_array(run_params, return_stats=True)
+
+    assert stats_ref.accepted > stats.accepted
+    assert np.linalg.norm(impact_data[0, 1:4] - impact_data_ref[0, 1:4]) < 1
+
+    # The counts belong to each call: a sweep of both settings takes the steps of both runs
+    loose_params = read_config("test")
+    loose_params.num_runs = 1
+    loose_params.rv_maneuv = 0
+    loose_params.integrator = 1
+    sweep_data, stats_sweep = mc_sweep_array([loose_params, run_params], num_threads=2, return_stats=True)
+    assert stats_sweep.accepted == stats.accepted + stats_ref.accepted
+    assert stats_sweep.rejected == stats.rejected + stats_ref.rejected
+
+def test_integration_24():
+    """
+    Verify that the closed-form coast matches integrating the coast phase
+    """
+
+    run_params = read_config("test")
+    run_params.num_runs = 1
+    run_params.rv_maneuv = 0
+    run_params.integrator = 1
+
+    impact_data = mc_run_array(run_params)
+    run_params.coast_mode = 1
+    impact_data_coast = mc_run_array(run_params)
+
+    assert np.linalg.norm(impact_data[0, 1:4] - impact_data_coast[0, 1:4]) < 1
+    assert impact_data_coast[0, 0] == pytest.approx(impact_data[0, 0], abs=1e-3)
+
+def test_integration_25():
+    """
+    Verify that the default step schedule reproduces the fixed time steps and that the schedule sets the steps
+    """
+
+    run_params = read_config("test")
+    run_params.num_runs = 2
+    run_params.rv_maneuv = 0
+    run_params.initial_pos_error = c_double(1.0)
+
+    assert run_params.step_upper == 0
+    assert run_params.alt_exo == 1e6
+
+    impact_data = mc_run_array(run_params)
+
+    # An explicit schedule with the same steps
+    run_params.step_boost = run_params.time_step_main
+    run_params.step_exo = run_params.time_step_main
+    run_params.step_upper = run_params.time_step_reentry
+    run_params.step_dense = run_params.time_step_reentry
+    assert np.array_equal(mc_run_array(run_params), impact_data)
+
+    # A coarser step in the upper atmosphere
+    run_params.step_upper = 0.1
+    run_params.traj_output = 2
+    run_params.trajectory_path = b"./output/test/trajectory.bin"
+    impact_data_upper = mc_run_array(run_params)
+    traj_data = np.array(load_trajectory("./output/test/", 2))
+    os.remove("./output/test/trajectory.bin")
+
+    altitude = np.sqrt(np.sum(np.square(traj_data[:, 2:5]), axis=1)) - 6371e3
+    time_steps = np.diff(traj_data[:-1, 0])
+    upper = (altitude[:-2] > 2e5) & (altitude[:-2] < 9e5) & (traj_data[:-2, 0] > 300)
+    assert np.any(upper)
+    assert np.allclose(time_steps[upper], 0.1)
+    assert not np.array_equal(impact_data_upper, impact_data)
+
+def test_integration_26():
+    """
+    Verify that event location moves the impact closer to a reference than linear interpolation, and that it records
+    the step schedule altitude crossings
+    """
+
+    run_params = read_config("test")
+    run_params.num_runs = 1
+    run_params.rv_maneuv = 0
+    run_params.integrator = 1
+    run_params.event_location = 1
+
+    assert read_config("test").event_location == 0
+
+    # Reference impact with tight tolerances and short steps
+    run_params.rtol = c_double(1e-12)
+    run_params.atol = c_double(1e-9)
+    run_params.dt_max = c_double(0.05)
+    impact_data_ref = mc_run_array(run_params)
+
+    # Coarse steps, with and without event location
+    run_params.rtol = c_double(1e-9)
+    run_params.atol = c_double(1e-6)
+    run_params.dt_max = c_double(5.0)
+    impact_data_event = mc_run_array(run_params)
+    run_params.event_location = 0
+    impact_data_linterp = mc_run_array(run_params)
+
+    error_event = np.linalg.norm(impact_data_event[0, 1:4] - impact_data_ref[0, 1:4])
+    error_linterp = np.linalg.norm(impact_data_linterp[0, 1:4] - impact_data_ref[0, 1:4])
+    assert error_event < error_linterp / 10
+
+    # The crossings of alt_exo and alt_dense are written to the trajectory
+    run_params.event_location = 1
+    run_params.traj_output = 2
+    run_params.trajectory_path = b"./output/test/trajectory.bin"
+    mc_run_array(run_params)
+    traj_data = np.array(load_trajectory("./output/test/", 2))
+    os.remove("./output/test/trajectory.bin")
+
+    altitude = np.sqrt(np.sum(np.square(traj_data[:, 2:5]), axis=1)) - 6371e3
+    assert np.min(np.abs(altitude - run_params.alt_dense)) < 1e-3
+    assert np.sum(np.abs(altitude - run_params.alt_exo) < 1e-3) == 2
+
+def test_integration_27():
+    """
+    Verify that the NumPy batch simulator matches the C simulation without errors, and that every sample impacts
+    """
+    from src.batch import batch_run
+
+    run_params = read_config("test")
+    run_params.num_runs = 2
+    run_params.rv_maneuv = 0
+    run_params.step_upper = 0.1
+
+    impact_data = mc_run_array(run_params)
+    impact_data_batch = batch_run(run_params, seed=0)
+    assert np.allclose(impact_data_batch[:, 1:4], impact_data[:, 1:4], rtol=0, atol=1e-6)
+    assert np.allclose(impact_data_batch[:, 0], impact_data[:, 0], rtol=0, atol=1e-9)
+
+    # With errors, the samples impact at different times and leave the batch one by one
+    run_params.num_runs = 20
+    run_params.grav_error = 1
+    run_params.atm_error = 1
+    run_params.initial_vel_error = c_double(1e-2)
+    run_params.gyro_noise = c_double(1e-8)
+    impact_data_batch = batch_run(run_params, seed=0)
+    altitude = np.sqrt(np.sum(np.square(impact_data_batch[:, 1:4]), axis=1)) - 6371e3
+    assert np.all(np.abs(altitude) < 100)
+    assert len(np.unique(impact_data_batch[:, 0])) > 1
+    assert np.array_equal(batch_run(run_params, seed=0), impact_data_batch)
+
+    run_params.rv_maneuv = 1
+    with pytest.raises(ValueError):
+        batch_run(run_params)
+
+def test_integration_28():
+    """
+    Verify that the struct-of-arrays lane engine gives the same impacts as flying the samples one at a time
+    """
+    run_params = read_config("test")
+    run_params.num_runs = 10
+    run_params.num_threads = 2
+    run_params.rv_maneuv = 0
+    run_params.step_upper = 0.1
+    run_params.grav_error = 1
+    run_params.atm_error = 1
+    run_params.initial_vel_error = c_double(1e-2)
+    run_params.gyro_noise = c_double(1e-8)
+
+    impact_data = mc_run_array(run_params)
+    run_params.lanes = 4
+    impact_data_lanes = mc_run_array(run_params)
+    assert np.array_equal(impact_data_lanes, impact_data)
+
+def test_integration_29():
+    """
+    Verify that the atmosphere tables reproduce the EarthGRAM profiles exactly and the perturbed model up to rounding
+    """
+    for atm_model in [0, 1]:
+        run_params = read_config("test")
+        run_params.num_runs = 4
+        run_params.rv_maneuv = 0
+        run_params.atm_error = 1
+        run_params.atm_model = atm_model
+
+        impact_data = mc_run_array(run_params)
+        run_params.atm_table = 1
+        impact_data_table = mc_run_array(run_params)
+        run_params.lanes = 4
+        impact_data_lanes = mc_run_array(run_params)
+
+        assert np.array_equal(impact_data_lanes, impact_data_table)
+        if atm_model == 1:
+            assert np.array_equal(impact_data_table, impact_data)
+        else:
+            assert np.allclose(impact_data_table[:, 1:4], impact_data[:, 1:4], rtol=0, atol=1e-6)
+
+def test_integration_30():
+    """
+    Verify that the counter-based random number streams are reproducible across threads and lanes, and that the seed
+    selects them
+    """
+    run_params = read_config("test")
+    run_params.num_runs = 6
+    run_params.num_threads = 1
+    run_params.rv_maneuv = 0
+    run_params.grav_error = 1
+    run_params.atm_error = 1
+    run_params.gyro_noise = c_double(1e-8)
+
+    impact_data_sequential = mc_run_array(run_params)
+    run_params.rng_mode = 1
+    impact_data = mc_run_array(run_params)
+    assert not np.array_equal(impact_data, impact_data_sequential)
+
+    run_params.num_threads = 2
+    run_params.lanes = 4
+    assert np.array_equal(mc_run_array(run_params), impact_data)
+
+    run_params.num_runs = 3
+    assert np.array_equal(mc_run_array(run_params), impact_data[:3])
+
+    run_params.seed = 1
+    assert not np.array_equal(mc_run_array(run_params), impact_data[:3])
+
+def test_integration_31():
+    """
+    Verify that common random numbers give a smooth CEP curve when one error parameter is scaled across a sweep
+    """
+    run_params = read_config("test")
+    run_params.num_runs = 5
+    run_params.rv_maneuv = 0
+
+    # aim at the impact point without errors, so that the miss distance scales with the error
+    impact_data = mc_run_array(run_params)
+    run_params.x_aim, run_params.y_aim, run_params.z_aim = impact_data[0, 1], impact_data[0, 2], impact_data[0, 3]
+
+    scales = np.array([0.5, 1.0, 2.0])
+    overrides = [{"initial_vel_error": 0.1 * scale} for scale in scales]
+    sweep_data = sweep(run_params, overrides, num_workers=1, common_random_numbers=True)
+    cep_ratio = sweep_data["cep"] / scales
+    assert np.ptp(cep_ratio) < 0.01 * np.mean(cep_ratio)
+
+    # The native sweep draws the same numbers as the process pool
+    sweep_data_native = sweep(run_params, overrides, num_workers=2, native=True, common_random_numbers=True)
+    assert np.allclose(sweep_data_native["cep"], sweep_data["cep"])
+
+    with pytest.raises(ValueError):
+        sweep(run_params, [{"seed": 1}], num_workers=1, common_random_numbers=True)
+
+def test_integration_32():
+    """
+    Verify the antithetic and Sobol sampling of the static errors, and the variance reduction report
+    """
+    run_params = read_config("test")
+    run_params.num_runs = 16
+    run_params.rv_maneuv = 0
+
+    # aim at the impact point without errors
+    impact_data = mc_run_array(run_params)
+    run_params.x_aim, run_params.y_aim, run_params.z_aim = impact_data[0, 1], impact_data[0, 2], impact_data[0, 3]
+    run_params.initial_pos_error = c_double(10)
+    run_params.initial_vel_error = c_double(0.1)
+
+    # The runs of each antithetic pair land on either side of the aimpoint
+    run_params.sampling = 1
+    local_impacts = get_local_impacts(mc_run_array(run_params), run_params)
+    pair_means = (local_impacts[0::2] + local_impacts[1::2]) / 2
+    assert np.mean(np.abs(pair_means)) < 0.2 * np.mean(np.abs(local_impacts))
+
+    # Sobol sampling is reproducible across threads and lanes, and spreads the impacts evenly
+    run_params.sampling = 2
+    impact_data = mc_run_array(run_params)
+    run_params.num_threads = 2
+    run_params.lanes = 4
+    assert np.array_equal(mc_run_array(run_params), impact_data)
+
+    variance_reduction = get_variance_reduction(run_params, num_replicates=4)
+    assert set(variance_reduction.keys()) == {"cep", "mean_impact"}
+    assert variance_reduction["mean_impact"] > 1
+
+def test_integration_33():
+    """
+    Verify that the sequential Monte Carlo runs continue each other's run indices and stop on the CEP precision target
+    """
+    run_params = read_config("test")
+    run_params.num_runs = 12
+    run_params.rv_maneuv = 0
+    run_params.initial_vel_error = c_double(0.1)
+
+    # A run starting at first_run repeats the matching rows of a longer run
+    impact_data = mc_run_array(run_params)
+    run_params.first_run = 5
+    run_params.num_runs = 7
+    assert np.array_equal(mc_run_array(run_params), impact_data[5:])
+    run_params.first_run = 0
+
+    # Out of budget before the precision target is reached
+    impact_data_sequential, summary = mc_run_sequential(run_params, batch_size=5, rel_precision=1e-6, max_runs=12)
+    assert summary["num_runs"] == 12
+    assert not summary["converged"]
+    assert np.array_equal(impact_data_sequential, impact_data)
+    assert summary["cep"] == pytest.approx(get_cep(impact_data, run_params))
+    assert summary["cep_lower"] <= summary["cep"] <= summary["cep_upper"]
+
+    # A loose target stops after the first batch that reaches it
+    impact_data_sequential, summary = mc_run_sequential(run_params, batch_size=20, rel_precision=10, max_runs=1000)
+    assert summary["converged"]
+    assert summary["num_runs"] == 20
+    assert (summary["cep_upper"] - summary["cep_lower"]) / 2 <= 10 * summary["cep"]
+
+    # Without a run budget or batch size there is no CEP to report
+    with pytest.raises(ValueError):
+        mc_run_sequential(run_params, batch_size=0)
+    with pytest.raises(ValueError):
+        mc_run_sequential(run_params, max_runs=0)
+
+def test_integration_34():
+    """
+    Verify that the streaming impact summary matches the statistics of the stored impacts
+    """
+    run_params = read_config("test")
+    run_params.num_runs = 50
+    run_params.num_threads = 2
+    run_params.rv_maneuv = 0
+
+    # aim at the impact point without errors
+    impact_data = mc_run_array(run_params)
+    run_params.x_aim, run_params.y_aim, run_params.z_aim = impact_data[0, 1], impact_data[0, 2], impact_data[0, 3]
+    run_params.initial_vel_error = c_double(0.1)
+
+    impact_data = mc_run_array(run_params)
+    summary = mc_run_summary(run_params)
+    local_impacts = get_local_impacts(impact_data, run_params)
+    miss_distance = np.sqrt(local_impacts[:, 0]**2 + local_impacts[:, 1]**2)
+
+    assert summary["num_runs"] == 50
+    assert summary["miss_mean"] == pytest.approx(np.mean(miss_distance))
+    assert np.allclose(summary["offset_mean"], np.mean(local_impacts, axis=0))
+    assert np.allclose(summary["offset_cov"], np.cov(local_impacts.T))
+    assert summary["time_mean"] == pytest.approx(np.mean(impact_data[:, 0]))
+    assert summary["time_std"] == pytest.approx(np.std(impact_data[:, 0], ddof=1))
+    assert summary["time_min"] == np.min(impact_data[:, 0])
+    assert summary["time_max"] == np.max(impact_data[:, 0])
+
+    # The P-square quantiles are estimates that lie within the range of the neighbouring order statistics
+    sorted_miss = np.sort(miss_distance)
+    assert sorted_miss[17] <= summary["cep"] <= sorted_miss[32]
+    assert sorted_miss[40] <= summary["miss_90"] <= sorted_miss[49]
+
+    # Fewer than five runs give the exact quantiles
+    run_params.num_runs = 3
+    summary = mc_run_summary(run_params)
+    assert summary["cep"] == pytest.approx(get_cep(impact_data[:3], run_params))
+
+def test_integration_35(tmp_path):
+    """
+    Verify that a checkpointed Monte Carlo simulation that is killed part way resumes to the impact file of an uninterrupted run
+    """
+    import multiprocessing
+    import time
+
+    run_params = read_config("test")
+    run_params.num_runs = 100
+    run_params.rv_maneuv = 0
+    run_params.initial_vel_error = c_double(0.1)
+    run_params.checkpoint = 10
+
+    # uninterrupted run, which leaves no checkpoint behind
+    reference_path = str(tmp_path / "impact_data_reference.txt")
+    run_params.impact_data_path = reference_path.encode('utf-8')
+    pytraj.mc_run(run_params)
+    assert not os.path.exists(reference_path + ".ckpt")
+
+    # kill a run once it has written its first checkpoint
+    resume_path = str(tmp_path / "impact_data_resume.txt")
+    checkpoint_path = resume_path + ".ckpt"
+    run_params.impact_data_path = resume_path.encode('utf-8')
+    process = multiprocessing.get_context("fork").Process(target=pytraj.mc_run, args=(run_params,))
+    process.start()
+    while not os.path.exists(checkpoint_path) and process.is_alive():
+        time.sleep(0.001)
+    process.kill()
+    process.join()
+    assert os.path.exists(checkpoint_path)
+
+    # a checkpoint of different run parameters is refused and kept
+    run_params.seed = 1
+    with pytest.raises(ValueError):
+        mc_resume(run_params)
+    assert os.path.exists(checkpoint_path)
+    run_params.seed = 0
+
+    # the resumed run skips the completed runs, and may use more threads
+    run_params.num_threads = 2
+    completed = mc_resume(run_params)
+    assert 10 <= completed < 100
+    assert not os.path.exists(checkpoint_path)
+    with open(reference_path) as reference, open(resume_path) as resumed:
+        assert resumed.read() == reference.read()
+
+    # without a checkpoint, the whole simulation is run
+    assert mc_resume(run_params) == 0
+    with open(reference_path) as reference, open(resume_path) as resumed:
+        assert resumed.read() == reference.read()
+
+def test_integration_36(tmp_path, monkeypatch):
+    """
+    Verify that the result cache returns the stored impacts of identical runs and evicts the least recently used entries
+    """
+    import time
+
+    cache_path = str(tmp_path / "cache")
+    impact_data_path = str(tmp_path / "impact_data.txt")
+
+    run_params = read_config("test")
+    run_params.num_runs = 10
+    run_params.rv_maneuv = 0
+    run_params.initial_vel_error = c_double(0.1)
+    impact_data = mc_run_array(run_params)
+
+    # a miss runs the simulation and stores its impacts
+    assert cache_load(run_params, cache_path) is None
+    assert np.array_equal(mc_run_cached(run_params, cache_path), impact_data)
+    entry = os.path.join(cache_path, cache_key(run_params) + ".npy")
+    assert os.path.isfile(entry)
+
+    # a hit returns the stored impacts without running the simulation
+    np.save(entry, impact_data + 1)
+    assert np.array_equal(mc_run_cached(run_params, cache_path), impact_data + 1)
+    np.save(entry, impact_data)
+
+    # the key ignores the paths and threads, but not the seed
+    key = cache_key(run_params)
+    run_params.num_threads = 4
+    run_params.impact_data_path = str(tmp_path / "other.txt").encode('utf-8')
+    assert cache_key(run_params) == key
+    run_params.seed = 1
+    assert cache_key(run_params) != key
+    run_params.seed = 0
+
+    # the impacts write out as mc_run writes them
+    run_params.impact_data_path = impact_data_path.encode('utf-8')
+    pytraj.mc_run(run_params)
+    with open(impact_data_path) as impact_file:
+        mc_run_text = impact_file.read()
+    save_impact_data(mc_run_cached(run_params, cache_path), impact_data_path)
+    with open(impact_data_path) as impact_file:
+        assert impact_file.read() == mc_run_text
+
+    # with room for two entries, the least recently used one is evicted
+    entry_size = os.path.getsize(entry)
+    keys = []
+    for seed in (1, 2, 3):
+        run_params.seed = seed
+        time.sleep(0.01)
+        mc_run_cached(run_params, cache_path, max_bytes=3 * entry_size)
+        keys.append(cache_key(run_params))
+    run_params.seed = 1
+    time.sleep(0.01)
+    mc_run_cached(run_params, cache_path)
+    assert evict_cache(cache_path, max_bytes=2 * entry_size) == 2 * entry_size
+    assert sorted(os.listdir(cache_path)) == sorted([keys[0] + ".npy", keys[2] + ".npy"])
+    run_params.seed = 0
+
+    # a cached native sweep matches an uncached one, whether or not its points are in the cache
+    monkeypatch.setattr(sys.modules["src.pylib"], "cache_dir", cache_path)
+    overrides = [{"initial_vel_error": 0.1}, {"initial_vel_error": 0.2}]
+    sweep_data = sweep(run_params, overrides, num_workers=2, native=True)
+    assert np.array_equal(sweep(run_params, overrides, num_workers=2, native=True, cache=True)["cep"], sweep_data["cep"])
+    assert np.array_equal(sweep(run_params, overrides, num_workers=2, native=True, cache=True)["cep"], sweep_data["cep"])
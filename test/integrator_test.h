@@ -0,0 +1,118 @@
+#include <tau/tau.h>
+#include "../src/include/integrator.h"
+
+TEST(integrator, dp54_adapt){
+    const gsl_rng_type *T;
+    gsl_rng *rng;
+    gsl_rng_env_setup();
+    T = gsl_rng_default;
+    rng = gsl_rng_alloc(T);
+
+    runparams run_params;
+    run_params.run_type = 0;
+    run_params.grav_error = 0;
+    run_params.atm_error = 0;
+    run_params.atm_model = 0;
+    run_params.rtol = 1e-10;
+    run_params.atol = 1e-6;
+    run_params.dt_min = 1e-4;
+    run_params.dt_max = 10;
+
+    vehicle vehicle = init_mock_vehicle();
+    grav grav = init_grav(&run_params, rng);
+    atm_model atm_model = init_exp_atm(&run_params, rng);
+    force_model model = {&run_params, &vehicle, &grav, &atm_model, NULL};
+
+    // Circular orbit 1000 km above the surface, after burnout
+    double r = grav.earth_radius + 1e6;
+    double v = sqrt(-grav.grav_g0 * grav.earth_radius * grav.earth_radius / r);
+    state state;
+    memset(&state, 0, sizeof(state));
+    state.t = vehicle.booster.total_burn_time + 1;
+    state.x = r;
+    state.vy = v;
+    update_forces(&model, &state);
+
+    integrator_stats stats = {0, 0};
+    double time_step = 1;
+    double t_end = state.t + 1000;
+    while (state.t < t_end){
+        dp54_adapt(&model, &state, &time_step, &stats);
+        update_forces(&model, &state);
+    }
+
+    // The orbit stays circular and the steps grow beyond the initial step
+    double r_final = sqrt(state.x*state.x + state.y*state.y + state.z*state.z);
+    double v_final = sqrt(state.vx*state.vx + state.vy*state.vy + state.vz*state.vz);
+    REQUIRE_LT(fabs(r_final - r), 1);
+    REQUIRE_LT(fabs(v_final - v), 1e-3);
+    REQUIRE_GT(stats.accepted, 0);
+    REQUIRE_LT(stats.accepted, 1000);
+    REQUIRE_GT(time_step, 1);
+
+    gsl_rng_free(rng);
+}
+
+TEST(integrator, kepler_propagate){
+    double mu = 3.986e14;
+    double r = 6371e3;
+
+    // Suborbital state at 1000 km altitude, climbing
+    state state;
+    memset(&state, 0, sizeof(state));
+    state.x = r + 1e6;
+    state.vx = 2000;
+    state.vy = 6000;
+
+    // Time to come back down to 500 km altitude
+    double time = kepler_time_to_radius(&state, mu, r + 5e5);
+    REQUIRE_GT(time, 0);
+
+    struct state final_state = state;
+    kepler_propagate(&final_state, mu, time);
+    double r_final = sqrt(final_state.x*final_state.x + final_state.y*final_state.y + final_state.z*final_state.z);
+    double rv_final = final_state.x*final_state.vx + final_state.y*final_state.vy + final_state.z*final_state.vz;
+
+    REQUIRE_LT(fabs(final_state.t - time), 1e-9);
+    REQUIRE_LT(fabs(r_final - (r + 5e5)), 1e-3);
+    REQUIRE_LT(rv_final, 0);
+
+    // Energy and angular momentum are conserved
+    double v2 = state.vx*state.vx + state.vy*state.vy;
+    double v2_final = final_state.vx*final_state.vx + final_state.vy*final_state.vy + final_state.vz*final_state.vz;
+    double h = state.x*state.vy - state.y*state.vx;
+    double h_final = final_state.x*final_state.vy - final_state.y*final_state.vx;
+    REQUIRE_LT(fabs((v2/2 - mu/(r + 1e6)) - (v2_final/2 - mu/r_final)), 1e-3);
+    REQUIRE_LT(fabs(h - h_final) / h, 1e-12);
+
+    // A state below the radius never reaches it
+    REQUIRE_EQ(kepler_time_to_radius(&final_state, mu, r + 1e6), -1);
+}
+
+TEST(integrator, get_time_step){
+    runparams run_params;
+    run_params.time_step_main = 1;
+    run_params.time_step_reentry = 0.01;
+    run_params.step_boost = 0;
+    run_params.step_exo = 0;
+    run_params.step_upper = 0.1;
+    run_params.step_dense = 0;
+    run_params.alt_exo = 1e6;
+    run_params.alt_dense = 80500;
+
+    step_schedule schedule = init_step_schedule(&run_params);
+
+    // Boost
+    REQUIRE_EQ(get_time_step(&schedule, 10, 100, 2e6), 1);
+    // Above the atmosphere
+    REQUIRE_EQ(get_time_step(&schedule, 200, 100, 1e6 + 1), 1);
+    REQUIRE_EQ(get_time_step(&schedule, 200, 100, 5e6), 1);
+    // Band boundaries belong to the band below them
+    REQUIRE_EQ(get_time_step(&schedule, 200, 100, 1e6), 0.1);
+    REQUIRE_EQ(get_time_step(&schedule, 200, 100, 80500.5), 0.1);
+    REQUIRE_EQ(get_time_step(&schedule, 200, 100, 80500), 0.01);
+    REQUIRE_EQ(get_time_step(&schedule, 200, 100, 80200), 0.01);
+    REQUIRE_EQ(get_time_step(&schedule, 200, 100, 5e5), 0.1);
+    // Below the surface
+    REQUIRE_EQ(get_time_step(&schedule, 200, 100, -10), 0.01);
+}
@@ -0,0 +1,136 @@
+#include <tau/tau.h>
+#include "../src/include/trajectory.h"
+
+TEST(lanes, kernels){
+    // Gravity and Runge-Kutta steps across the lanes match the single state functions
+    const gsl_rng_type *T;
+    gsl_rng *rng;
+    gsl_rng_env_setup();
+    T = gsl_rng_default;
+    rng = gsl_rng_alloc(T);
+
+    runparams run_params;
+    run_params.grav_error = 1;
+    grav grav = init_grav(&run_params, rng);
+
+    int num_lanes = 3;
+    state states[3];
+    lane_state lanes;
+    double geoid_height_error[3];
+    double time_step[3] = {0.5, 0, 2};
+    for (int i = 0; i < num_lanes; i++){
+        memset(&states[i], 0, sizeof(state));
+        states[i].t = i;
+        states[i].x = 6371e3 + 1e5 * i;
+        states[i].y = 1e4 * i;
+        states[i].z = -2e4;
+        states[i].vx = 100 * i;
+        states[i].vy = 7000;
+        states[i].vz = -10;
+        lane_set_state(&lanes, i, &states[i]);
+        geoid_height_error[i] = grav.geoid_height_error;
+    }
+
+    update_gravity_lanes(&grav, geoid_height_error, &lanes, num_lanes);
+    update_total_lanes(&lanes, num_lanes);
+    rk4step_lanes(&lanes, time_step, num_lanes);
+
+    for (int i = 0; i < num_lanes; i++){
+        state state = states[i];
+        update_gravity(&grav, &state);
+        state.ax_total = state.ax_grav + state.ax_drag + state.ax_lift + state.ax_thrust;
+        state.ay_total = state.ay_grav + state.ay_drag + state.ay_lift + state.ay_thrust;
+        state.az_total = state.az_grav + state.az_drag + state.az_lift + state.az_thrust;
+        if (time_step[i] > 0){
+            rk4step(&state, time_step[i]);
+        }
+
+        struct state lane = lane_get_state(&lanes, i);
+        REQUIRE_EQ(lane.t, state.t);
+        REQUIRE_EQ(lane.x, state.x);
+        REQUIRE_EQ(lane.y, state.y);
+        REQUIRE_EQ(lane.z, state.z);
+        REQUIRE_EQ(lane.vx, state.vx);
+        REQUIRE_EQ(lane.vy, state.vy);
+        REQUIRE_EQ(lane.vz, state.vz);
+        REQUIRE_EQ(lane.ax_grav, state.ax_grav);
+    }
+
+    // The masked lane did not move
+    REQUIRE_EQ(lane_get_state(&lanes, 1).x, states[1].x);
+
+    gsl_rng_free(rng);
+}
+
+TEST(lanes, fly_lanes){
+    // A block of samples flown by the lane engine impacts where fly() puts each sample
+    vehicle vehicle = init_mmiii_ballistic();
+    runparams run_params;
+    memset(&run_params, 0, sizeof(runparams));
+    run_params.run_name = "test_run";
+    run_params.run_type = 0;
+    run_params.num_runs = 100;
+    run_params.traj_output = 0;
+    run_params.time_step_main = 1;
+    run_params.time_step_reentry = 1;
+    run_params.x_aim = 6371e3;
+    run_params.y_aim = 0;
+    run_params.z_aim = 0;
+    run_params.theta_long = 0.5;
+    run_params.theta_lat = 0;
+
+    run_params.rv_type = 0;
+    run_params.grav_error = 1;
+    run_params.atm_error = 1;
+    run_params.atm_model = 0;
+    run_params.gnss_nav = 1;
+    run_params.ins_nav = 1;
+    run_params.rv_maneuv = 0;
+    run_params.initial_pos_error = 10;
+    run_params.initial_vel_error = 0.1;
+    run_params.initial_angle_error = 1e-4;
+    run_params.acc_scale_stability = 1e-6;
+    run_params.gyro_bias_stability = 1e-7;
+    run_params.gyro_noise = 1e-8;
+    run_params.gnss_noise = 5;
+    run_params.integrator = INTEGRATOR_RK4;
+    run_params.coast_mode = 0;
+    run_params.alt_exo = 1e6;
+    run_params.alt_dense = 1e5;
+    run_params.event_location = 0;
+    run_params.lanes = 3;
+
+    REQUIRE_EQ(lanes_supported(&run_params), 1);
+
+    int num_lanes = 3;
+    int run_indices[3] = {4, 7, 11};
+    for (int rng_mode = RNG_MODE_SEQUENTIAL; rng_mode <= RNG_MODE_COUNTER; rng_mode++){
+        run_params.rng_mode = rng_mode;
+        rng_streams rngs[3];
+        state impact_states[3];
+        for (int i = 0; i < num_lanes; i++){
+            rngs[i] = init_rng_streams(&run_params);
+        }
+        mc_sample_lanes(&run_params, &vehicle, run_indices, num_lanes, rngs, impact_states);
+
+        rng_streams rng = init_rng_streams(&run_params);
+        for (int i = 0; i < num_lanes; i++){
+            state impact_state = mc_sample(&run_params, &vehicle, run_indices[i], &rng, NULL);
+            // Each sample reaches the ground
+            REQUIRE_LT(fabs(get_altitude(impact_state.x, impact_state.y, impact_state.z)), 1);
+            REQUIRE_EQ(impact_states[i].t, impact_state.t);
+            REQUIRE_EQ(impact_states[i].x, impact_state.x);
+            REQUIRE_EQ(impact_states[i].y, impact_state.y);
+            REQUIRE_EQ(impact_states[i].z, impact_state.z);
+            free_rng_streams(&rngs[i]);
+        }
+        free_rng_streams(&rng);
+    }
+
+    // Configurations that only fly() handles fall back to it
+    run_params.integrator = INTEGRATOR_DP54;
+    REQUIRE_EQ(lanes_supported(&run_params), 0);
+    run_params.integrator = INTEGRATOR_RK4;
+    run_params.lanes = 1;
+    REQUIRE_EQ(lanes_supported(&run_params), 0);
+}
@@ -9,5 +9,10 @@
 #include "sensors_test.h"
 #include "guidance_test.h"
 #include "maneuverability_test.h"
+#include "output_test.h"
+#include "integrator_test.h"
+#include "lanes_test.h"
+#include "rng_test.h"
+#include "summary_test.h"
 
 TAU_MAIN()
\ No newline at end of file
@@ -0,0 +1,130 @@
+#include <tau/tau.h>
+#include "../src/include/output.h"
+
+TEST(output, traj_policy_record){
+    runparams run_params;
+    run_params.traj_every = 1;
+    run_params.traj_dt_boost = 0;
+    run_params.traj_dt_midcourse = 1.0;
+    run_params.traj_dt_reentry = 0;
+
+    // Every step is recorded without an interval
+    traj_policy policy = init_traj_policy(&run_params);
+    REQUIRE_EQ(traj_policy_record(&policy, 0.5, TRAJ_PHASE_BOOST), 1);
+    REQUIRE_EQ(traj_policy_record(&policy, 1.0, TRAJ_PHASE_BOOST), 1);
+
+    // Midcourse records are at least 1 s apart
+    REQUIRE_EQ(traj_policy_record(&policy, 1.5, TRAJ_PHASE_MIDCOURSE), 0);
+    REQUIRE_EQ(traj_policy_record(&policy, 2.0, TRAJ_PHASE_MIDCOURSE), 1);
+    REQUIRE_EQ(traj_policy_record(&policy, 2.5, TRAJ_PHASE_MIDCOURSE), 0);
+    REQUIRE_EQ(traj_policy_record(&policy, 2.51, TRAJ_PHASE_REENTRY), 1);
+
+    // Every third step
+    run_params.traj_every = 3;
+    policy = init_traj_policy(&run_params);
+    REQUIRE_EQ(traj_policy_record(&policy, 0.01, TRAJ_PHASE_REENTRY), 0);
+    REQUIRE_EQ(traj_policy_record(&policy, 0.02, TRAJ_PHASE_REENTRY), 0);
+    REQUIRE_EQ(traj_policy_record(&policy, 0.03, TRAJ_PHASE_REENTRY), 1);
+}
+
+TEST(output, traj_writer){
+    // Write more records than fit in one buffer, from the writer thread
+    char *path = "./test/trajectory_test.bin";
+    int num_records = TRAJ_BUFFER_RECORDS * 2 + 10;
+    double record[TRAJ_NUM_COLUMNS];
+
+    traj_writer writer;
+    REQUIRE_EQ(traj_writer_open(&writer, path, TRAJ_OUTPUT_BINARY, 1), 0);
+    for (int i = 0; i < num_records; i++){
+        for (int j = 0; j < TRAJ_NUM_COLUMNS; j++){
+            record[j] = i + 0.001 * j;
+        }
+        traj_writer_write(&writer, record);
+    }
+    traj_writer_close(&writer);
+
+    FILE *file = fopen(path, "rb");
+    REQUIRE_TRUE(file != NULL);
+    traj_bin_header header;
+    REQUIRE_EQ((int)fread(&header, sizeof(header), 1, file), 1);
+    REQUIRE_EQ(memcmp(header.magic, TRAJ_BIN_MAGIC, 8), 0);
+    REQUIRE_EQ(header.num_columns, TRAJ_NUM_COLUMNS);
+
+    // Check the records are complete and in order
+    fseek(file, header.data_offset, SEEK_SET);
+    int num_read = 0;
+    int in_order = 1;
+    while (fread(record, sizeof(double), TRAJ_NUM_COLUMNS, file) == TRAJ_NUM_COLUMNS){
+        if (record[0] != num_read || record[TRAJ_NUM_COLUMNS-1] != num_read + 0.001 * (TRAJ_NUM_COLUMNS-1)){
+            in_order = 0;
+        }
+        num_read++;
+    }
+    fclose(file);
+    remove(path);
+
+    REQUIRE_EQ(num_read, num_records);
+    REQUIRE_EQ(in_order, 1);
+}
+
+TEST(output, checkpoint){
+    char *path = "./test/impact_checkpoint_test.txt";
+    runparams run_params;
+    memset(&run_params, 0, sizeof(runparams));
+    run_params.num_runs = 100;
+    run_params.seed = 3;
+    run_params.impact_data_path = path;
+
+    // The hash ignores the paths and the number of threads, but not the parameters of the runs
+    uint64_t hash = runparams_hash(&run_params);
+    run_params.impact_data_path = "./other/impact_data.txt";
+    run_params.num_threads = 8;
+    REQUIRE_TRUE(runparams_hash(&run_params) == hash);
+    run_params.seed = 4;
+    REQUIRE_TRUE(runparams_hash(&run_params) != hash);
+
+    // A written checkpoint reads back unchanged
+    mc_checkpoint checkpoint;
+    memset(&checkpoint, 0, sizeof(checkpoint));
+    checkpoint.num_runs = 100;
+    checkpoint.completed = 40;
+    checkpoint.impact_offset = 1234;
+    checkpoint.base_seed = 17;
+    strcpy(checkpoint.rng_name, "mt19937");
+    checkpoint.config_hash = hash;
+    REQUIRE_EQ(write_checkpoint(path, &checkpoint), 0);
+
+    mc_checkpoint read;
+    REQUIRE_EQ(read_checkpoint(path, &read), 0);
+    REQUIRE_EQ(memcmp(&read, &checkpoint, sizeof(mc_checkpoint)), 0);
+
+    // A missing checkpoint and a file that is not a checkpoint are told apart
+    remove_checkpoint(path);
+    REQUIRE_EQ(read_checkpoint(path, &read), 1);
+    FILE *file = fopen("./test/impact_checkpoint_test.txt.ckpt", "w");
+    fprintf(file, "t, x, y, z, vx, vy, vz\n");
+    fclose(file);
+    REQUIRE_EQ(read_checkpoint(path, &read), 2);
+    remove_checkpoint(path);
+
+    // A long impact file path is never cut off
+    char dir[201];
+    char long_path[512];
+    strcpy(dir, "./test/");
+    memset(dir + 7, 'd', 193);
+    dir[200] = '\0';
+    mkdir(dir, 0700);
+    snprintf(long_path, sizeof(long_path), "%s/%0200d.txt", dir, 0);
+    REQUIRE_GT(strlen(long_path), 400);
+    REQUIRE_EQ(write_checkpoint(long_path, &checkpoint), 0);
+    char long_ckpt[520];
+    snprintf(long_ckpt, sizeof(long_ckpt), "%s.ckpt", long_path);
+    file = fopen(long_ckpt, "rb");
+    REQUIRE_TRUE(file != NULL);
+    fclose(file);
+    REQUIRE_EQ(read_checkpoint(long_path, &read), 0);
+    REQUIRE_EQ(memcmp(&read, &checkpoint, sizeof(mc_checkpoint)), 0);
+    remove_checkpoint(long_path);
+    REQUIRE_EQ(read_checkpoint(long_path, &read), 1);
+    rmdir(dir);
+}
@@ -0,0 +1,186 @@
+#include <tau/tau.h>
+#include "../src/include/rng.h"
+
+TEST(rng, philox_block){
+    // Known answers of Philox4x32-10 from the Random123 test vectors
+    uint32_t counter[4] = {0, 0, 0, 0};
+    uint32_t key[2] = {0, 0};
+    uint32_t output[4];
+    philox_block(counter, key, output);
+    REQUIRE_EQ(output[0], 0x6627e8d5u);
+    REQUIRE_EQ(output[1], 0xe169c58du);
+    REQUIRE_EQ(output[2], 0xbc57ac4cu);
+    REQUIRE_EQ(output[3], 0x9b00dbd8u);
+
+    uint32_t counter_pi[4] = {0x243f6a88, 0x85a308d3, 0x13198a2e, 0x03707344};
+    uint32_t key_pi[2] = {0xa4093822, 0x299f31d0};
+    philox_block(counter_pi, key_pi, output);
+    REQUIRE_EQ(output[0], 0xd16cfe09u);
+    REQUIRE_EQ(output[1], 0x94fdccebu);
+    REQUIRE_EQ(output[2], 0x5001e420u);
+    REQUIRE_EQ(output[3], 0x24126ea1u);
+}
+
+TEST(rng, philox_skip){
+    // Skipping ahead lands on the same draw as drawing through
+    gsl_rng *rng = gsl_rng_alloc(rng_philox);
+    gsl_rng *skipped = gsl_rng_alloc(rng_philox);
+    philox_stream(rng, 42, 3, RNG_STREAM_IMU);
+    philox_stream(skipped, 42, 3, RNG_STREAM_IMU);
+
+    unsigned long draws[20];
+    for (int i = 0; i < 20; i++){
+        draws[i] = gsl_rng_get(rng);
+    }
+
+    philox_skip(skipped, 5);
+    REQUIRE_EQ(gsl_rng_get(skipped), draws[5]);
+    philox_skip(skipped, 6);
+    REQUIRE_EQ(gsl_rng_get(skipped), draws[12]);
+    philox_skip(skipped, 3);
+    REQUIRE_EQ(gsl_rng_get(skipped), draws[16]);
+
+    gsl_rng_free(rng);
+    gsl_rng_free(skipped);
+}
+
+TEST(rng, rng_streams){
+    runparams run_params;
+    run_params.rng_mode = RNG_MODE_COUNTER;
+    run_params.seed = 7;
+    run_params.sampling = SAMPLING_RANDOM;
+    rng_streams streams = init_rng_streams(&run_params);
+    rng_streams other = init_rng_streams(&run_params);
+
+    // A substream does not depend on the draws made from the other substreams or runs
+    set_rng_streams(&streams, 5);
+    double expected = gsl_rng_uniform(streams.streams[RNG_STREAM_ATM]);
+
+    set_rng_streams(&other, 2);
+    for (int i = 0; i < 100; i++){
+        gsl_rng_uniform(other.streams[RNG_STREAM_GRAV]);
+        gsl_rng_uniform(other.streams[RNG_STREAM_ATM]);
+    }
+    set_rng_streams(&other, 5);
+    for (int i = 0; i < 10; i++){
+        gsl_rng_uniform(other.streams[RNG_STREAM_IMU_UPDATE]);
+    }
+    REQUIRE_EQ(gsl_rng_uniform(other.streams[RNG_STREAM_ATM]), expected);
+
+    // Different subsystems, runs and seeds draw different numbers
+    set_rng_streams(&streams, 5);
+    REQUIRE_NE(gsl_rng_uniform(streams.streams[RNG_STREAM_GRAV]), expected);
+    set_rng_streams(&streams, 6);
+    REQUIRE_NE(gsl_rng_uniform(streams.streams[RNG_STREAM_ATM]), expected);
+    free_rng_streams(&streams);
+    run_params.seed = 8;
+    streams = init_rng_streams(&run_params);
+    set_rng_streams(&streams, 5);
+    REQUIRE_NE(gsl_rng_uniform(streams.streams[RNG_STREAM_ATM]), expected);
+
+    free_rng_streams(&streams);
+    free_rng_streams(&other);
+
+    // The sequential mode shares one generator between the subsystems
+    run_params.rng_mode = RNG_MODE_SEQUENTIAL;
+    streams = init_rng_streams(&run_params);
+    REQUIRE_TRUE(streams.streams[RNG_STREAM_STATE] == streams.streams[RNG_STREAM_IMPACT]);
+    free_rng_streams(&streams);
+}
+
+TEST(rng, run_seed){
+    // The runs of one seed get distinct, nonzero generator seeds
+    static unsigned long seeds[10000];
+    for (int i = 0; i < 10000; i++){
+        seeds[i] = run_seed(0, i);
+        REQUIRE_NE(seeds[i], 0);
+    }
+    int duplicates = 0;
+    for (int i = 0; i < 10000; i++){
+        for (int j = 0; j < i; j++){
+            duplicates += seeds[i] == seeds[j];
+        }
+    }
+    REQUIRE_EQ(duplicates, 0);
+
+    // The next seed does not repeat the runs of the previous seed shifted by one
+    REQUIRE_NE(run_seed(1, 0), run_seed(0, 1));
+
+    // Run 0 and run 4357 draw different numbers (mt19937 replaces the seed 0 with 4357)
+    runparams run_params;
+    run_params.rng_mode = RNG_MODE_SEQUENTIAL;
+    run_params.seed = 0;
+    run_params.sampling = SAMPLING_RANDOM;
+    rng_streams streams = init_rng_streams(&run_params);
+    set_rng_streams(&streams, 0);
+    unsigned long draw = gsl_rng_get(streams.streams[RNG_STREAM_STATE]);
+    set_rng_streams(&streams, 4357);
+    REQUIRE_NE(gsl_rng_get(streams.streams[RNG_STREAM_STATE]), draw);
+    free_rng_streams(&streams);
+}
+
+TEST(rng, sobol){
+    // Unscrambled coordinates of point 1000, as given by scipy.stats.qmc.Sobol with the same direction numbers
+    REQUIRE_EQ(sobol_point(1000, 0), 943718400u);
+    REQUIRE_EQ(sobol_point(1000, 5), 3896508416u);
+    REQUIRE_EQ(sobol_point(1000, 20), 2243952640u);
+    REQUIRE_EQ(sobol_point(1000, 39), 2059403264u);
+
+    // The first 2^k points of each dimension fall one in each interval of width 2^-k, before and after scrambling
+    for (int dim = 0; dim < SOBOL_DIMS; dim++){
+        int counts[16] = {0};
+        int scrambled_counts[16] = {0};
+        for (uint32_t i = 0; i < 16; i++){
+            counts[sobol_point(i, dim) >> 28]++;
+            scrambled_counts[sobol_scramble(sobol_point(i, dim), 12345u + dim) >> 28]++;
+        }
+        for (int k = 0; k < 16; k++){
+            REQUIRE_EQ(counts[k], 1);
+            REQUIRE_EQ(scrambled_counts[k], 1);
+        }
+    }
+}
+
+TEST(rng, sampling){
+    runparams run_params;
+    run_params.rng_mode = RNG_MODE_COUNTER;
+    run_params.seed = 0;
+
+    // The runs of an antithetic pair draw opposite static errors, and the flight draws stay pseudo-random
+    run_params.sampling = SAMPLING_ANTITHETIC;
+    rng_streams streams = init_rng_streams(&run_params);
+    REQUIRE_TRUE(streams.streams[RNG_STREAM_STATE] == streams.streams[RNG_STREAM_IMU]);
+    REQUIRE_TRUE(streams.streams[RNG_STREAM_GNSS] != streams.streams[RNG_STREAM_IMU]);
+    double draws[50];
+    set_rng_streams(&streams, 6);
+    for (int i = 0; i < 50; i++){
+        draws[i] = rng_gaussian(streams.streams[RNG_STREAM_STATE], 2);
+    }
+    double flat = gsl_rng_uniform(streams.streams[RNG_STREAM_ATM]);
+    set_rng_streams(&streams, 7);
+    for (int i = 0; i < 50; i++){
+        REQUIRE_EQ(rng_gaussian(streams.streams[RNG_STREAM_STATE], 2), -draws[i]);
+    }
+    REQUIRE_EQ(gsl_rng_uniform(streams.streams[RNG_STREAM_ATM]), 1 - flat);
+    set_rng_streams(&streams, 8);
+    REQUIRE_NE(rng_gaussian(streams.streams[RNG_STREAM_STATE], 2), draws[0]);
+    free_rng_streams(&streams);
+
+    // Each static draw of a Sobol run is the next dimension of its point
+    run_params.sampling = SAMPLING_SOBOL;
+    streams = init_rng_streams(&run_params);
+    sample_state *state = (sample_state *) gsl_rng_state(streams.sample);
+    set_rng_streams(&streams, 3);
+    for (int dim = 0; dim < SOBOL_DIMS; dim++){
+        double u = (sobol_scramble(sobol_point(3, dim), state->scramble[dim]) + 0.5) / 4294967296.0;
+        REQUIRE_EQ(rng_gaussian(streams.streams[RNG_STREAM_GRAV], 1), gsl_cdf_ugaussian_Pinv(u));
+    }
+    // Draws past the last dimension are pseudo-random and reproducible
+    double extra = rng_gaussian(streams.streams[RNG_STREAM_GRAV], 1);
+    set_rng_streams(&streams, 3);
+    for (int dim = 0; dim < SOBOL_DIMS; dim++){
+        gsl_rng_uniform(streams.streams[RNG_STREAM_GRAV]);
+    }
+    REQUIRE_EQ(rng_gaussian(streams.streams[RNG_STREAM_GRAV], 1), extra);
+    free_rng_streams(&streams);
+}
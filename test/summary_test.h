@@ -0,0 +1,88 @@
+#include <tau/tau.h>
+#include "../src/include/summary.h"
+
+TEST(summary, p2_quantile){
+    // With fewer than five observations the quantile is exact
+    p2_quantile median = p2_init(0.5);
+    REQUIRE_TRUE(isnan(p2_value(&median)));
+    p2_add(&median, 3);
+    p2_add(&median, 1);
+    p2_add(&median, 2);
+    REQUIRE_EQ(p2_value(&median), 2);
+    p2_add(&median, 4);
+    REQUIRE_EQ(p2_value(&median), 2.5);
+
+    // Quantiles of a uniform sequence (golden ratio additive recurrence, so the test is deterministic)
+    median = p2_init(0.5);
+    p2_quantile upper = p2_init(0.9);
+    double u = 0;
+    for (int i = 0; i < 10000; i++){
+        u = fmod(u + 0.6180339887498949, 1);
+        p2_add(&median, u);
+        p2_add(&upper, u);
+    }
+    REQUIRE_LT(fabs(p2_value(&median) - 0.5), 0.01);
+    REQUIRE_LT(fabs(p2_value(&upper) - 0.9), 0.01);
+}
+
+TEST(summary, welford_2d){
+    double x[6] = {1, 4, -2, 7, 3, 0.5};
+    double y[6] = {2, -1, 5, 3, 0, 1};
+    welford_2d welford;
+    memset(&welford, 0, sizeof(welford));
+    for (int i = 0; i < 6; i++){
+        welford_add(&welford, x[i], y[i]);
+    }
+
+    // Two pass mean and covariance
+    double mean_x = 0, mean_y = 0;
+    for (int i = 0; i < 6; i++){
+        mean_x += x[i] / 6;
+        mean_y += y[i] / 6;
+    }
+    double cov_xx = 0, cov_xy = 0, cov_yy = 0;
+    for (int i = 0; i < 6; i++){
+        cov_xx += (x[i] - mean_x) * (x[i] - mean_x);
+        cov_xy += (x[i] - mean_x) * (y[i] - mean_y);
+        cov_yy += (y[i] - mean_y) * (y[i] - mean_y);
+    }
+
+    REQUIRE_EQ(welford.count, 6);
+    REQUIRE_LT(fabs(welford.mean[0] - mean_x), 1e-12);
+    REQUIRE_LT(fabs(welford.mean[1] - mean_y), 1e-12);
+    REQUIRE_LT(fabs(welford.comoment[0][0] - cov_xx), 1e-12);
+    REQUIRE_LT(fabs(welford.comoment[0][1] - cov_xy), 1e-12);
+    REQUIRE_LT(fabs(welford.comoment[1][0] - cov_xy), 1e-12);
+    REQUIRE_LT(fabs(welford.comoment[1][1] - cov_yy), 1e-12);
+}
+
+TEST(summary, impact_summary){
+    // Aimpoint on the equator at 90 degrees east, where east is -x and north is z
+    runparams run_params;
+    run_params.x_aim = 0;
+    run_params.y_aim = 6371e3;
+    run_params.z_aim = 0;
+    impact_summary summary = init_impact_summary(&run_params);
+
+    state impact_state;
+    memset(&impact_state, 0, sizeof(impact_state));
+    impact_state.y = 6371e3;
+    impact_state.t = 10;
+    impact_state.x = -30;
+    impact_state.z = 40;
+    update_impact_summary(&summary, &impact_state);
+    impact_state.t = 20;
+    impact_state.x = 0;
+    impact_state.z = -10;
+    update_impact_summary(&summary, &impact_state);
+
+    REQUIRE_EQ(summary.num_runs, 2);
+    REQUIRE_LT(fabs(summary.miss_mean - 30), 1e-9);
+    REQUIRE_LT(fabs(summary.offset.mean[0] - 15), 1e-9);
+    REQUIRE_LT(fabs(summary.offset.mean[1] - 15), 1e-9);
+    REQUIRE_LT(fabs(p2_value(&summary.miss_quantiles[0]) - 30), 1e-9);
+    REQUIRE_EQ(summary.time_mean, 15);
+    REQUIRE_EQ(summary.time_m2, 50);
+    REQUIRE_EQ(summary.time_min, 10);
+    REQUIRE_EQ(summary.time_max, 20);
+}
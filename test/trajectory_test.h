@@ -42,13 +42,48 @@ TEST(trajectory, impact_linterp){
 
 }
 
+TEST(trajectory, locate_altitude_event){
+    // Fall from rest under a constant acceleration, which the cubic interpolant reproduces exactly
+    double g = 9.81;
+    double earth_radius = 6371e3;
+    state state_0;
+    state state_1;
+    state_0.t = 0;
+    state_0.x = earth_radius + 1000;
+    state_0.y = 0;
+    state_0.z = 0;
+    state_0.vx = 0;
+    state_0.vy = 0;
+    state_0.vz = 0;
+
+    state_1.t = 20;
+    state_1.x = earth_radius + 1000 - 0.5 * g * 400;
+    state_1.y = 0;
+    state_1.z = 0;
+    state_1.vx = -g * 20;
+    state_1.vy = 0;
+    state_1.vz = 0;
+
+    state event_state;
+    REQUIRE_EQ(locate_altitude_event(&state_0, &state_1, 0, &event_state), 1);
+    REQUIRE_LT(fabs(event_state.t - sqrt(2000 / g)), 1e-6);
+    REQUIRE_LT(fabs(event_state.x - earth_radius), 1e-5);
+    REQUIRE_LT(fabs(event_state.vx + sqrt(2000 * g)), 1e-6);
+
+    // The same fall through 500 m of altitude
+    REQUIRE_EQ(locate_altitude_event(&state_0, &state_1, 500, &event_state), 1);
+    REQUIRE_LT(fabs(event_state.t - sqrt(1000 / g)), 1e-6);
+
+    // An altitude that is not crossed within the step
+    REQUIRE_EQ(locate_altitude_event(&state_0, &state_1, 2000, &event_state), 0);
+
+    // The impact is located with the interpolant rather than the chord
+    state impact_state = impact_event(&state_0, &state_1);
+    REQUIRE_LT(fabs(impact_state.t - sqrt(2000 / g)), 1e-6);
+}
+
 TEST(trajectory, fly){
-    // Initialize the random number generator
-    const gsl_rng_type *T;
-    gsl_rng *rng;
     gsl_rng_env_setup();
-    T = gsl_rng_default;
-    rng = gsl_rng_alloc(T);
 
     vehicle vehicle = init_mock_vehicle();
     runparams run_params;
@@ -78,6 +113,27 @@ TEST(trajectory, fly){
     run_params.gyro_bias_stability = 0;
     run_params.gyro_noise = 0;
     run_params.gnss_noise = 0;
+    run_params.integrator = INTEGRATOR_RK4;
+    run_params.coast_mode = 0;
+    run_params.step_boost = 0;
+    run_params.step_exo = 0;
+    run_params.step_upper = 0;
+    run_params.step_dense = 0;
+    run_params.alt_exo = 1e6;
+    run_params.alt_dense = 1e5;
+    run_params.event_location = 0;
+    run_params.lanes = 1;
+    run_params.rng_mode = 0;
+    run_params.seed = 0;
+    run_params.sampling = 0;
+    run_params.first_run = 0;
+    run_params.checkpoint = 0;
+    run_params.atm_table = 0;
+
+    // Initialize the random number generators
+    rng_streams rngs = init_rng_streams(&run_params);
+    set_rng_streams(&rngs, 0);
+    gsl_rng *rng = rngs.streams[RNG_STREAM_STATE];
 
     // print all of the vehicle parameters
     // printf("Booster total mass: %f\n", vehicle.booster.total_mass);
@@ -86,7 +142,7 @@ TEST(trajectory, fly){
     initial_state.theta_long = 0;
     initial_state.x += 10;
     
-    state final_state = fly(&run_params, &initial_state, &vehicle, rng);
+    state final_state = fly(&run_params, &initial_state, &vehicle, &rngs, NULL);
 
     REQUIRE_LT(fabs(final_state.t - 1), 1);
     REQUIRE_EQ(final_state.ax_thrust, 0);
@@ -99,7 +155,7 @@ TEST(trajectory, fly){
     initial_state.vx = 10;
     initial_state.vy = 10;
     initial_state.vz = 10;
-    final_state = fly(&run_params, &initial_state, &vehicle, rng);
+    final_state = fly(&run_params, &initial_state, &vehicle, &rngs, NULL);
 
     REQUIRE_LT(fabs(final_state.t - 2), 1);
 
@@ -107,7 +163,7 @@ TEST(trajectory, fly){
     vehicle = init_mmiii_ballistic();
     initial_state = init_true_state(&run_params, rng);
     initial_state.theta_long = 0;
-    final_state = fly(&run_params, &initial_state, &vehicle, rng);
+    final_state = fly(&run_params, &initial_state, &vehicle, &rngs, NULL);
 
     REQUIRE_GT(final_state.t, 0);
     REQUIRE_LT(fabs(final_state.x - 6371e3), 1e-6);
@@ -119,11 +175,28 @@ TEST(trajectory, fly){
     initial_state.theta_long = M_PI/4;
     run_params.traj_output = 0;
 
-    final_state = fly(&run_params, &initial_state, &vehicle, rng);
+    final_state = fly(&run_params, &initial_state, &vehicle, &rngs, NULL);
 
     REQUIRE_GT(final_state.t, 0);
     REQUIRE_LT(fabs(sqrt(final_state.x*final_state.x + final_state.y*final_state.y) - 6371e3), 1);
 
+    // Mock vehicle dropped from 10m above the surface with the adaptive integrator
+    vehicle = init_mock_vehicle();
+    run_params.integrator = INTEGRATOR_DP54;
+    run_params.rtol = 1e-9;
+    run_params.atol = 1e-6;
+    run_params.dt_min = 1e-4;
+    run_params.dt_max = 1;
+    integrator_stats stats = {0, 0};
+    initial_state = init_true_state(&run_params, rng);
+    initial_state.theta_long = 0;
+    initial_state.x += 10;
+    final_state = fly(&run_params, &initial_state, &vehicle, &rngs, &stats);
+
+    REQUIRE_LT(fabs(final_state.t - 1), 1);
+    REQUIRE_GT(stats.accepted, 0);
+
+    free_rng_streams(&rngs);
 }
 
 TEST(trajectory, update_aimpoint){
@@ -154,6 +227,22 @@ TEST(trajectory, update_aimpoint){
     run_params.gyro_bias_stability = 0;
     run_params.gyro_noise = 0;
     run_params.gnss_noise = 0;
+    run_params.integrator = INTEGRATOR_RK4;
+    run_params.coast_mode = 0;
+    run_params.step_boost = 0;
+    run_params.step_exo = 0;
+    run_params.step_upper = 0;
+    run_params.step_dense = 0;
+    run_params.alt_exo = 1e6;
+    run_params.alt_dense = 1e5;
+    run_params.event_location = 0;
+    run_params.lanes = 1;
+    run_params.rng_mode = 0;
+    run_params.seed = 0;
+    run_params.sampling = 0;
+    run_params.first_run = 0;
+    run_params.checkpoint = 0;
+    run_params.atm_table = 0;
 
     cart_vector aimpoint = update_aimpoint(run_params, 0);
     // printf("Aimpoint: %f, %f, %f\n", aimpoint.x, aimpoint.y, aimpoint.z);